@@ -0,0 +1,412 @@
+"""
+Headless benchmarks of the world model.
+
+Builds worlds of several sizes without a display and measures how fast they are generated and meshed, how fast blocks
+are edited and how much memory every block costs. Each world size runs in a fresh process so its peak RSS is its own.
+
+Run from the repository root:
+    python src/bench.py                             print results as JSON
+    python src/bench.py -o before.json              also write them to a file
+    python src/bench.py -o after.json -c before.json  print how every number changed since an earlier run
+
+The exit status is 1 if a result went over its budget, see the *_budget_used results.
+
+=== Results ============================================================================================================
+size: 1/2 width and height of the world, see WORLD_SIZE
+chunks, blocks: number of non-empty chunks and solid blocks generated
+generate_blocks_per_sec: solid blocks generated per second, including storing them in the map
+bytes_per_block: bytes of block arrays held per solid block
+packed_bytes_per_block: bytes of block data held per solid block once every chunk is packed, see chunk.py
+get_block_per_sec: Map.get_block calls per second at random positions of the packed world
+get_heights_per_sec: columns per second whose surface height Map.get_heights finds, in one call for all of them
+entities_per_ms: entities moved per millisecond by Entities.tick, ENTITIES of them walking and falling on the world
+collision_p99_sec: 99th percentile seconds sweep_box takes to move the player one tick into the terrain
+collision_budget_used: collision_p99_sec as a fraction of COLLISION_BUDGET, over 1 means collision is too slow
+rss_bytes_per_block: growth of peak RSS while building the world, per solid block
+peak_rss_bytes: peak resident memory of the process that built the world
+mesh_faces_per_sec.<mesher>.<vertex format>: quads meshed per second
+mesh_bytes_per_face.<mesher>.<vertex format>: bytes of mesh data per quad
+add_block_per_sec: Map.add_block calls per second
+fill_blocks_per_sec: blocks per second set by Map.fill and Map.replace, box, sphere and cylinder regions in turn
+cube_vertices_per_sec, cube_geometry_per_sec: blocks per second turned into vertices one at a time and batched
+startup_first_update_sec: seconds from creating the map to the end of its first update, when the first frame can be
+    drawn
+startup_budget_used: startup_first_update_sec as a fraction of STARTUP_BUDGET, over 1 means the first frame is late
+startup_spawn_sec: seconds until every chunk within SPAWN_RADIUS of spawn is generated
+startup_complete_sec: seconds until the whole world is generated and meshed
+server_chunks_per_sec: chunks per second a ChunkServer on loopback sends to a client subscribing to the whole world,
+    compressing and decompressing included
+server_bytes_per_chunk: bytes the server sends per chunk of the world, air chunks included
+server_bytes_per_edit: bytes the server pushes per block edit to a client subscribed to the edited chunks, for
+    SERVER_EDITS edits sent at once, edits of one chunk in the same server tick share a message
+
+"""
+
+from config import *
+from utils import *
+from blocks import BLOCK_AIR, BLOCK_STONE, BLOCK_SAND
+from chunk import chunk_origin
+from geometry import cube_geometry
+from mesher import MESHERS, padded_blocks, build_mesh
+from edits import Box, Sphere, Cylinder
+from entities import Entities
+from collision import player_box, sweep_box
+from world import Map
+from server import ChunkServer
+from client import ChunkClient
+from protocol import DELTA
+
+import argparse
+import asyncio
+import json
+import math
+import platform
+import resource
+import subprocess
+import sys
+import threading
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from random import Random
+
+
+SIZES = (16, 32, 48, 80)
+SEED = 12345
+VERTEX_FORMATS = ("float", "compact")
+EDITS = 20000 # add_block calls timed per world
+CUBES = 20000 # blocks turned into vertices by the cube_vertices benchmarks
+FILL_RADIUS = 40 # half the width of the regions filled by the fill benchmark
+ENTITIES = 10000 # entities ticked by the entity benchmark
+ENTITY_TICKS = 100 # ticks timed by the entity benchmark
+COLLISIONS = 5000 # player moves timed by the collision benchmark
+SERVER_EDITS = 1000 # block edits sent to the server by the server benchmark
+SERVER_TIMEOUT = 60 # seconds the server benchmark waits for the server before giving up
+
+
+def peak_rss():
+    """
+    @return: (int) peak resident memory of this process in bytes
+    """
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024 # kilobytes on linux
+
+def quads_of(mesh, vertex_format):
+    """
+    @return: (int) number of quads in a mesh built by build_mesh
+    """
+    if vertex_format == "compact":
+        return len(mesh[1]) // 6
+    return len(mesh[0]) // 12
+
+class MeshCounter:
+    """
+    Stands in for ChunkRenderer, counting the meshes it is handed instead of uploading them.
+    """
+    def __init__(self, vertex_format=VERTEX_FORMAT):
+        self.vertex_format = vertex_format
+        self.meshes = 0
+
+    def show_mesh(self, key, mesh):
+        self.meshes += 1
+
+    def hide_chunk(self, key):
+        pass
+
+def run_until_complete(world_map):
+    """
+    Update a map until all of its chunks are generated and meshed, like the game would frame by frame.
+    @param world_map: (Map) map to finish
+    @return: (tuple) (spawn, complete) seconds from the first update until the spawn area and the whole world were done
+    """
+    start = time.perf_counter()
+    spawn = None
+    while True:
+        world_map.update(0)
+        if spawn is None and not world_map.pending_near(SPAWN_RADIUS):
+            spawn = time.perf_counter() - start
+        if world_map.is_complete():
+            return spawn, time.perf_counter() - start
+
+def bench_startup(size):
+    """
+    @param size: (int) 1/2 width and height of the world
+    @return: (dict) startup times of the world with meshing included, see above
+    """
+    start = time.perf_counter()
+    world_map = Map(MeshCounter(), workers=0, seed=SEED, world_size=size)
+    world_map.update(0)
+    first_update = time.perf_counter() - start
+    spawn, complete = run_until_complete(world_map)
+    world_map.close()
+    return {
+        "startup_first_update_sec": first_update,
+        "startup_budget_used": first_update / STARTUP_BUDGET,
+        "startup_spawn_sec": first_update + spawn,
+        "startup_complete_sec": first_update + complete,
+    }
+
+def wait_for(condition):
+    """
+    Sleep until a condition holds, raises TimeoutError after SERVER_TIMEOUT seconds.
+    @param condition: (function) returns true once the wait is over
+    """
+    deadline = time.perf_counter() + SERVER_TIMEOUT
+    while not condition():
+        if time.perf_counter() > deadline:
+            raise TimeoutError("the server benchmark took longer than %d seconds" % SERVER_TIMEOUT)
+        time.sleep(0.001)
+
+def bench_server(size):
+    """
+    @param size: (int) 1/2 width and height of the world
+    @return: (dict) how fast a server on loopback sends the world and how much every edit costs, see above
+    """
+    # jobs run on the server's thread, the benchmark already runs in a worker process that cannot start more of them
+    world_map = Map(None, workers=0, streaming=False, seed=SEED, world_size=size)
+    run_until_complete(world_map)
+    server = ChunkServer(world_map, port=0)
+    started = threading.Event()
+    thread = threading.Thread(target=asyncio.run, args=(server.run(started.set),), daemon=True)
+    thread.start()
+    started.wait()
+    client = ChunkClient(SERVER_HOST, server.port)
+
+    # every chunk of the world once, plus the air around it
+    keys = sorted(world_map.loaded | {(x, y, z) for cx, cy, cz in world_map.loaded
+                                     for x in (cx - 1, cx, cx + 1) for y in (cy - 1, cy, cy + 1)
+                                     for z in (cz - 1, cz, cz + 1)})
+    received = []
+    start = time.perf_counter()
+    client.subscribe(keys)
+    wait_for(lambda: received.extend(client.take()) or len(received) >= len(keys))
+    results = {
+        "server_chunks_per_sec": len(keys) / (time.perf_counter() - start),
+        "server_bytes_per_chunk": server.bytes_sent / len(keys),
+    }
+
+    # single block edits spread over the world, like many players placing and breaking blocks
+    rng = Random(SEED)
+    origins = [chunk_origin(key) for key in world_map.chunks.chunks]
+    positions = set()
+    while len(positions) < min(SERVER_EDITS, len(origins) * CHUNK_SIZE ** 3):
+        x, y, z = rng.choice(origins)
+        positions.add((x + rng.randrange(CHUNK_SIZE), y + rng.randrange(CHUNK_SIZE), z + rng.randrange(CHUNK_SIZE)))
+    positions = sorted(positions)
+    blocks = [BLOCK_AIR if world_map.get_block(position) != BLOCK_AIR else BLOCK_STONE for position in positions]
+    sent = server.bytes_sent
+    client.send_edits(positions, blocks)
+    changed = []
+    wait_for(lambda: changed.extend(len(message[3]) if message[0] == DELTA else CHUNK_SIZE ** 3
+                                    for message in client.take()) or sum(changed) >= len(positions))
+    results["server_bytes_per_edit"] = (server.bytes_sent - sent) / len(positions)
+
+    client.close()
+    server.stop()
+    thread.join()
+    world_map.close()
+    return results
+
+def bench_world(size):
+    """
+    Run every benchmark on one world.
+    @param size: (int) 1/2 width and height of the world
+    @return: (dict) results, see above
+    """
+    base_rss = peak_rss()
+    start = time.perf_counter()
+    world_map = Map(workers=0, seed=SEED, world_size=size)
+    run_until_complete(world_map)
+    generate_time = time.perf_counter() - start
+    chunks = world_map.chunks.chunks
+    blocks = sum(chunk.count for chunk in chunks.values())
+    results = {
+        "size": size,
+        "chunks": len(chunks),
+        "blocks": blocks,
+        "generate_blocks_per_sec": blocks / generate_time,
+        "bytes_per_block": world_map.chunks.nbytes() / float(blocks),
+        "rss_bytes_per_block": (peak_rss() - base_rss) / float(blocks),
+        "mesh_faces_per_sec": {},
+        "mesh_bytes_per_face": {},
+    }
+
+    for chunk in world_map.chunks.chunks.values():
+        chunk.pack()
+    results["packed_bytes_per_block"] = world_map.chunks.nbytes() / float(blocks)
+    rng = Random(SEED)
+    positions = [(rng.randrange(-size, size), rng.randrange(-3, 8), rng.randrange(-size, size)) for _ in range(EDITS)]
+    start = time.perf_counter()
+    for position in positions:
+        world_map.get_block(position)
+    results["get_block_per_sec"] = EDITS / (time.perf_counter() - start)
+    columns = np.array(positions)
+    start = time.perf_counter()
+    world_map.get_heights(columns[:, 0], columns[:, 2])
+    results["get_heights_per_sec"] = EDITS / (time.perf_counter() - start)
+
+    entities = Entities()
+    for _ in range(ENTITIES):
+        entities.spawn((rng.uniform(-size, size), 10, rng.uniform(-size, size)),
+                       (rng.uniform(-4, 4), rng.uniform(0, 8), rng.uniform(-4, 4)))
+    start = time.perf_counter()
+    for _ in range(ENTITY_TICKS):
+        entities.tick(1.0 / TICKS_PER_SEC, world_map.chunks)
+    results["entities_per_ms"] = ENTITIES * ENTITY_TICKS / ((time.perf_counter() - start) * 1000)
+
+    # one tick of flying at full speed from just above the ground, down and sideways into the terrain
+    step = FLYING_SPEED / float(TICKS_PER_SEC)
+    times = []
+    for _ in range(COLLISIONS):
+        x, z = rng.uniform(-size, size), rng.uniform(-size, size)
+        ground = world_map.get_height(int(math.floor(x + 0.5)), int(math.floor(z + 0.5)))
+        posn = (x, max(ground, -size) + 0.5 + EYE_HEIGHT + rng.uniform(0, 1), z)
+        angle = rng.uniform(0, 2 * math.pi)
+        motion = vec_mul(vec_normalize((math.cos(angle), rng.uniform(-1, 0), math.sin(angle))), step)
+        start = time.perf_counter()
+        sweep_box(world_map.chunks, *player_box(posn), motion)
+        times.append(time.perf_counter() - start)
+    results["collision_p99_sec"] = float(np.percentile(times, 99))
+    results["collision_budget_used"] = results["collision_p99_sec"] / COLLISION_BUDGET
+
+    padded = [(padded_blocks(world_map.chunks, key), chunk_origin(key)) for key in chunks]
+    for mesher in MESHERS:
+        for vertex_format in VERTEX_FORMATS:
+            quads = 0
+            nbytes = 0
+            start = time.perf_counter()
+            for chunk_blocks, origin in padded:
+                mesh = build_mesh(chunk_blocks, origin, mesher, vertex_format)
+                quads += quads_of(mesh, vertex_format)
+                nbytes += sum(array.nbytes for array in mesh)
+            mesh_time = time.perf_counter() - start
+            name = "%s.%s" % (mesher, vertex_format)
+            results["mesh_faces_per_sec"][name] = quads / mesh_time
+            results["mesh_bytes_per_face"][name] = nbytes / float(max(1, quads))
+
+    rng = Random(SEED)
+    positions = [(rng.randrange(-size, size), rng.randrange(-2, 8), rng.randrange(-size, size)) for _ in range(EDITS)]
+    start = time.perf_counter()
+    for position in positions:
+        world_map.add_block(position, BLOCK_STONE)
+    results["add_block_per_sec"] = EDITS / (time.perf_counter() - start)
+
+    r = FILL_RADIUS
+    box = Box((-r, -r, -r), (r - 1, r - 1, r - 1))
+    sphere = Sphere((0, 0, 0), r)
+    cylinder = Cylinder((0, -r, 0), r, 2 * r)
+    volume = (2 * r) ** 3 + 4 / 3.0 * math.pi * r ** 3 + math.pi * r ** 2 * 2 * r
+    start = time.perf_counter()
+    world_map.fill(box, BLOCK_STONE)
+    world_map.fill(sphere, BLOCK_AIR)
+    world_map.replace(cylinder, BLOCK_STONE, BLOCK_SAND)
+    results["fill_blocks_per_sec"] = volume / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for x, y, z in positions[:CUBES]:
+        cube_vertices(x, y, z, 0.5)
+    results["cube_vertices_per_sec"] = CUBES / (time.perf_counter() - start)
+    cube_blocks = np.full(CUBES, BLOCK_STONE)
+    start = time.perf_counter()
+    cube_geometry(np.array(positions[:CUBES]), cube_blocks)
+    results["cube_geometry_per_sec"] = CUBES / (time.perf_counter() - start)
+
+    results["peak_rss_bytes"] = peak_rss()
+    world_map.close()
+    results.update(bench_startup(size))
+    results.update(bench_server(size))
+    return results
+
+def run(sizes):
+    """
+    @param sizes: (list) world sizes to benchmark, each in its own process
+    @return: (dict) results of every size plus what they were measured on
+    """
+    results = []
+    for size in sizes:
+        with ProcessPoolExecutor(1) as executor:
+            results.append(executor.submit(bench_world, size).result())
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "results": results,
+    }
+
+def git_commit():
+    """
+    @return: (str) hash of the checked out commit, None outside of a git repository
+    """
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def flatten(results, prefix=""):
+    """
+    @return: (dict) nested results as a flat dict with dotted names
+    """
+    flat = {}
+    for name, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, prefix + name + "."))
+        else:
+            flat[prefix + name] = value
+    return flat
+
+def compare(old, new):
+    """
+    @param old: (dict) earlier output of run
+    @param new: (dict) later output of run
+    @return: (list) lines giving the ratio new / old of every number measured on a world size in both runs
+    """
+    old_sizes = {result["size"]: flatten(result) for result in old["results"]}
+    lines = []
+    for result in new["results"]:
+        before = old_sizes.get(result["size"])
+        if before is None:
+            continue
+        for name, value in sorted(flatten(result).items()):
+            if name in ("size", "chunks", "blocks") or not before.get(name):
+                continue
+            lines.append("size %d %s: %.4g -> %.4g (x%.2f)" % (result["size"], name, before[name], value,
+                                                                value / before[name]))
+    return lines
+
+
+def over_budget(report):
+    """
+    @param report: (dict) output of run
+    @return: (list) lines naming every budget a world size went over
+    """
+    lines = []
+    for result in report["results"]:
+        for name, value in sorted(flatten(result).items()):
+            if name.endswith("_budget_used") and value > 1:
+                lines.append("size %d %s: %.2f, over budget" % (result["size"], name, value))
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark world generation, meshing and memory without a display.")
+    parser.add_argument("-s", "--sizes", type=int, nargs="+", default=SIZES, help="world sizes to benchmark")
+    parser.add_argument("-o", "--output", help="file to write the JSON results to")
+    parser.add_argument("-c", "--compare", help="JSON results of an earlier run to compare against")
+    args = parser.parse_args()
+
+    report = run(args.sizes)
+    print(json.dumps(report, indent=4))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+    if args.compare:
+        with open(args.compare) as f:
+            print("\n".join(compare(json.load(f), report)))
+    failures = over_budget(report)
+    if failures:
+        sys.exit("\n".join(failures))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Registry of block types.
+Blocks are stored in the world as small integer IDs, this file maps those IDs back to their names and textures.
+"""
+
+from config import *
+
+import numpy as np
+
+
+class BlockRegistry:
+    """
+    Maps block IDs to block names and texture data.
+    ID 0 is always air, which has no texture.
+    """
+    def __init__(self):
+        self.names = []
+        """
+        Name of each block type, indexed by block ID.
+        """
+        self.tiles = []
+        """
+        Atlas tiles of each block type as (top, bottom, side), indexed by block ID.
+        """
+        self.textures = []
+        """
+        Texture coordinates of each block type as returned by tex_coords, indexed by block ID.
+        """
+        self.face_tiles = []
+        """
+        Texture coordinates of the bottom left corner of the atlas tile of each face, indexed by block ID then by face
+        number (see mesher.py).
+        """
+        self.face_tile_table = None
+        """
+        Cached numpy copy of face_tiles, see get_face_tile_table.
+        """
+        self.ids = {}
+        """
+        Maps block names to block IDs.
+        """
+        self.register("air", None)
+
+    def register(self, name, tiles):
+        """
+        Add a new block type.
+        @param name: (str) unique name of the block type
+        @param tiles: (tuple) atlas tiles of the block as (top, bottom, side), or None for invisible blocks
+        @return: (int) ID of the new block type
+        """
+        if name in self.ids:
+            raise ValueError("block type '%s' is already registered" % name)
+        block = len(self.names)
+        if block > 255:
+            raise ValueError("too many block types, IDs must fit in a byte")
+        self.names.append(name)
+        self.tiles.append(tiles)
+        self.textures.append(tex_coords(*tiles) if tiles else None)
+        if tiles:
+            top, bottom, side = (tex_coord(*tile)[:2] for tile in tiles)
+            self.face_tiles.append((top, bottom, side, side, side, side))
+        else:
+            self.face_tiles.append(None)
+        self.ids[name] = block
+        self.face_tile_table = None
+        return block
+
+    def get_id(self, name):
+        """
+        @param name: (str) name of a registered block type
+        @return: (int) ID of the block type
+        """
+        return self.ids[name]
+
+    def get_name(self, block):
+        """
+        @param block: (int) block ID
+        @return: (str) name of the block type
+        """
+        return self.names[block]
+
+    def get_texture(self, block):
+        """
+        @param block: (int) block ID
+        @return: (list) texture coordinates of the block, see tex_coords
+        """
+        return self.textures[block]
+
+    def get_tiles(self, block):
+        """
+        @param block: (int) block ID
+        @return: (tuple) atlas tiles of the block as (top, bottom, side)
+        """
+        return self.tiles[block]
+
+    def get_face_tile(self, block, face):
+        """
+        @param block: (int) block ID
+        @param face: (int) face number, see mesher.py
+        @return: (tuple) texture coordinates of the bottom left corner of the atlas tile used for the face
+        """
+        return self.face_tiles[block][face]
+
+    def get_face_tile_table(self):
+        """
+        @return: (ndarray) float32 array of shape (block types, 6, 2) holding face_tiles, zeros for air, so tiles of
+                 many faces can be looked up at once
+        """
+        if self.face_tile_table is None:
+            table = np.zeros((len(self.names), 6, 2), dtype=np.float32)
+            for block, tiles in enumerate(self.face_tiles):
+                if tiles:
+                    table[block] = tiles
+            self.face_tile_table = table
+        return self.face_tile_table
+
+    def __len__(self):
+        return len(self.names)
+
+
+BLOCKS = BlockRegistry()
+BLOCK_AIR = 0
+BLOCK_GRASS = BLOCKS.register("grass", GRASS_TILES)
+BLOCK_SAND = BLOCKS.register("sand", SAND_TILES)
+BLOCK_BRICK = BLOCKS.register("brick", BRICK_TILES)
+BLOCK_STONE = BLOCKS.register("stone", STONE_TILES)
@@ -0,0 +1,396 @@
+"""
+Block storage for the world.
+
+The world is split into cubic chunks of CHUNK_SIZE blocks per side. Each chunk stores its blocks as a dense numpy array
+of block IDs (see blocks.py), so a block costs one byte instead of a dict entry. Chunks that were never written to are
+not stored at all and read back as air.
+
+Chunks that have not been written to or had their array taken for a while are packed, see ChunkStore.pack_idle. Every
+PACK_INTERVAL seconds a sweep over all chunks starts, and a few chunks of it are visited per frame so packing never
+stalls a frame. A chunk is packed when it was not used since the previous sweep visited it. A packed
+chunk keeps a palette of the block IDs it holds and an index into the palette per block, bit packed with as few
+bits as the palette needs. A chunk of a single block type packs to its palette alone. Single blocks can be read from a
+packed chunk in constant time, anything that needs the array unpacks it again.
+
+=== Packing ============================================================================================================
+bits per block: 0 for 1 block type, 1 for 2, 2 for 3 to 4, 4 for 5 to 16. Chunks of more types are left unpacked.
+packed: bytes holding 8 / bits indices each, index i of the block at local (lx, ly, lz) with
+        i = (lx * CHUNK_SIZE + ly) * CHUNK_SIZE + lz is in bits (i % (8 / bits)) * bits and up of byte i // (8 / bits)
+
+=== Coordinates ========================================================================================================
+position: (x, y, z) world coordinates of a block
+key: (cx, cy, cz) coordinates of a chunk, the chunk at key k holds positions k*CHUNK_SIZE to (k+1)*CHUNK_SIZE - 1
+local: (lx, ly, lz) coordinates of a block within its chunk, from 0 to CHUNK_SIZE - 1
+
+"""
+
+from config import *
+from blocks import BLOCK_AIR
+from heightmap import Heightmap
+
+import numpy as np
+from collections import deque
+
+
+BLOCK_DTYPE = np.uint8 # dtype of block ID arrays
+PACKED_BITS = (0, 1, 2, 2, 4) # bits per block of a packed chunk, indexed by palette size - 1 up to 4, 4 bits up to 16
+
+
+def chunk_key(position):
+    """
+    @param position: (tuple) x, y, z world coordinates of a block
+    @return: (tuple) key of the chunk containing the position
+    """
+    x, y, z = position
+    return (x // CHUNK_SIZE, y // CHUNK_SIZE, z // CHUNK_SIZE)
+
+def chunk_local(position):
+    """
+    @param position: (tuple) x, y, z world coordinates of a block
+    @return: (tuple) coordinates of the position within its chunk
+    """
+    x, y, z = position
+    return (x % CHUNK_SIZE, y % CHUNK_SIZE, z % CHUNK_SIZE)
+
+def chunk_origin(key):
+    """
+    @param key: (tuple) key of a chunk
+    @return: (tuple) world coordinates of the block at local (0, 0, 0) of the chunk
+    """
+    cx, cy, cz = key
+    return (cx * CHUNK_SIZE, cy * CHUNK_SIZE, cz * CHUNK_SIZE)
+
+
+def packed_bits(palette_size):
+    """
+    @param palette_size: (int) number of block types in a chunk
+    @return: (int) bits per block a packed chunk with that many types uses, None if it is not worth packing
+    """
+    if palette_size <= len(PACKED_BITS):
+        return PACKED_BITS[palette_size - 1]
+    if palette_size <= 16:
+        return 4
+    return None
+
+
+class Chunk:
+    """
+    A cube of CHUNK_SIZE blocks per side.
+    """
+    def __init__(self, key, blocks=None):
+        self.key = key
+        """
+        Chunk coordinates, see chunk_key.
+        """
+        if blocks is None:
+            blocks = np.zeros((CHUNK_SIZE, CHUNK_SIZE, CHUNK_SIZE), dtype=BLOCK_DTYPE)
+        self.array = blocks
+        """
+        Block IDs indexed by local x, y, z, None while the chunk is packed.
+        """
+        self.palette = None
+        self.bits = 0
+        self.packed = None
+        """
+        Block IDs in the palette, bits per block and the bit packed palette indices of a packed chunk, see above.
+        """
+        self.used = True
+        """
+        Set when the array is taken and when the chunk is created, cleared when ChunkStore.pack_idle visits the chunk.
+        A chunk still clear the next time it is visited is packed, so a chunk is never packed before a whole sweep
+        went by.
+        """
+        self.count = int(np.count_nonzero(blocks))
+        """
+        Number of non-air blocks in the chunk.
+        """
+
+    @property
+    def blocks(self):
+        """
+        Block IDs indexed by local x, y, z, unpacks the chunk first if it is packed. Changes to the array change the
+        chunk, use unpacked for a read only copy that leaves a packed chunk packed.
+        """
+        if self.array is None:
+            self.array = self.unpacked()
+            self.palette = self.packed = None
+        self.used = True
+        return self.array
+
+    def unpacked(self):
+        """
+        @return: (ndarray) block IDs indexed by local x, y, z, not to be modified, the chunk stays packed
+        """
+        if self.array is not None:
+            return self.array
+        shape = (CHUNK_SIZE, CHUNK_SIZE, CHUNK_SIZE)
+        palette = np.array(self.palette, dtype=BLOCK_DTYPE)
+        if not self.bits:
+            return np.full(shape, palette[0], dtype=BLOCK_DTYPE)
+        per_byte = 8 // self.bits
+        shifts = np.arange(per_byte, dtype=np.uint8) * self.bits
+        indices = np.frombuffer(self.packed, dtype=np.uint8)[:, None] >> shifts & (1 << self.bits) - 1
+        return palette[indices.reshape(shape)]
+
+    def pack(self):
+        """
+        Replace the array by a palette and bit packed indices, if the chunk has few enough block types.
+        @return: (bool) true if the chunk is packed now
+        """
+        if self.array is None:
+            return True
+        palette, indices = np.unique(self.array, return_inverse=True)
+        bits = packed_bits(len(palette))
+        if bits is None:
+            return False
+        if bits:
+            per_byte = 8 // bits
+            shifts = np.arange(per_byte, dtype=np.uint8) * bits
+            # indices never overlap within a byte, so summing them is the same as or-ing them together
+            packed = (indices.astype(np.uint8).reshape(-1, per_byte) << shifts).sum(axis=1, dtype=np.uint8).tobytes()
+        else:
+            packed = b""
+        self.palette = tuple(int(block) for block in palette)
+        self.bits = bits
+        self.packed = packed
+        self.array = None
+        return True
+
+    def is_packed(self):
+        return self.array is None
+
+    @property
+    def nbytes(self):
+        """
+        Bytes of block data the chunk holds, its array or its palette and packed indices.
+        """
+        if self.array is not None:
+            return self.array.nbytes
+        return len(self.palette) + len(self.packed)
+
+    def get(self, local):
+        """
+        @param local: (tuple) local coordinates of a block
+        @return: (int) ID of the block
+        """
+        if self.array is not None:
+            return int(self.array[local])
+        if not self.bits:
+            return self.palette[0]
+        lx, ly, lz = local
+        i = (lx * CHUNK_SIZE + ly) * CHUNK_SIZE + lz
+        per_byte = 8 // self.bits
+        return self.palette[self.packed[i // per_byte] >> (i % per_byte) * self.bits & (1 << self.bits) - 1]
+
+    def get_many(self, lx, ly, lz):
+        """
+        @param lx: (ndarray) local x coordinates of blocks
+        @param ly: (ndarray) local y coordinates of blocks
+        @param lz: (ndarray) local z coordinates of blocks
+        @return: (ndarray) IDs of the blocks, the chunk stays packed
+        """
+        if self.array is not None:
+            return self.array[lx, ly, lz]
+        palette = np.array(self.palette, dtype=BLOCK_DTYPE)
+        if not self.bits:
+            return np.full(np.shape(lx), palette[0], dtype=BLOCK_DTYPE)
+        i = (lx * CHUNK_SIZE + ly) * CHUNK_SIZE + lz
+        per_byte = 8 // self.bits
+        packed = np.frombuffer(self.packed, dtype=np.uint8)
+        return palette[packed[i // per_byte] >> ((i % per_byte) * self.bits).astype(np.uint8) & (1 << self.bits) - 1]
+
+    def set(self, local, block):
+        """
+        @param local: (tuple) local coordinates of a block
+        @param block: (int) ID of the new block
+        @return: (int) ID of the block that was replaced
+        """
+        old = self.get(local)
+        if old == block:
+            return old # leaves a packed chunk packed
+        self.blocks[local] = block
+        self.count += (block != BLOCK_AIR) - (old != BLOCK_AIR)
+        return old
+
+    def is_empty(self):
+        return self.count == 0
+
+
+class ChunkStore:
+    """
+    Sparse collection of chunks covering the whole world.
+    """
+    def __init__(self):
+        self.chunks = {}
+        """
+        Maps chunk keys to chunks.
+        """
+        self.column_chunks = {}
+        """
+        Maps (cx, cz) chunk column keys to the set of cy of the chunks stored in the chunk column.
+        """
+        self.heights = Heightmap()
+        """
+        Highest solid block of every column, see heightmap.py.
+        """
+        self.sweep = deque()
+        """
+        Keys of the chunks the current packing sweep has still to visit, see pack_idle.
+        """
+
+    def get_column(self, column):
+        """
+        @param column: (tuple) (cx, cz) key of a chunk column
+        @return: (list) (cy, chunk) of the chunks stored in the chunk column, highest first
+        """
+        return [(cy, self.chunks[(column[0], cy, column[1])])
+                for cy in sorted(self.column_chunks.get(column, ()), reverse=True)]
+
+    def add_chunk(self, chunk):
+        cx, cy, cz = chunk.key
+        self.chunks[chunk.key] = chunk
+        self.column_chunks.setdefault((cx, cz), set()).add(cy)
+
+    def drop_chunk(self, key):
+        cx, cy, cz = key
+        if self.chunks.pop(key, None) is None:
+            return
+        cys = self.column_chunks[(cx, cz)]
+        cys.discard(cy)
+        if not cys:
+            del self.column_chunks[(cx, cz)]
+
+    def get_chunk(self, key):
+        """
+        @param key: (tuple) chunk key
+        @return: (Chunk) the chunk, or None if nothing was ever stored in it
+        """
+        return self.chunks.get(key)
+
+    def set_chunk(self, key, blocks):
+        """
+        Replace a whole chunk.
+        @param key: (tuple) chunk key
+        @param blocks: (ndarray) block IDs indexed by local x, y, z, or None to remove the chunk
+        """
+        if blocks is None or not blocks.any():
+            self.drop_chunk(key)
+        else:
+            self.add_chunk(Chunk(key, blocks))
+        self.heights.replace_chunk(key, blocks, self.get_column((key[0], key[2])))
+
+    def get_block(self, position):
+        """
+        @param position: (tuple) x, y, z world coordinates
+        @return: (int) ID of the block at position, BLOCK_AIR if there is none
+        """
+        chunk = self.chunks.get(chunk_key(position))
+        if chunk is None:
+            return BLOCK_AIR
+        return chunk.get(chunk_local(position))
+
+    def get_blocks(self, positions):
+        """
+        Look up many blocks at once, one dict lookup per distinct chunk instead of one per block.
+        @param positions: (ndarray) shape (n, 3), integer x, y, z world coordinates
+        @return: (ndarray) shape (n,), IDs of the blocks, BLOCK_AIR where there are none
+        """
+        positions = np.asarray(positions, dtype=np.int64).reshape(-1, 3)
+        blocks = np.full(len(positions), BLOCK_AIR, dtype=BLOCK_DTYPE)
+        if not len(positions):
+            return blocks
+        keys, inverse = np.unique(positions // CHUNK_SIZE, axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        local = positions % CHUNK_SIZE
+        for i, key in enumerate(map(tuple, keys.tolist())):
+            chunk = self.chunks.get(key)
+            if chunk is None:
+                continue
+            mask = inverse == i
+            lx, ly, lz = local[mask].T
+            blocks[mask] = chunk.get_many(lx, ly, lz)
+        return blocks
+
+    def set_block(self, position, block):
+        """
+        Store a block, creating its chunk if needed.
+        @param position: (tuple) x, y, z world coordinates
+        @param block: (int) ID of the block to store, BLOCK_AIR removes the block
+        @return: (int) ID of the block that was replaced
+        """
+        key = chunk_key(position)
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            if block == BLOCK_AIR:
+                return BLOCK_AIR
+            chunk = Chunk(key)
+            self.add_chunk(chunk)
+        old = chunk.set(chunk_local(position), block)
+        if chunk.is_empty():
+            self.drop_chunk(key)
+        x, y, z = position
+        if block != BLOCK_AIR:
+            self.heights.raise_to(x, y, z)
+        elif old != BLOCK_AIR and y == self.heights.get(x, z):
+            self.heights.rescan_column(x, z, y, self.get_column((key[0], key[2])))
+        return old
+
+    def get_height(self, x, z):
+        """
+        @param x: (int) x coordinate of a column
+        @param z: (int) z coordinate of a column
+        @return: (int) y of the highest solid block of the column, NO_HEIGHT if it has none
+        """
+        return self.heights.get(x, z)
+
+    def get_heights(self, x, z):
+        """
+        @param x: (ndarray) integer x coordinates of columns
+        @param z: (ndarray) integer z coordinates of columns
+        @return: (ndarray) heights of the columns, see get_height
+        """
+        return self.heights.get_many(x, z)
+
+    def remove_block(self, position):
+        """
+        @param position: (tuple) x, y, z world coordinates
+        @return: (int) ID of the block that was removed, BLOCK_AIR if there was none
+        """
+        return self.set_block(position, BLOCK_AIR)
+
+    def __contains__(self, position):
+        return self.get_block(position) != BLOCK_AIR
+
+    def start_sweep(self):
+        """
+        Start a new packing sweep over every chunk, dropping what is left of the previous one.
+        """
+        self.sweep = deque(self.chunks)
+
+    def pack_idle(self, limit=None):
+        """
+        Continue the packing sweep, packing the chunks whose array was not taken since the last sweep, see Chunk.pack.
+        @param limit: (int) max number of chunks to visit, packed or not, the sweep goes on from there on the next
+                      call, None for no limit
+        @return: (int) number of chunks packed
+        """
+        count = 0
+        visits = len(self.sweep) if limit is None else min(limit, len(self.sweep))
+        for _ in range(visits):
+            chunk = self.chunks.get(self.sweep.popleft())
+            if chunk is None or chunk.is_packed():
+                continue # dropped or packed since the sweep started
+            if chunk.used:
+                chunk.used = False
+            elif chunk.pack():
+                count += 1
+        return count
+
+    def nbytes(self):
+        """
+        @return: (int) bytes of block data held by all chunks
+        """
+        return sum(chunk.nbytes for chunk in self.chunks.values())
+
+    def __len__(self):
+        return len(self.chunks)
@@ -0,0 +1,147 @@
+"""
+Connection to a chunk server, see server.py and protocol.py.
+
+The connection runs its own asyncio event loop on a background thread. That thread reads and decompresses everything
+the server sends and queues it, so the pyglet loop never waits on the network: Map.update takes whatever arrived since
+the last frame. Subscriptions and edits go the other way, they are handed to the event loop and written from there.
+
+"""
+
+from config import *
+from protocol import SUBSCRIBE, UNSUBSCRIBE, EDITS, CHUNK, DELTA, ProtocolError, encode, read_message, encode_keys, \
+    encode_edits, decode_chunk, decode_delta
+
+import asyncio
+import threading
+from collections import deque
+
+
+def parse_address(address):
+    """
+    @param address: (str) "host:port", "host" or ":port" of a server
+    @return: (tuple) (host, port), SERVER_HOST and SERVER_PORT for the parts left out
+    """
+    host, colon, port = address.rpartition(":")
+    if not colon:
+        host, port = port, ""
+    if not port:
+        return host or SERVER_HOST, SERVER_PORT
+    if not port.isdigit() or not 0 < int(port) < 65536:
+        raise ValueError("port must be a number from 1 to 65535, not %r" % port)
+    return host or SERVER_HOST, int(port)
+
+
+class ChunkClient:
+    """
+    Receives chunks and block changes from a server, see above.
+    """
+    def __init__(self, host=SERVER_HOST, port=SERVER_PORT):
+        """
+        Connect to a server, raises OSError if it cannot be reached.
+        @param host: (str) address of the server
+        @param port: (int) port of the server
+        """
+        self.received = deque()
+        """
+        Messages from the server not taken yet, as (CHUNK, key, version, blocks) or
+        (DELTA, key, version, indices, blocks) tuples, see protocol.py.
+        """
+        self.bytes_received = 0
+        self.connected = False
+        """
+        True until the connection is closed.
+        """
+        self.error = None
+        """
+        Why the connection was lost, None while it is open or if close was called.
+        """
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        future = asyncio.run_coroutine_threadsafe(asyncio.open_connection(host, port), self.loop)
+        try:
+            self.reader, self.writer = future.result()
+        except BaseException:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            raise
+        self.connected = True
+        self.receiving = asyncio.run_coroutine_threadsafe(self.receive(), self.loop)
+
+    async def receive(self):
+        """
+        Queue the messages of the server until it disconnects, runs on the client's thread.
+        """
+        try:
+            while True:
+                message = await read_message(self.reader)
+                if message is None:
+                    if self.connected:
+                        self.error = "the server closed the connection"
+                    break
+                kind, payload = message
+                self.bytes_received += len(payload)
+                if kind == CHUNK:
+                    self.received.append((CHUNK,) + decode_chunk(payload))
+                elif kind == DELTA:
+                    self.received.append((DELTA,) + decode_delta(payload))
+                else:
+                    raise ProtocolError("unknown message type %d" % kind)
+        except ProtocolError as e:
+            self.error = "the server sent a bad message: %s" % e
+        finally:
+            self.connected = False
+            self.writer.close()
+
+    def send(self, kind, payload):
+        """
+        Send a message from any thread.
+        @param kind: (int) message type, see protocol.py
+        @param payload: (bytes) payload of the message
+        """
+        if self.connected:
+            self.loop.call_soon_threadsafe(self.writer.write, encode(kind, payload))
+
+    def subscribe(self, keys):
+        """
+        Ask for chunks and all later changes to them. The server sends them in the order given.
+        @param keys: (list) chunk keys
+        """
+        if keys:
+            self.send(SUBSCRIBE, encode_keys(keys))
+
+    def unsubscribe(self, keys):
+        """
+        @param keys: (iterable) keys of chunks the server should stop sending
+        """
+        if keys:
+            self.send(UNSUBSCRIBE, encode_keys(keys))
+
+    def send_edits(self, positions, blocks):
+        """
+        @param positions: (list) x, y, z world coordinates of edited blocks
+        @param blocks: (list) new block IDs, BLOCK_AIR for removed blocks
+        """
+        if len(blocks):
+            self.send(EDITS, encode_edits(positions, blocks))
+
+    def take(self, limit=None):
+        """
+        @param limit: (int) max number of messages to take, None for all of them
+        @return: (list) messages received since the last call, oldest first, see received
+        """
+        count = len(self.received) if limit is None else min(limit, len(self.received))
+        return [self.received.popleft() for _ in range(count)]
+
+    def close(self):
+        """
+        Disconnect and stop the client's thread.
+        """
+        self.connected = False
+        self.loop.call_soon_threadsafe(self.writer.close)
+        try:
+            self.receiving.result() # the closed connection ends it
+        except OSError:
+            pass
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
@@ -0,0 +1,105 @@
+"""
+Collision of the player's bounding box with solid blocks.
+
+Motion is resolved one axis at a time, y first and then x and z. Along each axis the box is swept through every layer of
+blocks between where it starts and where it would end up, nearest layer first, and stops flush against the first layer
+holding a solid block. Since every layer is looked at, no speed or frame time can carry the box through a block, and
+since the other axes still move, the box slides along the surfaces it touches.
+
+Only the blocks in the swept layers are looked up, so a sweep costs about one block lookup per block of box cross
+section per layer crossed. Boxes that start overlapping solid blocks, e.g. after a block was placed inside them, are
+free to move out of them.
+
+Blocks are centered on their integer coordinates, see raycast.py.
+"""
+
+from config import *
+from blocks import BLOCK_AIR
+
+import math
+
+
+EPSILON = 1e-6 # boxes exactly touching a block do not overlap it
+
+
+def player_box(posn):
+    """
+    @param posn: (tuple) x, y, z player position, the position of the camera
+    @return: (tuple) (mins, maxs) corners of the player's bounding box
+    """
+    x, y, z = posn
+    half = PLAYER_WIDTH / 2
+    bottom = y - EYE_HEIGHT
+    return (x - half, bottom, z - half), (x + half, bottom + PLAYER_HEIGHT, z + half)
+
+def cell_range(low, high):
+    """
+    @return: (range) coordinates of the blocks overlapping the interval from low to high along one axis
+    """
+    return range(int(math.floor(low + EPSILON + 0.5)), int(math.floor(high - EPSILON + 0.5)) + 1)
+
+def layer_is_solid(store, axis, layer, mins, maxs):
+    """
+    @param store: (ChunkStore) blocks of the world
+    @param axis: (int) axis the layer is perpendicular to
+    @param layer: (int) coordinate of the layer along the axis
+    @param mins: (list) minimum corner of the box
+    @param maxs: (list) maximum corner of the box
+    @return: (bool) true if any block of the layer overlapped by the box's cross section is solid
+    """
+    a, b = [other for other in range(3) if other != axis]
+    position = [0, 0, 0]
+    position[axis] = layer
+    for i in cell_range(mins[a], maxs[a]):
+        position[a] = i
+        for j in cell_range(mins[b], maxs[b]):
+            position[b] = j
+            if store.get_block(tuple(position)) != BLOCK_AIR:
+                return True
+    return False
+
+def sweep_axis(store, axis, distance, mins, maxs):
+    """
+    Move a box along one axis until it reaches the distance or hits a solid block.
+    @param store: (ChunkStore) blocks of the world
+    @param axis: (int) axis to move along
+    @param distance: (float) signed distance to move
+    @param mins: (list) minimum corner of the box
+    @param maxs: (list) maximum corner of the box
+    @return: (float) signed distance the box can move
+    """
+    if distance > 0:
+        # layers ahead of the box's max face, each starting at layer - 0.5
+        layer = int(math.ceil(maxs[axis] + 0.5 - EPSILON))
+        while layer - 0.5 < maxs[axis] + distance:
+            if layer_is_solid(store, axis, layer, mins, maxs):
+                return max(0.0, layer - 0.5 - maxs[axis])
+            layer += 1
+    elif distance < 0:
+        # layers behind the box's min face, each ending at layer + 0.5
+        layer = int(math.floor(mins[axis] - 0.5 + EPSILON))
+        while layer + 0.5 > mins[axis] + distance:
+            if layer_is_solid(store, axis, layer, mins, maxs):
+                return min(0.0, layer + 0.5 - mins[axis])
+            layer -= 1
+    return distance
+
+def sweep_box(store, mins, maxs, motion):
+    """
+    Move a box through the world, stopping it against solid blocks and sliding it along them.
+    @param store: (ChunkStore) blocks of the world
+    @param mins: (tuple) minimum corner of the box
+    @param maxs: (tuple) maximum corner of the box
+    @param motion: (tuple) x, y, z distance to move the box
+    @return: (tuple) (motion, blocked), the x, y, z distance the box can move and for each axis whether it was stopped
+    """
+    mins = list(mins)
+    maxs = list(maxs)
+    moved = [0.0, 0.0, 0.0]
+    blocked = [False, False, False]
+    for axis in (1, 0, 2):
+        moved[axis] = sweep_axis(store, axis, motion[axis], mins, maxs)
+        blocked[axis] = moved[axis] != motion[axis]
+        mins[axis] += moved[axis]
+        maxs[axis] += moved[axis]
+    return tuple(moved), tuple(blocked)
@@ -6,13 +6,82 @@ from utils import *
 
 
 TICKS_PER_SEC = 60 # how many updates per sec
+FIXED_TIMESTEP = False # if true the world ticks at exactly TICKS_PER_SEC and frames interpolate between ticks
+MAX_TICKS_PER_UPDATE = 5 # fixed timestep ticks run per update at most, the world slows down rather than falling behind
 FLYING_SPEED = 15 # how many blocks you move past per second while flying around
 SIGHT_SPEED = 0.15 # constant adjusting how fast the player looks around
 SIGHT_INVERTED = True # inverts the vertical sight direction
+PICK_DISTANCE = 8 # how many blocks away the player can break and place blocks
+COLLISION = False # if true the player collides with blocks instead of flying through them
+PLAYER_WIDTH = 0.6 # width in blocks of the player's bounding box
+PLAYER_HEIGHT = 1.8 # height in blocks of the player's bounding box
+EYE_HEIGHT = 1.6 # height of the camera above the bottom of the player's bounding box
+
+# === Entities =========================================================================================================
+GRAVITY = 20.0 # downward acceleration of entities in blocks per second squared, see entities.py
+ENTITY_DRAG = 0.5 # fraction of its velocity an entity loses per second
+ENTITY_CAPACITY = 1024 # number of entities there is room for before the entity arrays have to grow
 
 # === Texture Info =====================================================================================================
 TEXTURE_PATH = "src/texture.png"
-GRASS = tex_coords((1, 0), (0, 1), (0, 0))
-SAND = tex_coords((1, 1), (1, 1), (1, 1))
-BRICK = tex_coords((2, 0), (2, 0), (2, 0))
-STONE = tex_coords((2, 1), (2, 1), (2, 1))
+ATLAS_TILES = 4 # number of tiles along each side of the texture atlas
+# atlas tiles of each block as (top, bottom, side)
+GRASS_TILES = ((1, 0), (0, 1), (0, 0))
+SAND_TILES = ((1, 1), (1, 1), (1, 1))
+BRICK_TILES = ((2, 0), (2, 0), (2, 0))
+STONE_TILES = ((2, 1), (2, 1), (2, 1))
+GRASS = tex_coords(*GRASS_TILES)
+SAND = tex_coords(*SAND_TILES)
+BRICK = tex_coords(*BRICK_TILES)
+STONE = tex_coords(*STONE_TILES)
+
+# === World Storage ====================================================================================================
+CHUNK_SIZE = 16 # side length of the cubic chunks the world is stored in
+WORLD_SIZE = 80 # 1/2 width and height of the generated world
+STREAMING = False # if true the world is endless and only chunks near the player are kept loaded
+WORLD_SEED = None # seed of the generated world, None to pick a random one at startup
+TERRAIN = "noise" # terrain of the endless world in streaming mode, "hills" or "noise"
+NOISE_SCALE = 96.0 # width in blocks of the largest features of the noise terrain
+NOISE_OCTAVES = 4 # number of layers of detail of the noise terrain
+TERRAIN_HEIGHT = 24 # max height in blocks of the noise terrain above and below its base level
+SEA_LEVEL = -6 # columns of the noise terrain at or below this height are sand
+REGION_SIZE = 128 # width and height of the regions hills of the endless world are planned in
+LOAD_RADIUS = 13 # horizontal radius in chunks kept loaded around the player in streaming mode
+LOAD_HEIGHT = 2 # vertical radius in chunks kept loaded around the player in streaming mode
+CHUNK_CACHE_BYTES = 32 * 1024 * 1024 # max memory held by unloaded chunks kept for when the player comes back
+PACK_INTERVAL = 10 # seconds between sweeps packing chunks that were not edited since the last one, see chunk.py
+SWEPT_PER_FRAME = 16 # max number of chunks the packing sweep visits per frame, it is spread over as many as it needs
+
+# === Saving ===========================================================================================================
+SAVE_DIR = "saves/default" # directory the game saves a local world in, None to not save it
+REGION_CHUNKS = 8 # chunks per side of the regions saved chunks are grouped into
+AUTOSAVE_INTERVAL = 30 # seconds between saves of changed chunks
+
+# === Server ===========================================================================================================
+SERVER_HOST = "127.0.0.1" # address the chunk server listens on and clients connect to, see server.py
+SERVER_PORT = 25570 # port the chunk server listens on
+SERVER_SEND_BUFFER = 1024 * 1024 # bytes queued for a client before the server holds back more chunks for it
+STREAMED_PER_FRAME = 64 # max chunks and block changes received from the server applied per frame
+
+# === Rendering ========================================================================================================
+FOV = 65.0 # vertical field of view in degrees
+NEAR_PLANE = 0.1 # distance to the near clipping plane
+FAR_PLANE = 200.0 # distance to the far clipping plane, the fog ends here too
+FOG_START = 60.0 # distance the fog starts at
+LOD_DISTANCES = (3, 5, 8) # distances in chunks where chunks switch to 2x, 4x and 8x downsampled meshes, see lod.py
+LOD_HYSTERESIS = 0.5 # chunks past a LOD distance a chunk has to move before it switches level
+MESHER = "greedy" # how chunks are meshed, "culled" for one quad per visible face or "greedy" to merge faces
+VERTEX_FORMAT = "compact" # "compact" for indexed 4 byte vertices, "float" for unindexed float vertices, see geometry.py
+WORKER_COUNT = None # processes generating and meshing chunks, None for one per core, 0 to do it all on the main thread
+OCCLUSION_CULLING = True # if true chunks hidden behind solid chunks are not drawn, see occlusion.py, toggled with O
+UPLOADS_PER_FRAME = 4 # max number of chunk meshes uploaded to the GPU per frame
+SPAWN_RADIUS = 2 # radius in chunks around the player of the spawn area, generated before anything else
+JOBS_IN_FLIGHT = 16 # max number of chunks generated at once, the rest wait in a queue nearest to the player first
+
+# === Profiling ========================================================================================================
+PROFILING = False # if true phase timings are recorded and shown on the HUD, toggled with P in game
+PROFILE_FRAMES = 600 # number of most recent frames the HUD percentiles are computed over
+PROFILE_EVENTS = 16384 # number of most recent timed events kept for the trace
+TRACE_PATH = "saves/trace.json" # where T saves the Chrome trace of the recorded events
+STARTUP_BUDGET = 1.0 # seconds from launch the first frame should be drawn within, the startup report flags it if not
+COLLISION_BUDGET = 0.0005 # seconds of each tick collision may take, bench.py reports how much of it is used
@@ -0,0 +1,118 @@
+"""
+Deciding which chunks are worth drawing.
+
+The camera matrices are rebuilt here with numpy exactly the way Window.set_3d builds them with OpenGL, so culling can be
+run and tested without a display.
+
+=== Frustum Culling ====================================================================================================
+The view frustum is the truncated pyramid of space the camera can see. Each of its six sides is stored as a plane
+(a, b, c, d) with the normal pointing inward, so a point p is inside the frustum when a*x + b*y + c*z + d >= 0 for all
+six planes. A chunk is drawn when its bounding box is at least partly inside all six.
+
+"""
+
+from config import *
+from utils import *
+
+import math
+import numpy as np
+
+
+def perspective(fovy, aspect, near, far):
+    """
+    @return: (ndarray) 4x4 projection matrix, the same as gluPerspective builds
+    """
+    f = 1.0 / math.tan(math.radians(fovy) / 2)
+    return np.array([
+        [f / aspect, 0, 0, 0],
+        [0, f, 0, 0],
+        [0, 0, (far + near) / (near - far), 2 * far * near / (near - far)],
+        [0, 0, -1, 0],
+    ])
+
+def rotation(angle, axis):
+    """
+    @param angle: (float) degrees to rotate counter clockwise around the axis
+    @param axis: (tuple) x, y, z of the axis to rotate around, need not be normalized
+    @return: (ndarray) 4x4 rotation matrix, the same as glRotatef builds
+    """
+    x, y, z = vec_normalize(axis)
+    c = math.cos(math.radians(angle))
+    s = math.sin(math.radians(angle))
+    t = 1 - c
+    return np.array([
+        [x*x*t + c, x*y*t - z*s, x*z*t + y*s, 0],
+        [y*x*t + z*s, y*y*t + c, y*z*t - x*s, 0],
+        [z*x*t - y*s, z*y*t + x*s, z*z*t + c, 0],
+        [0, 0, 0, 1],
+    ])
+
+def translation(offset):
+    """
+    @return: (ndarray) 4x4 translation matrix, the same as glTranslatef builds
+    """
+    matrix = np.identity(4)
+    matrix[:3, 3] = offset
+    return matrix
+
+def camera_matrix(rotn, posn, sight_vec, aspect, fovy=FOV, near=NEAR_PLANE, far=FAR_PLANE):
+    """
+    Build the combined projection and modelview matrix of the player's camera.
+    @param rotn: (tuple) player rotation, see Player.rotn
+    @param posn: (tuple) player position
+    @param sight_vec: (tuple) player sight vector, see Player.get_sight_vec
+    @param aspect: (float) width / height of the window
+    @return: (ndarray) 4x4 matrix taking world coordinates to clip coordinates
+    """
+    horiz_rotn, vert_rotn = rotn
+    if SIGHT_INVERTED:
+        vert_rotn = -vert_rotn
+    modelview = rotation(horiz_rotn, (0, 1, 0))
+    if any(sight_vec[::2]):
+        modelview = modelview @ rotation(vert_rotn, (sight_vec[2]*-1, 0, sight_vec[0]))
+    modelview = modelview @ translation([-c for c in posn])
+    return perspective(fovy, aspect, near, far) @ modelview
+
+def frustum_planes(matrix):
+    """
+    Extract the planes of the view frustum from a camera matrix (Gribb and Hartmann's method).
+    @param matrix: (ndarray) 4x4 matrix returned by camera_matrix
+    @return: (ndarray) shape (6, 4), normalized planes as a, b, c, d with normals pointing inward
+    """
+    rows = np.asarray(matrix)
+    planes = np.array([
+        rows[3] + rows[0], # left
+        rows[3] - rows[0], # right
+        rows[3] + rows[1], # bottom
+        rows[3] - rows[1], # top
+        rows[3] + rows[2], # near
+        rows[3] - rows[2], # far
+    ])
+    return planes / np.linalg.norm(planes[:, :3], axis=1)[:, None]
+
+def boxes_in_frustum(planes, mins, maxs):
+    """
+    Test many axis aligned boxes against a frustum at once.
+    @param planes: (ndarray) frustum planes returned by frustum_planes
+    @param mins: (ndarray) shape (n, 3), minimum corner of each box
+    @param maxs: (ndarray) shape (n, 3), maximum corner of each box
+    @return: (ndarray) shape (n,), true for boxes that are at least partly inside the frustum
+
+    A box is outside when its corner furthest along a plane's normal is still behind that plane. Boxes near the
+    frustum's corners can pass when they are really outside, never the other way around.
+    """
+    mins = np.asarray(mins, dtype=np.float64).reshape(-1, 3)
+    maxs = np.asarray(maxs, dtype=np.float64).reshape(-1, 3)
+    normals = planes[:, :3]
+    # corner of every box furthest along every plane's normal, shape (n, 6, 3)
+    corners = np.where(normals[None, :, :] >= 0, maxs[:, None, :], mins[:, None, :])
+    distances = (corners * normals[None, :, :]).sum(axis=2) + planes[None, :, 3]
+    return (distances >= 0).all(axis=1)
+
+def chunk_boxes(keys):
+    """
+    @param keys: (ndarray) shape (n, 3), chunk keys
+    @return: (tuple) (mins, maxs) corners of the bounding boxes of the chunks, blocks are centered on their coordinates
+    """
+    origins = np.asarray(keys, dtype=np.float64).reshape(-1, 3) * CHUNK_SIZE
+    return origins - 0.5, origins + CHUNK_SIZE - 0.5
@@ -0,0 +1,156 @@
+"""
+Bulk edits of whole regions of the world.
+
+A region is given as a shape. An edit visits only the chunks the shape's bounding box overlaps, and in each of them
+builds the shape's mask over the part of the chunk inside the bounding box and writes the new block with one masked
+array assignment, so the cost grows with the number of chunks touched rather than with a Python call per block.
+Edits only report which chunks changed, it is up to the caller to remesh each of them once, see Map.fill.
+
+=== Shapes =============================================================================================================
+A block belongs to a shape when its center, the integer coordinates of the block, is inside the shape.
+Box: every block from one corner to the other, both included
+Sphere: blocks within a radius of a center
+Cylinder: blocks within a radius of an axis through a base point, from the base up to a height along the axis
+
+"""
+
+from config import *
+from blocks import BLOCK_AIR
+from chunk import BLOCK_DTYPE, chunk_key, chunk_origin
+
+import math
+import numpy as np
+from abc import ABC, abstractmethod
+
+
+class Shape(ABC):
+    """
+    A region of the world, see above.
+    """
+    def __init__(self, low, high):
+        """
+        @param low: (tuple) x, y, z of the minimum corner of the bounding box, included
+        @param high: (tuple) x, y, z of the maximum corner of the bounding box, included
+        """
+        self.low = tuple(int(c) for c in low)
+        self.high = tuple(int(c) for c in high)
+
+    @abstractmethod
+    def mask(self, x, y, z):
+        """
+        @param x: (ndarray) x coordinates of blocks, broadcastable against y and z
+        @param y: (ndarray) y coordinates of blocks
+        @param z: (ndarray) z coordinates of blocks
+        @return: (ndarray) true for the blocks inside the shape, broadcastable against x, y and z
+        """
+
+
+class Box(Shape):
+    def __init__(self, corner, other):
+        """
+        @param corner: (tuple) x, y, z of a corner block
+        @param other: (tuple) x, y, z of the opposite corner block
+        """
+        super().__init__(map(min, corner, other), map(max, corner, other))
+
+    def mask(self, x, y, z):
+        # the bounding box is the box, every block visited is inside
+        return np.True_
+
+
+class Sphere(Shape):
+    def __init__(self, center, radius):
+        """
+        @param center: (tuple) x, y, z of the center
+        @param radius: (float) radius in blocks
+        """
+        self.center = center
+        self.radius = radius
+        super().__init__((math.ceil(c - radius) for c in center), (math.floor(c + radius) for c in center))
+
+    def mask(self, x, y, z):
+        cx, cy, cz = self.center
+        return (x - cx) ** 2 + (y - cy) ** 2 + (z - cz) ** 2 <= self.radius ** 2
+
+
+class Cylinder(Shape):
+    def __init__(self, base, radius, height, axis=1):
+        """
+        @param base: (tuple) x, y, z of the center of the base
+        @param radius: (float) radius in blocks
+        @param height: (int) length in blocks along the axis, base included
+        @param axis: (int) axis of the cylinder, 0 for x, 1 for y, 2 for z
+        """
+        self.base = base
+        self.radius = radius
+        self.axis = axis
+        low = [math.ceil(c - radius) for c in base]
+        high = [math.floor(c + radius) for c in base]
+        low[axis] = base[axis]
+        high[axis] = base[axis] + height - 1
+        super().__init__(low, high)
+
+    def mask(self, x, y, z):
+        offsets = [c - b for c, b in zip((x, y, z), self.base)]
+        offsets[self.axis] = 0
+        return sum(offset ** 2 for offset in offsets) <= self.radius ** 2
+
+
+def chunk_windows(shape):
+    """
+    Split a shape's bounding box along chunk borders.
+    @param shape: (Shape) region of the world
+    @return: (generator) (key, window, (x, y, z)) for every chunk the bounding box overlaps, with the slices of the
+             chunk's blocks inside the box and the world coordinates of the window along each axis, shaped to broadcast
+    """
+    low_key = chunk_key(shape.low)
+    high_key = chunk_key(shape.high)
+    for cx in range(low_key[0], high_key[0] + 1):
+        for cy in range(low_key[1], high_key[1] + 1):
+            for cz in range(low_key[2], high_key[2] + 1):
+                key = (cx, cy, cz)
+                origin = chunk_origin(key)
+                # the part of the chunk inside the bounding box, in local coordinates
+                start = [max(low - o, 0) for low, o in zip(shape.low, origin)]
+                stop = [min(high - o + 1, CHUNK_SIZE) for high, o in zip(shape.high, origin)]
+                window = tuple(slice(a, b) for a, b in zip(start, stop))
+                x = np.arange(origin[0] + start[0], origin[0] + stop[0])[:, None, None]
+                y = np.arange(origin[1] + start[1], origin[1] + stop[1])[None, :, None]
+                z = np.arange(origin[2] + start[2], origin[2] + stop[2])[None, None, :]
+                yield key, window, (x, y, z)
+
+def edit_region(store, shape, block, replace=None):
+    """
+    Set every block of a shape, one masked assignment per chunk.
+    @param store: (ChunkStore) blocks of the world
+    @param shape: (Shape) region to edit
+    @param block: (int) ID of the new block, BLOCK_AIR to clear the region
+    @param replace: (int) only change blocks with this ID, None to change every block
+    @return: (dict) maps the keys of the chunks that changed to (low, high), the minimum and maximum local coordinates
+             of the blocks that changed in the chunk
+    """
+    if replace == block:
+        return {}
+    changed = {}
+    for key, window, (x, y, z) in chunk_windows(shape):
+        chunk = store.get_chunk(key)
+        if chunk is None and (block == BLOCK_AIR if replace is None else replace != BLOCK_AIR):
+            # a missing chunk is all air, clearing it or replacing anything but air in it does nothing
+            continue
+        if chunk is None:
+            blocks = np.zeros((CHUNK_SIZE, CHUNK_SIZE, CHUNK_SIZE), dtype=BLOCK_DTYPE)
+        else:
+            blocks = chunk.blocks
+        old = blocks[window]
+        mask = np.broadcast_to(shape.mask(x, y, z), old.shape) & (old != block)
+        if replace is not None:
+            mask &= old == replace
+        if not mask.any():
+            continue
+        old[mask] = block
+        store.set_chunk(key, blocks)
+        where = np.nonzero(mask)
+        start = [s.start for s in window]
+        changed[key] = (tuple(int(w.min()) + a for w, a in zip(where, start)),
+                        tuple(int(w.max()) + a for w, a in zip(where, start)))
+    return changed
@@ -0,0 +1,155 @@
+"""
+Moving things other than the player, e.g. mobs, projectiles and particles.
+
+Entities are stored as a struct of arrays: the positions of all entities are one contiguous numpy array, their
+velocities another and so on, so a tick moves the whole population with a handful of array operations instead of a
+Python call per entity. Live entities always fill the first count rows of every array. Despawning moves the last row
+into the freed one, so spawning and despawning are O(1) and the arrays never have holes.
+
+Rows move around, so entities are referred to by ID. IDs count up from 0 and are never reused.
+
+=== Physics ============================================================================================================
+Every tick an entity falls with GRAVITY times its gravity scale, loses ENTITY_DRAG of its velocity per second and moves
+by its velocity. Entities only collide with the surface, the top of each column from the heightmap: an entity that ends
+a tick below the surface stands on it, so entities walk up hills and never go underground. A moving entity faces along
+its velocity, its rotation is in degrees like Player.rotn. An entity with a finite lifetime is despawned once it has
+existed for that many seconds.
+
+"""
+
+from config import *
+
+import math
+import numpy as np
+
+
+class Entities:
+    """
+    All entities of the world, see above.
+    """
+    def __init__(self, capacity=ENTITY_CAPACITY):
+        """
+        @param capacity: (int) number of entities the arrays have room for before they have to grow
+        """
+        self.count = 0
+        """
+        Number of live entities, they are in rows 0 to count - 1 of every array.
+        """
+        self.posn = np.zeros((capacity, 3))
+        self.vel = np.zeros((capacity, 3))
+        self.rotn = np.zeros((capacity, 2))
+        """
+        Position, velocity in blocks per second and rotation of each entity.
+        """
+        self.gravity = np.zeros(capacity)
+        self.age = np.zeros(capacity)
+        self.lifetime = np.zeros(capacity)
+        """
+        Gravity scale, seconds since spawning and seconds until despawning (inf to live forever) of each entity.
+        """
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        """
+        ID of the entity in each row.
+        """
+        self.rows = {}
+        """
+        Maps the IDs of live entities to their rows.
+        """
+        self.next_id = 0
+
+    def grow(self):
+        """
+        Double the capacity of every array.
+        """
+        for name in ("posn", "vel", "rotn", "gravity", "age", "lifetime", "ids"):
+            array = getattr(self, name)
+            grown = np.zeros((2 * max(1, len(array)),) + array.shape[1:], dtype=array.dtype)
+            grown[:self.count] = array[:self.count]
+            setattr(self, name, grown)
+
+    def spawn(self, posn, vel=(0, 0, 0), gravity=1.0, lifetime=math.inf):
+        """
+        @param posn: (tuple) x, y, z position
+        @param vel: (tuple) x, y, z velocity in blocks per second
+        @param gravity: (float) how strongly the entity falls, 0 for things that fly
+        @param lifetime: (float) seconds until the entity is despawned, inf to keep it until despawn is called
+        @return: (int) ID of the new entity
+        """
+        if self.count == len(self.ids):
+            self.grow()
+        row = self.count
+        self.posn[row] = posn
+        self.vel[row] = vel
+        self.rotn[row] = 0
+        self.gravity[row] = gravity
+        self.age[row] = 0
+        self.lifetime[row] = lifetime
+        entity = self.next_id
+        self.next_id += 1
+        self.ids[row] = entity
+        self.rows[entity] = row
+        self.count += 1
+        return entity
+
+    def despawn(self, entity):
+        """
+        Remove an entity, does nothing if it is already gone.
+        @param entity: (int) ID of the entity
+        """
+        row = self.rows.pop(entity, None)
+        if row is None:
+            return
+        last = self.count - 1
+        if row != last:
+            # the last entity fills the hole so live entities stay contiguous
+            for array in (self.posn, self.vel, self.rotn, self.gravity, self.age, self.lifetime, self.ids):
+                array[row] = array[last]
+            self.rows[int(self.ids[row])] = row
+        self.count = last
+
+    def get(self, entity):
+        """
+        @param entity: (int) ID of the entity
+        @return: (tuple) (posn, vel, rotn) of the entity as tuples, None if it does not exist
+        """
+        row = self.rows.get(entity)
+        if row is None:
+            return None
+        return tuple(self.posn[row].tolist()), tuple(self.vel[row].tolist()), tuple(self.rotn[row].tolist())
+
+    def tick(self, dt, store=None):
+        """
+        Move every entity, see above.
+        @param dt: (float) seconds to advance by
+        @param store: (ChunkStore) blocks whose surface entities land on, None to let them fall forever
+        """
+        n = self.count
+        if not n:
+            return
+        posn = self.posn[:n]
+        vel = self.vel[:n]
+        vel[:, 1] -= GRAVITY * self.gravity[:n] * dt
+        vel *= max(0.0, 1 - ENTITY_DRAG * dt)
+        posn += vel * dt
+
+        if store is not None:
+            columns = np.floor(posn[:, ::2] + 0.5).astype(np.int64)
+            surface = store.get_heights(columns[:, 0], columns[:, 1]) + 0.5 # top face of the highest block
+            landed = posn[:, 1] < surface
+            posn[landed, 1] = surface[landed]
+            vel[landed, 1] = 0
+
+        rotn = self.rotn[:n]
+        speed = np.sqrt((vel * vel).sum(axis=1))
+        moving = speed > 0
+        rotn[:, 0] = np.where(moving, np.degrees(np.arctan2(vel[:, 0], -vel[:, 2])), rotn[:, 0])
+        rise = np.divide(vel[:, 1], speed, out=np.zeros(n), where=moving)
+        rotn[:, 1] = np.where(moving, np.degrees(np.arcsin(rise)), rotn[:, 1])
+
+        self.age[:n] += dt
+        for row in np.flatnonzero(self.age[:n] >= self.lifetime[:n])[::-1]:
+            # highest rows first, so the rows moved into holes are never ones still to be despawned
+            self.despawn(int(self.ids[row]))
+
+    def __len__(self):
+        return self.count
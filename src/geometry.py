@@ -0,0 +1,149 @@
+"""
+Vectorized construction of block geometry.
+
+Vertex data for any number of faces is built with a handful of numpy operations instead of one cube_vertices call per
+block, the results are contiguous float32 buffers that can be copied straight into a pyglet vertex list.
+
+=== Faces ==============================================================================================================
+Faces are numbered in the order cube_vertices and tex_coords use:
+0: top (+y), 1: bottom (-y), 2: left (-x), 3: right (+x), 4: front (+z), 5: back (-z)
+
+=== Vertex Formats =====================================================================================================
+float: every quad is 4 unshared vertices meant to be drawn as GL_QUADS, 112 bytes per quad.
+    vertices: 3 floats per vertex, x, y, z world coordinates
+    tex_coords: 4 floats per vertex, u and v in blocks across the quad then the bottom left corner of the atlas tile,
+                see shaders.py
+compact: indexed vertices meant to be drawn as GL_TRIANGLES, one chunk per draw call with the chunk origin in a uniform.
+    vertices: 4 unsigned bytes per vertex, x, y, z of the corner relative to the chunk origin (0 to CHUNK_SIZE), then
+              face number * 16 + atlas tile index. The shader works out texture coordinates from the corner position
+              and face, so corners shared by quads of the same face and tile are stored once.
+    indices: 6 unsigned ints per quad, two triangles
+
+"""
+
+from config import *
+from utils import *
+from blocks import BLOCKS
+
+import numpy as np
+
+
+FACES = (
+    (0, 1, 0), # top
+    (0, -1, 0), # bottom
+    (-1, 0, 0), # left
+    (1, 0, 0), # right
+    (0, 0, 1), # front
+    (0, 0, -1), # back
+)
+"""
+Normal of each face, indexed by face number.
+"""
+FACE_AXES = (1, 1, 0, 0, 2, 2)
+"""
+Axis of the normal of each face, indexed by face number.
+"""
+FACE_CORNERS = np.array(cube_vertices(0.5, 0.5, 0.5, 0.5), dtype=np.float32).reshape(6, 4, 3)
+"""
+Corners of each face of the unit cube from (0, 0, 0) to (1, 1, 1), in the order cube_vertices emits them.
+"""
+QUAD_UVS = np.array(((0, 0), (1, 0), (1, 1), (0, 1)), dtype=np.float32)
+"""
+Texture coordinates of the corners of a face within its tile, in the order tex_coord emits them.
+"""
+FACE_U_AXES = np.array((2, 0, 2, 2, 0, 0))
+FACE_V_AXES = np.array((0, 2, 1, 1, 1, 1))
+"""
+Axes along which the u and v texture coordinates of each face run, indexed by face number.
+"""
+
+
+def face_geometry(positions, blocks, faces, extents=None):
+    """
+    Build the vertex data of many quads in one pass.
+    @param positions: (ndarray) shape (n, 3), x, y, z coordinates of the block at the minimum corner of each quad
+    @param blocks: (ndarray) shape (n,), block ID of each quad
+    @param faces: (ndarray) shape (n,), face number of each quad
+    @param extents: (ndarray) shape (n, 3), size of each quad in blocks along x, y and z with 1 along the axis of the
+                    face normal, or None for quads covering a single face
+    @return: (tuple) of contiguous float32 arrays (vertices, tex_coords), see the vertex format above
+    """
+    positions = np.asarray(positions, dtype=np.float32).reshape(-1, 3)
+    blocks = np.asarray(blocks, dtype=np.intp)
+    faces = np.asarray(faces, dtype=np.intp)
+    if extents is None:
+        extents = np.ones_like(positions)
+    else:
+        extents = np.asarray(extents, dtype=np.float32).reshape(-1, 3)
+    count = len(positions)
+
+    vertices = (positions - 0.5)[:, None, :] + FACE_CORNERS[faces] * extents[:, None, :]
+
+    index = np.arange(count)
+    scale = np.stack((extents[index, FACE_U_AXES[faces]], extents[index, FACE_V_AXES[faces]]), axis=1)
+    tex_coords = np.empty((count, 4, 4), dtype=np.float32)
+    tex_coords[:, :, :2] = QUAD_UVS[None, :, :] * scale[:, None, :]
+    tex_coords[:, :, 2:] = BLOCKS.get_face_tile_table()[blocks, faces][:, None, :]
+
+    return np.ascontiguousarray(vertices, dtype=np.float32).ravel(), tex_coords.ravel()
+
+def cube_geometry(positions, blocks):
+    """
+    Build the vertex data of all six faces of many blocks in one pass, the batched version of cube_vertices.
+    @param positions: (ndarray) shape (n, 3), x, y, z coordinates of each block
+    @param blocks: (ndarray) shape (n,), ID of each block
+    @return: (tuple) of contiguous float32 arrays (vertices, tex_coords), 6 quads per block in face number order
+    """
+    positions = np.asarray(positions).reshape(-1, 3)
+    count = len(positions)
+    faces = np.tile(np.arange(6), count)
+    return face_geometry(np.repeat(positions, 6, axis=0), np.repeat(blocks, 6), faces)
+
+def compact_geometry(positions, blocks, faces, extents=None):
+    """
+    Build the vertex data of many quads of one chunk in the compact vertex format.
+    @param positions: (ndarray) shape (n, 3), coordinates of the block at the minimum corner of each quad, relative to
+                      the chunk origin
+    @param blocks: (ndarray) shape (n,), block ID of each quad
+    @param faces: (ndarray) shape (n,), face number of each quad
+    @param extents: (ndarray) shape (n, 3), size of each quad in blocks, see face_geometry
+    @return: (tuple) (vertices, indices), uint8 array of shape (m, 4) and uint32 array of shape (n * 6,)
+    """
+    positions = np.asarray(positions, dtype=np.intp).reshape(-1, 3)
+    blocks = np.asarray(blocks, dtype=np.intp)
+    faces = np.asarray(faces, dtype=np.intp)
+    if extents is None:
+        extents = np.ones_like(positions)
+    extents = np.asarray(extents, dtype=np.intp).reshape(-1, 3)
+    count = len(positions)
+
+    corners = positions[:, None, :] + FACE_CORNERS[faces].astype(np.intp) * extents[:, None, :]
+    tiles = np.rint(BLOCKS.get_face_tile_table()[blocks, faces] * ATLAS_TILES).astype(np.intp)
+    codes = faces * 16 + tiles[:, 1] * ATLAS_TILES + tiles[:, 0]
+    packed = np.empty((count, 4, 4), dtype=np.uint8)
+    packed[:, :, :3] = corners
+    packed[:, :, 3] = codes[:, None]
+
+    # identical vertices are stored once, compare them as whole 32 bit words
+    words = packed.reshape(-1, 4).view(np.uint32).ravel()
+    unique, inverse = np.unique(words, return_inverse=True)
+    corner_indices = inverse.reshape(count, 4).astype(np.uint32)
+    indices = corner_indices[:, [0, 1, 2, 0, 2, 3]].ravel()
+    return unique.view(np.uint8).reshape(-1, 4), indices
+
+def bytes_per_face(mesh, quads):
+    """
+    @param mesh: (tuple) arrays of a mesh in any of the vertex formats
+    @param quads: (int) number of quads in the mesh
+    @return: (float) bytes of vertex and index data per quad, 0 for an empty mesh
+    """
+    if not quads:
+        return 0.0
+    return sum(array.nbytes for array in mesh) / float(quads)
+
+def quad_count(vertices):
+    """
+    @param vertices: (ndarray) vertex array built by this module
+    @return: (int) number of quads in the vertex array
+    """
+    return len(vertices) // 12
@@ -0,0 +1,146 @@
+"""
+Height of the highest solid block of every column of the world.
+
+Heights are kept per column of chunks, a CHUNK_SIZE x CHUNK_SIZE array per chunk column indexed by local x, z, so the
+surface anywhere can be read without probing blocks one y at a time. The ChunkStore keeps its heightmap up to date:
+placing a block can only raise its column, which is one comparison. Removing a block only changes its column when it
+was the top one, then that one column is scanned down from the removed block. Replacing a whole chunk updates its
+columns at once with array operations, only columns whose top block was in the chunk and are empty in the new one are
+scanned down through the chunks below.
+
+"""
+
+from config import *
+from blocks import BLOCK_AIR
+
+import numpy as np
+
+
+NO_HEIGHT = np.iinfo(np.int32).min # height of a column without any solid block
+HEIGHT_DTYPE = np.int32
+
+
+def column_tops(blocks):
+    """
+    @param blocks: (ndarray) block IDs of a chunk indexed by local x, y, z
+    @return: (ndarray) shape (CHUNK_SIZE, CHUNK_SIZE), local y of the highest solid block of each column, -1 where
+             there is none
+    """
+    solid = blocks != BLOCK_AIR
+    top = CHUNK_SIZE - 1 - np.argmax(solid[:, ::-1, :], axis=1)
+    return np.where(solid.any(axis=1), top, -1)
+
+
+class Heightmap:
+    """
+    Highest solid block of every column, see above.
+    """
+    def __init__(self):
+        self.columns = {}
+        """
+        Maps (cx, cz) chunk column keys to the heights of their columns indexed by local x, z, see NO_HEIGHT.
+        """
+
+    def get(self, x, z):
+        """
+        @param x: (int) x coordinate of a column
+        @param z: (int) z coordinate of a column
+        @return: (int) y of the highest solid block of the column, NO_HEIGHT if it has none
+        """
+        heights = self.columns.get((x // CHUNK_SIZE, z // CHUNK_SIZE))
+        if heights is None:
+            return NO_HEIGHT
+        return int(heights[x % CHUNK_SIZE, z % CHUNK_SIZE])
+
+    def get_many(self, x, z):
+        """
+        Look up many columns at once, one dict lookup per chunk column and one gather for all columns.
+        @param x: (ndarray) integer x coordinates of columns
+        @param z: (ndarray) integer z coordinates of columns, the same shape as x
+        @return: (ndarray) heights of the columns, see get
+        """
+        x = np.asarray(x, dtype=np.int64)
+        z = np.asarray(z, dtype=np.int64)
+        if not x.size:
+            return np.full(x.shape, NO_HEIGHT, dtype=HEIGHT_DTYPE)
+        cx = x // CHUNK_SIZE
+        cz = z // CHUNK_SIZE
+        missing = np.full((CHUNK_SIZE, CHUNK_SIZE), NO_HEIGHT, dtype=HEIGHT_DTYPE)
+        low_x, low_z = int(cx.min()), int(cz.min())
+        width, depth = int(cx.max()) - low_x + 1, int(cz.max()) - low_z + 1
+        if width * depth <= x.size:
+            # many columns in a small area, e.g. entities, take every chunk column of the area and skip sorting
+            table = np.stack([self.columns.get((low_x + i, low_z + j), missing)
+                              for i in range(width) for j in range(depth)])
+            index = (cx - low_x) * depth + (cz - low_z)
+        else:
+            # one int per chunk column, unique on ints is much faster than on rows
+            codes = (cx.ravel() - low_x) * depth + (cz.ravel() - low_z)
+            _, first, index = np.unique(codes, return_index=True, return_inverse=True)
+            table = np.stack([self.columns.get(key, missing)
+                              for key in zip(cx.ravel()[first].tolist(), cz.ravel()[first].tolist())])
+            index = index.reshape(x.shape)
+        return table[index, x % CHUNK_SIZE, z % CHUNK_SIZE]
+
+    def raise_to(self, x, y, z):
+        """
+        Account for a solid block placed at a position.
+        """
+        key = (x // CHUNK_SIZE, z // CHUNK_SIZE)
+        heights = self.columns.get(key)
+        if heights is None:
+            heights = np.full((CHUNK_SIZE, CHUNK_SIZE), NO_HEIGHT, dtype=HEIGHT_DTYPE)
+            self.columns[key] = heights
+        local = (x % CHUNK_SIZE, z % CHUNK_SIZE)
+        if y > heights[local]:
+            heights[local] = y
+
+    def rescan_column(self, x, z, y, chunks):
+        """
+        Find the new top of a column after its top block at y was removed.
+        @param chunks: (list) (cy, chunk) of the chunks of the column's chunk column, highest first
+        """
+        heights = self.columns.get((x // CHUNK_SIZE, z // CHUNK_SIZE))
+        if heights is None:
+            return
+        lx, lz = x % CHUNK_SIZE, z % CHUNK_SIZE
+        height = NO_HEIGHT
+        for cy, chunk in chunks:
+            if cy * CHUNK_SIZE > y:
+                continue # only blocks below the removed one can be the top now
+            solid = np.flatnonzero(chunk.get_many(lx, np.arange(min(CHUNK_SIZE, y - cy * CHUNK_SIZE + 1)), lz))
+            if len(solid):
+                height = cy * CHUNK_SIZE + int(solid[-1])
+                break
+        heights[lx, lz] = height
+
+    def replace_chunk(self, key, blocks, chunks):
+        """
+        Account for a whole chunk being replaced.
+        @param key: (tuple) key of the chunk
+        @param blocks: (ndarray) new block IDs of the chunk indexed by local x, y, z, None if it is all air now
+        @param chunks: (list) (cy, chunk) of the chunks of the chunk's chunk column, highest first
+        """
+        cx, cy, cz = key
+        base = cy * CHUNK_SIZE
+        heights = self.columns.get((cx, cz))
+        if heights is None:
+            heights = np.full((CHUNK_SIZE, CHUNK_SIZE), NO_HEIGHT, dtype=HEIGHT_DTYPE)
+        tops = column_tops(blocks) if blocks is not None else np.full((CHUNK_SIZE, CHUNK_SIZE), -1)
+        below = heights < base + CHUNK_SIZE # columns whose top is in or below the chunk
+        lost = below & (heights >= base) & (tops < 0) # top block was in the chunk and is gone
+        heights[below & (tops >= 0)] = base + tops[below & (tops >= 0)]
+        heights[lost] = NO_HEIGHT
+        for lower, chunk in chunks:
+            if not lost.any():
+                break
+            if lower >= cy:
+                continue
+            lower_tops = column_tops(chunk.unpacked())
+            found = lost & (lower_tops >= 0)
+            heights[found] = lower * CHUNK_SIZE + lower_tops[found]
+            lost &= ~found
+        if (heights == NO_HEIGHT).all():
+            self.columns.pop((cx, cz), None)
+        else:
+            self.columns[(cx, cz)] = heights
@@ -0,0 +1,100 @@
+"""
+Level of detail for distant chunks.
+
+Chunks far from the player are meshed from a downsampled copy of their blocks, where every cube of factor**3 blocks
+becomes one big block. A chunk at factor 2 has about a quarter of the faces of the full chunk, at factor 4 a sixteenth,
+so the world can be drawn several times further out for about the same number of vertices.
+
+A downsampled cell is solid when at least half of its blocks are, and takes the most common solid block in it. Its
+faces keep one texture repeat per block, so distant terrain still looks like the same blocks.
+
+=== Hysteresis =========================================================================================================
+A chunk switches to a coarser level only once it is LOD_HYSTERESIS chunks past the distance where that level starts,
+and back to a finer one only once it is LOD_HYSTERESIS chunks inside it. A player moving back and forth across a level
+boundary does not make the chunks there flip between levels and get remeshed every time.
+
+"""
+
+from config import *
+from blocks import BLOCKS, BLOCK_AIR
+from chunk import BLOCK_DTYPE
+
+import math
+import numpy as np
+
+
+LOD_FACTORS = (1, 2, 4, 8)
+"""
+Downsampling factor of each level, level 0 is full detail. Each factor must divide CHUNK_SIZE.
+"""
+
+
+def downsample(blocks, factor):
+    """
+    @param blocks: (ndarray) block IDs of any number of dimensions, each a multiple of factor long
+    @param factor: (int) number of blocks along each axis merged into one cell
+    @return: (ndarray) block IDs of the cells, every dimension factor times shorter
+    """
+    if factor == 1:
+        return blocks
+    shape = []
+    for size in blocks.shape:
+        shape.extend((size // factor, factor))
+    cells = blocks.reshape(shape)
+    ndim = blocks.ndim
+    # bring the blocks of each cell to the end and flatten them
+    cells = cells.transpose(tuple(range(0, 2 * ndim, 2)) + tuple(range(1, 2 * ndim, 2)))
+    cells = cells.reshape(cells.shape[:ndim] + (-1,))
+    counts = np.stack([(cells == block).sum(axis=-1) for block in range(1, len(BLOCKS))], axis=-1)
+    most_common = counts.argmax(axis=-1) + 1
+    solid = counts.sum(axis=-1) * 2 >= cells.shape[-1]
+    return np.where(solid, most_common, BLOCK_AIR).astype(BLOCK_DTYPE)
+
+def downsample_padded(padded, factor):
+    """
+    Downsample a padded block array, see padded_blocks, keeping a one cell border.
+    The border cells come from the one block layers of the neighbors in the full array, so they are a rough guess of
+    the neighbors at this level.
+    @param padded: (ndarray) padded block IDs of shape (CHUNK_SIZE+2,)*3
+    @param factor: (int) downsampling factor
+    @return: (ndarray) padded block IDs of shape (CHUNK_SIZE/factor+2,)*3
+    """
+    if factor == 1:
+        return padded
+    n = CHUNK_SIZE // factor
+    coarse = np.zeros((n + 2, n + 2, n + 2), dtype=BLOCK_DTYPE)
+    coarse[1:-1, 1:-1, 1:-1] = downsample(padded[1:-1, 1:-1, 1:-1], factor)
+    for axis in range(3):
+        for side in (0, -1):
+            src = [slice(1, -1)] * 3
+            src[axis] = side
+            dst = [slice(1, -1)] * 3
+            dst[axis] = side
+            coarse[tuple(dst)] = downsample(padded[tuple(src)], factor)
+    return coarse
+
+def lod_level(distance, current=None):
+    """
+    Pick the level of detail of a chunk.
+    @param distance: (float) distance from the player to the center of the chunk, in chunks
+    @param current: (int) level the chunk is at now, None if it has none yet
+    @return: (int) index into LOD_FACTORS
+    """
+    level = sum(distance >= start for start in LOD_DISTANCES)
+    if current is None or level == current:
+        return level
+    # stay at the current level while within the hysteresis margin of its range
+    low = LOD_DISTANCES[current - 1] if current > 0 else -math.inf
+    high = LOD_DISTANCES[current] if current < len(LOD_DISTANCES) else math.inf
+    if low - LOD_HYSTERESIS <= distance < high + LOD_HYSTERESIS:
+        return current
+    return level
+
+def chunk_distance(key, position):
+    """
+    @param key: (tuple) chunk key
+    @param position: (tuple) x, y, z world coordinates
+    @return: (float) distance from the position to the center of the chunk, in chunks
+    """
+    center = [(c + 0.5) * CHUNK_SIZE - 0.5 for c in key]
+    return math.sqrt(sum((a - b) ** 2 for a, b in zip(center, position))) / CHUNK_SIZE
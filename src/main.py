@@ -3,9 +3,16 @@ Entry point of the program.
 This file handles the logisitics of input/output and calls into the World class for the modelling.
 """
 
+import time
+START_TIME = time.perf_counter() # before the other imports, they take a good part of the startup time
+
 from world import World
+from renderer import ChunkRenderer
+from client import ChunkClient, parse_address
+from profiler import PROFILER, StartupTimer
 from config import *
 
+import argparse
 import math
 from pyglet.gl import *
 from pyglet.window import key, mouse
@@ -15,14 +22,27 @@ class Window(pyglet.window.Window):
     """
     Handles the housekeeping, e.g. windowing, resizing, key presses, ...
     """
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, source=None, **kwargs):
+        """
+        @param source: (ChunkClient) connection to the server to play on, None to play a local world
+        """
         super(Window, self).__init__(*args, **kwargs)
-        self.world = World()
+        self.source = source
+        self.disconnected = False
+        """
+        Set once the connection to the server was lost, see check_connection.
+        """
+        self.world = World(ChunkRenderer(), source, save_dir=None if source else SAVE_DIR)
+        self.startup = StartupTimer(START_TIME, {"first frame": STARTUP_BUDGET})
         self.mcap = False # mouse capture flag
         self.crosshair = None
         # text that is displayed in the top left of the screen
         self.label = pyglet.text.Label('', font_name='Arial', font_size=18, x=10, y=self.height - 10, anchor_x='left',
                                        anchor_y='top', color=(0, 0, 0, 255))
+        # phase timings shown below the label while profiling
+        self.profile_label = pyglet.text.Label('', font_name='Arial', font_size=12, x=10, y=self.height - 40,
+                                               anchor_x='left', anchor_y='top', color=(0, 0, 0, 255), multiline=True,
+                                               width=400)
         # schedules world's update() method to be called TICKS_PER_SEC times per second
         pyglet.clock.schedule_interval(self.world.update, 1.0 / TICKS_PER_SEC)
 
@@ -34,6 +54,13 @@ class Window(pyglet.window.Window):
         super(Window, self).set_exclusive_mouse(mcap)
         self.mcap = mcap
 
+    def on_close(self):
+        """
+        Called when the window is closed.
+        """
+        self.world.close()
+        super(Window, self).on_close()
+
     def on_mouse_press(self, x, y, button, modifiers):
         """
         Called when a mouse button is pressed.
@@ -42,7 +69,12 @@ class Window(pyglet.window.Window):
         @param button: int representing mouse button that was cliked, 1=left, 4=right
         @param modifiers: int representing any modifying keys also pressed when mouse clicked
         """
-        self.set_mcap(True)
+        if not self.mcap:
+            self.set_mcap(True)
+        elif button == mouse.LEFT:
+            self.world.break_block()
+        elif button == mouse.RIGHT:
+            self.world.place_block()
 
     def on_mouse_motion(self, x, y, dx, dy):
         """
@@ -73,6 +105,14 @@ class Window(pyglet.window.Window):
             self.world.add_up_strafe()
         elif symbol == key.F:
             self.world.remove_up_strafe()
+        elif symbol == key.M:
+            self.world.toggle_mesher()
+        elif symbol == key.O:
+            self.world.toggle_occlusion()
+        elif symbol == key.P:
+            PROFILER.set_enabled(not PROFILER.enabled)
+        elif symbol == key.T:
+            PROFILER.export_trace(TRACE_PATH)
         elif symbol == key.ESCAPE:
             self.set_mcap(False)
 
@@ -103,6 +143,7 @@ class Window(pyglet.window.Window):
         @height: New window height
         """
         self.label.y = height - 10 # resize label
+        self.profile_label.y = height - 40
         # resize crosshair
         if self.crosshair:
             self.crosshair.delete()
@@ -126,9 +167,10 @@ class Window(pyglet.window.Window):
         glMatrixMode(GL_MODELVIEW)
         glLoadIdentity()
 
-    def set_3d(self):
+    def set_3d(self, state):
         """
         Configure opengl to draw in 3d.
+        @param state: (PlayerState) player whose view to draw, see World.get_player_state
         """
         width, height = self.get_size()
         glEnable(GL_DEPTH_TEST)
@@ -136,39 +178,77 @@ class Window(pyglet.window.Window):
         glViewport(0, 0, max(1, viewport[0]), max(1, viewport[1]))
         glMatrixMode(GL_PROJECTION)
         glLoadIdentity()
-        gluPerspective(65.0, width / float(height), 0.1, 60.0)
+        gluPerspective(FOV, width / float(height), NEAR_PLANE, FAR_PLANE)
         glMatrixMode(GL_MODELVIEW)
         glLoadIdentity()
-        horiz_rotn, vert_rotn = self.world.get_player_rotn()
+        horiz_rotn, vert_rotn = state.rotn
         glRotatef(horiz_rotn, 0, 1, 0) # rotate the camera horizontally (around vertical vector)
-        sight_vec = self.world.get_player_sight_vec()
+        sight_vec = state.sight_vec
         if SIGHT_INVERTED:
             glRotatef(-vert_rotn, sight_vec[2]*-1, 0, sight_vec[0]) # rotate the camera vertically, around the sight vector
         else:
             glRotatef(vert_rotn, sight_vec[2]*-1, 0, sight_vec[0]) # rotate the camera vertically, around the sight vector
-        x, y, z = self.world.get_player_posn() # translate the camera to the current player position
+        x, y, z = state.posn # translate the camera to the current player position
         glTranslatef(-x, -y, -z)
 
     def on_draw(self):
         self.clear()
-        self.set_3d()
+        state = self.world.get_player_state() # read once so the whole frame sees the same player
+        self.set_3d(state)
         glColor3d(1, 1, 1)
-        self.world.draw()
+        width, height = self.get_size()
+        self.world.draw(width / float(height), state)
         self.set_2d()
-        self.draw_label()
+        self.draw_label(state)
         # draw the crosshair
         glColor3d(0, 0, 0)
         self.crosshair.draw(GL_LINES)
+        PROFILER.end_frame()
+        self.check_startup()
+        self.check_connection()
+
+    def check_startup(self):
+        """
+        Time how long the game took to draw its first frame, to generate the spawn area and to finish the whole world.
+        """
+        marks = self.startup.marks
+        if "first frame" not in marks:
+            self.startup.mark("first frame")
+            if "first frame" in self.startup.over_budget():
+                print(self.startup.report())
+        if "spawn area" not in marks and self.world.is_spawn_ready():
+            self.startup.mark("spawn area")
+        if "world complete" not in marks and self.world.is_complete():
+            self.startup.mark("world complete")
+            print(self.startup.report())
+
+    def check_connection(self):
+        """
+        Tell the player when the connection to the server is lost, the world stops changing from then on.
+        """
+        if self.source and not self.source.connected and not self.disconnected:
+            self.disconnected = True
+            print("disconnected: %s" % self.source.error)
 
-    def draw_label(self):
+    def draw_label(self, state):
         """
         Draw the label in the top left of the screen.
+        @param state: (PlayerState) player to show the position and rotation of
         """
-        x, y, z = self.world.get_player_posn()
-        horiz, vert = self.world.get_player_rotn()
-        self.label.text = "fps: %02d, posn: (%.2f, %.2f, %.2f), rotn: (%.2f, %.2f)" % (
-            pyglet.clock.get_fps(), x, y, z, horiz, vert)
+        x, y, z = state.posn
+        horiz, vert = state.rotn
+        drawn, culled = self.world.get_chunk_counts()
+        self.label.text = "fps: %02d, posn: (%.2f, %.2f, %.2f), rotn: (%.2f, %.2f), chunks: %d/%d" % (
+            pyglet.clock.get_fps(), x, y, z, horiz, vert, drawn, drawn + culled)
+        if self.disconnected:
+            self.label.text += ", disconnected: %s" % self.source.error
         self.label.draw()
+        if PROFILER.enabled:
+            lines = []
+            for phase, (p50, p99) in PROFILER.percentiles().items():
+                lines.append("%s: p50 %.2f ms, p99 %.2f ms" % (phase, p50 * 1000, p99 * 1000))
+            self.profile_label.text = "\n".join(lines)
+            self.profile_label.draw()
 
 
 def setup_opengl():
@@ -181,12 +261,26 @@ def setup_opengl():
     glFogfv(GL_FOG_COLOR, (GLfloat * 4)(0.5, 0.69, 1.0, 1)) # set fog color
     glHint(GL_FOG_HINT, GL_DONT_CARE)
     glFogi(GL_FOG_MODE, GL_LINEAR)
-    glFogf(GL_FOG_START, 20.0)
-    glFogf(GL_FOG_END, 60.0)
+    glFogf(GL_FOG_START, FOG_START)
+    glFogf(GL_FOG_END, FAR_PLANE)
 
 
 def main():
-    window = Window(width=800, height=600, caption="voxels", resizable=True)
+    parser = argparse.ArgumentParser(description="Explore a voxel world.")
+    parser.add_argument("--connect", metavar="HOST[:PORT]", help="play on a chunk server instead of a local world, "
+                        "port %d if left out" % SERVER_PORT)
+    args = parser.parse_args()
+    source = None
+    if args.connect is not None:
+        try:
+            host, port = parse_address(args.connect)
+        except ValueError as e:
+            parser.error("--connect: %s" % e)
+        try:
+            source = ChunkClient(host, port)
+        except OSError as e:
+            parser.error("--connect: cannot reach %s:%d: %s" % (host, port, e))
+    window = Window(width=800, height=600, caption="voxels", resizable=True, source=source)
     window.set_mcap(True)
     setup_opengl()
     pyglet.app.run()
@@ -0,0 +1,211 @@
+"""
+Turns chunks of blocks into vertex data that can be uploaded to pyglet.
+
+Only faces of solid blocks that touch air are emitted, faces buried between two solid blocks can never be seen. The
+culled mesher emits one quad per visible face, the greedy mesher merges neighboring coplanar faces of the same block
+type into larger quads. The meshers only depend on numpy so they can be run and tested without a display.
+
+Face numbers and the vertex format meshers return are described in geometry.py.
+
+"""
+
+from config import *
+from blocks import BLOCK_AIR
+from chunk import BLOCK_DTYPE, chunk_origin
+from geometry import FACES, FACE_AXES, face_geometry, compact_geometry, quad_count
+from lod import downsample_padded
+from occlusion import face_connectivity
+
+import numpy as np
+
+
+def padded_blocks(store, key):
+    """
+    Copy the blocks of a chunk into an array with a one block border taken from its neighbors.
+    @param store: (ChunkStore) store containing the chunk
+    @param key: (tuple) key of the chunk
+    @return: (ndarray) block IDs of shape (CHUNK_SIZE+2,)*3, local (0, 0, 0) of the chunk is at index (1, 1, 1)
+
+    Only the six face neighbors are copied in, the edges and corners of the border are always air.
+    """
+    n = CHUNK_SIZE
+    padded = np.zeros((n + 2, n + 2, n + 2), dtype=BLOCK_DTYPE)
+    chunk = store.get_chunk(key)
+    if chunk is not None:
+        padded[1:-1, 1:-1, 1:-1] = chunk.unpacked()
+    cx, cy, cz = key
+    for dx, dy, dz in FACES:
+        neighbor = store.get_chunk((cx + dx, cy + dy, cz + dz))
+        if neighbor is None:
+            continue
+        # the layer of the neighbor touching this chunk goes into the matching border layer of the padded array
+        src = tuple(slice(None) if d == 0 else (n - 1 if d < 0 else 0) for d in (dx, dy, dz))
+        dst = tuple(slice(1, -1) if d == 0 else (0 if d < 0 else n + 1) for d in (dx, dy, dz))
+        padded[dst] = neighbor.unpacked()[src]
+    return padded
+
+def exposed_faces(padded):
+    """
+    Find which faces of which blocks are visible.
+    @param padded: (ndarray) padded block IDs, see padded_blocks
+    @return: (list) of 6 boolean arrays of shape (CHUNK_SIZE,)*3, indexed by face number, true where the block is solid
+             and its neighbor in the direction of the face is air
+    """
+    inner = padded[1:-1, 1:-1, 1:-1]
+    solid = inner != BLOCK_AIR
+    masks = []
+    for dx, dy, dz in FACES:
+        neighbor = padded[1+dx:padded.shape[0]-1+dx, 1+dy:padded.shape[1]-1+dy, 1+dz:padded.shape[2]-1+dz]
+        masks.append(solid & (neighbor == BLOCK_AIR))
+    return masks
+
+def culled_quads(padded):
+    """
+    Find all exposed faces of a chunk, one quad per face.
+    @param padded: (ndarray) padded block IDs, see padded_blocks
+    @return: (tuple) of arrays (positions, blocks, faces, extents) describing the quads, see face_geometry, positions
+             are local to the chunk
+    """
+    inner = padded[1:-1, 1:-1, 1:-1]
+    positions = []
+    faces = []
+    for face, mask in enumerate(exposed_faces(padded)):
+        local = np.argwhere(mask)
+        positions.append(local)
+        faces.append(np.full(len(local), face))
+    positions = np.concatenate(positions)
+    blocks = inner[tuple(positions.T)]
+    return positions, blocks, np.concatenate(faces), np.ones_like(positions)
+
+def greedy_quads(padded):
+    """
+    Find all exposed faces of a chunk, merging neighboring coplanar faces of the same block type into as few rectangles
+    as possible.
+    @param padded: (ndarray) padded block IDs, see padded_blocks
+    @return: (tuple) of arrays (positions, blocks, faces, extents) describing the quads, see culled_quads
+    """
+    inner = padded[1:-1, 1:-1, 1:-1]
+    positions = []
+    blocks = []
+    faces = []
+    extents = []
+    for face, mask in enumerate(exposed_faces(padded)):
+        axis = FACE_AXES[face]
+        a, b = [i for i in range(3) if i != axis]
+        # block IDs of the exposed faces, with the face normal axis first and 0 where no face is exposed
+        exposed = np.moveaxis(np.where(mask, inner, BLOCK_AIR), (axis, a, b), (0, 1, 2))
+        for layer in np.flatnonzero(exposed.any(axis=(1, 2))):
+            plane = exposed[layer].copy()
+            size_a, size_b = plane.shape
+            for i in range(size_a):
+                j = 0
+                while j < size_b:
+                    block = plane[i, j]
+                    if block == BLOCK_AIR:
+                        j += 1
+                        continue
+                    # grow the rectangle along b, then along a for as long as whole rows match
+                    h = 1
+                    while j + h < size_b and plane[i, j + h] == block:
+                        h += 1
+                    w = 1
+                    while i + w < size_a and (plane[i + w, j:j + h] == block).all():
+                        w += 1
+                    plane[i:i + w, j:j + h] = BLOCK_AIR
+                    position = [0, 0, 0]
+                    position[axis], position[a], position[b] = layer, i, j
+                    extent = [1, 1, 1]
+                    extent[a], extent[b] = w, h
+                    positions.append(position)
+                    blocks.append(block)
+                    faces.append(face)
+                    extents.append(extent)
+                    j += h
+    return (np.array(positions, dtype=np.intp).reshape(-1, 3), np.array(blocks, dtype=np.intp),
+            np.array(faces, dtype=np.intp), np.array(extents, dtype=np.intp).reshape(-1, 3))
+
+def mesh_padded(padded, origin=(0, 0, 0)):
+    """
+    Build the vertex data of all exposed faces of a chunk, one quad per face.
+    @param padded: (ndarray) padded block IDs, see padded_blocks
+    @param origin: (tuple) world coordinates of local (0, 0, 0) of the chunk
+    @return: (tuple) of float32 arrays (vertices, tex_coords), see geometry.py
+    """
+    return build_mesh(padded, origin, "culled", "float")
+
+def greedy_mesh_padded(padded, origin=(0, 0, 0)):
+    """
+    Build the vertex data of all exposed faces of a chunk with merged faces, see greedy_quads.
+    @param padded: (ndarray) padded block IDs, see padded_blocks
+    @param origin: (tuple) world coordinates of local (0, 0, 0) of the chunk
+    @return: (tuple) of float32 arrays (vertices, tex_coords), see geometry.py
+
+    Texture coordinates of a merged quad run from 0 to its size in blocks, the tile shader wraps them so the block
+    texture repeats once per block.
+    """
+    return build_mesh(padded, origin, "greedy", "float")
+
+def build_mesh(padded, origin, mesher=MESHER, vertex_format=VERTEX_FORMAT, factor=1):
+    """
+    Mesh a chunk into the vertex data of one of the vertex formats.
+    @param padded: (ndarray) padded block IDs, see padded_blocks
+    @param origin: (tuple) world coordinates of local (0, 0, 0) of the chunk
+    @param mesher: (str) name of the mesher to use, see MESHERS
+    @param vertex_format: (str) "float" for (vertices, tex_coords) from face_geometry, "compact" for (vertices, indices)
+                          from compact_geometry, see geometry.py
+    @param factor: (int) level of detail downsampling factor, see lod.py, 1 for full detail
+    @return: (tuple) of arrays of the mesh
+    """
+    positions, blocks, faces, extents = get_mesher(mesher)(downsample_padded(padded, factor))
+    if factor != 1:
+        positions = positions * factor
+        extents = extents * factor
+    if vertex_format == "float":
+        return face_geometry(positions + origin, blocks, faces, extents)
+    elif vertex_format == "compact":
+        return compact_geometry(positions, blocks, faces, extents)
+    raise ValueError("unknown vertex format '%s', expected float or compact" % vertex_format)
+
+def build_chunk(padded, origin, mesher=MESHER, vertex_format=VERTEX_FORMAT, factor=1):
+    """
+    Mesh a chunk and work out which of its faces its air connects, this is what mesh jobs run.
+    @return: (tuple) (mesh, connectivity), see build_mesh and occlusion.py
+    """
+    return build_mesh(padded, origin, mesher, vertex_format, factor), face_connectivity(padded[1:-1, 1:-1, 1:-1])
+
+def get_mesher(name):
+    """
+    @param name: (str) name of a mesher, a key of MESHERS
+    @return: (function) the mesher, taking a padded block array and returning quads, see culled_quads
+    """
+    try:
+        return MESHERS[name]
+    except KeyError:
+        raise ValueError("unknown mesher '%s', expected one of %s" % (name, ", ".join(MESHERS)))
+
+def mesh_chunk(store, key, mesher=MESHER, vertex_format="float"):
+    """
+    Build the vertex data of all exposed faces of a chunk in a store.
+    @param store: (ChunkStore) store containing the chunk
+    @param key: (tuple) key of the chunk
+    @param mesher: (str) name of the mesher to use, see MESHERS
+    @param vertex_format: (str) vertex format of the mesh, see build_mesh
+    @return: (tuple) of arrays of the mesh, see build_mesh
+    """
+    return build_mesh(padded_blocks(store, key), chunk_origin(key), mesher, vertex_format)
+
+def face_count(vertices):
+    """
+    @param vertices: (ndarray) vertex array of a float format mesh
+    @return: (int) number of quads in the mesh
+    """
+    return quad_count(vertices)
+
+
+MESHERS = {
+    "culled": culled_quads,
+    "greedy": greedy_quads,
+}
+"""
+Maps mesher names to mesher functions.
+"""
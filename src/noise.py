@@ -0,0 +1,78 @@
+"""
+Seeded gradient noise evaluated on whole numpy arrays of coordinates at once.
+
+The noise only depends on the seed and the coordinates it is evaluated at, so any part of the world can be generated on
+its own, in any order and in any process, and always comes out the same.
+"""
+
+import numpy as np
+
+
+GRADIENTS = np.array([(1, 1), (-1, 1), (1, -1), (-1, -1), (1, 0), (-1, 0), (0, 1), (0, -1)], dtype=np.float64)
+"""
+Gradient directions of the lattice points.
+"""
+
+
+def permutation(seed):
+    """
+    @param seed: (int) noise seed
+    @return: (ndarray) permutation of 0 to 255 picked by the seed, repeated twice so lookups never need to wrap
+    """
+    perm = np.random.default_rng(seed).permutation(256)
+    return np.concatenate((perm, perm))
+
+def fade(t):
+    """
+    Perlin's smootherstep curve, eases coordinates toward the lattice points.
+    """
+    return t * t * t * (t * (t * 6 - 15) + 10)
+
+def perlin(x, z, perm):
+    """
+    2d Perlin noise.
+    @param x: (ndarray) x coordinates, in lattice cells
+    @param z: (ndarray) z coordinates, broadcastable against x
+    @param perm: (ndarray) permutation returned by permutation
+    @return: (ndarray) noise values roughly in -1 to 1, shaped like x and z broadcast together
+    """
+    x0 = np.floor(x)
+    z0 = np.floor(z)
+    fx = x - x0
+    fz = z - z0
+    xi = x0.astype(np.int64) & 255
+    zi = z0.astype(np.int64) & 255
+
+    def corner(dx, dz):
+        gradient = GRADIENTS[perm[perm[xi + dx] + zi + dz] & 7]
+        return gradient[..., 0] * (fx - dx) + gradient[..., 1] * (fz - dz)
+
+    u = fade(fx)
+    v = fade(fz)
+    bottom = corner(0, 0) + u * (corner(1, 0) - corner(0, 0))
+    top = corner(0, 1) + u * (corner(1, 1) - corner(0, 1))
+    return bottom + v * (top - bottom)
+
+def fractal(x, z, seed, octaves=4, persistence=0.5, lacunarity=2.0):
+    """
+    Sum several octaves of Perlin noise, each with a finer scale and smaller amplitude than the last.
+    @param x: (ndarray) x coordinates, in lattice cells of the first octave
+    @param z: (ndarray) z coordinates, broadcastable against x
+    @param seed: (int) noise seed
+    @param octaves: (int) number of octaves to sum
+    @param persistence: (float) amplitude of each octave relative to the last
+    @param lacunarity: (float) frequency of each octave relative to the last
+    @return: (ndarray) noise values roughly in -1 to 1
+    """
+    total = 0.0
+    amplitude = 1.0
+    frequency = 1.0
+    norm = 0.0
+    for octave in range(octaves):
+        # every octave gets its own lattice so their features do not line up
+        perm = permutation((seed, octave))
+        total = total + amplitude * perlin(x * frequency, z * frequency, perm)
+        norm += amplitude
+        amplitude *= persistence
+        frequency *= lacunarity
+    return total / norm
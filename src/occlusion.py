@@ -0,0 +1,143 @@
+"""
+Occlusion culling between chunks, also known as cave culling.
+
+When a chunk is meshed, its air is split into the regions of cells connected through shared sides, and every pair of
+chunk faces that some region touches both of is recorded as connected. A chunk of solid stone connects no faces, an
+empty chunk connects all of them. Each frame a breadth first search starts in the camera's chunk and walks into a
+neighbor through a face only when the air of the current chunk connects the face it was entered through to the face it
+leaves through. The walk never goes back in a direction opposite to one it already went in and skips chunks outside the
+view frustum, so chunks it never reaches are hidden behind solid blocks and need not be drawn.
+
+A chunk can be drawn that is really hidden, never the other way around.
+
+=== Connectivity =======================================================================================================
+An int with bit a * 6 + b set when faces a and b are connected, faces are numbered as in geometry.py.
+Chunks that were never meshed, e.g. ones with no blocks, are treated as empty.
+
+"""
+
+from blocks import BLOCK_AIR
+from geometry import FACES
+from culling import boxes_in_frustum, chunk_boxes
+
+import numpy as np
+
+
+OPEN = (1 << 36) - 1 # connectivity of an empty chunk, every face connects to every face
+CLOSED = 0 # connectivity of a solid chunk
+OPPOSITE = (1, 0, 3, 2, 5, 4)
+"""
+Face number of the opposite face of each face.
+"""
+
+
+def face_cells(cells):
+    """
+    @param cells: (ndarray) array indexed by local x, y, z of a chunk
+    @return: (list) the layer of cells against each face of the chunk, indexed by face number
+    """
+    return [cells[:, -1, :], cells[:, 0, :], cells[0, :, :], cells[-1, :, :], cells[:, :, -1], cells[:, :, 0]]
+
+def air_regions(empty):
+    """
+    Label the regions of air cells connected through shared sides.
+    @param empty: (ndarray) bool array, true for air cells
+    @return: (ndarray) int array of the same shape, cells of one region share a label, solid cells are labeled alone
+    """
+    labels = np.arange(empty.size)
+    flat = empty.ravel()
+    strides = [stride // empty.itemsize for stride in empty.strides]
+    starts = []
+    ends = []
+    for axis, stride in enumerate(strides):
+        # pairs of neighboring air cells along the axis
+        lower = [slice(None)] * 3
+        upper = [slice(None)] * 3
+        lower[axis] = slice(None, -1)
+        upper[axis] = slice(1, None)
+        pairs = empty[tuple(lower)] & empty[tuple(upper)]
+        # flat index of the lower cell of each pair in the full array
+        start = np.ravel_multi_index(np.nonzero(pairs), empty.shape)
+        starts.append(start)
+        ends.append(start + stride)
+    starts = np.concatenate(starts)
+    ends = np.concatenate(ends)
+
+    # hook the larger label of every pair onto the smaller one and flatten the label trees, until no pair disagrees
+    while len(starts):
+        a = labels[starts]
+        b = labels[ends]
+        differ = a != b
+        if not differ.any():
+            break
+        starts = starts[differ]
+        ends = ends[differ]
+        np.minimum.at(labels, np.maximum(a[differ], b[differ]), np.minimum(a[differ], b[differ]))
+        while True:
+            jumped = labels[labels]
+            if (jumped == labels).all():
+                break
+            labels = jumped
+    labels[~flat] = -1
+    return labels.reshape(empty.shape)
+
+def face_connectivity(blocks):
+    """
+    @param blocks: (ndarray) block IDs of a chunk indexed by local x, y, z
+    @return: (int) which faces of the chunk its air connects, see above
+    """
+    empty = blocks == BLOCK_AIR
+    if empty.all():
+        return OPEN
+    if not empty.any():
+        return CLOSED
+    faces = [np.unique(layer[layer >= 0]) for layer in face_cells(air_regions(empty))]
+    connectivity = 0
+    for a in range(6):
+        for b in range(a, 6):
+            if len(faces[a]) and len(faces[b]) and (a == b or len(np.intersect1d(faces[a], faces[b]))):
+                connectivity |= 1 << (a * 6 + b) | 1 << (b * 6 + a)
+    return connectivity
+
+def connects(connectivity, a, b):
+    """
+    @return: (bool) true if a chunk's air connects faces a and b
+    """
+    return bool(connectivity >> (a * 6 + b) & 1)
+
+def reachable_chunks(connectivity, start, planes, low, high):
+    """
+    Find the chunks the camera could see through air, see above.
+    @param connectivity: (dict) maps chunk keys to their connectivity, chunks missing from it are empty
+    @param start: (tuple) key of the chunk the camera is in
+    @param planes: (ndarray) view frustum planes, see culling.py
+    @param low: (tuple) minimum chunk key the walk may go to
+    @param high: (tuple) maximum chunk key the walk may go to
+    @return: (set) keys of the chunks reached inside the view frustum, plus the camera's chunk
+    """
+    seen = {start}
+    reached = {start}
+    frontier = [(start, None, 0)] # chunk key, face it was entered through, bit mask of the directions gone in
+    while frontier:
+        candidates = {}
+        for key, entered, directions in frontier:
+            chunk_connectivity = connectivity.get(key, OPEN)
+            for face, (dx, dy, dz) in enumerate(FACES):
+                if directions & 1 << OPPOSITE[face]:
+                    continue
+                if entered is not None and not connects(chunk_connectivity, entered, face):
+                    continue
+                neighbor = (key[0] + dx, key[1] + dy, key[2] + dz)
+                if neighbor in seen or neighbor in candidates:
+                    continue
+                if not all(l <= c <= h for l, c, h in zip(low, neighbor, high)):
+                    continue
+                candidates[neighbor] = (OPPOSITE[face], directions | 1 << face)
+        if not candidates:
+            break
+        keys = list(candidates)
+        seen.update(keys)
+        inside = boxes_in_frustum(planes, *chunk_boxes(keys))
+        frontier = [(key, *candidates[key]) for key, visible in zip(keys, inside) if visible]
+        reached.update(key for key, _, _ in frontier)
+    return reached
@@ -0,0 +1,282 @@
+"""
+Timing of the phases of a frame.
+
+Code wraps the work of a phase in a timer:
+    with PROFILER.timer("mesh"):
+        ...
+Every timed span is written to a fixed size ring buffer of events, and the time spent in each phase is summed per
+frame into a second ring buffer of frames, so memory use never grows however long the game runs. The frame buffer
+gives the p50 and p99 time of each phase for the HUD, the event buffer can be saved as a Chrome trace, which
+chrome://tracing and https://ui.perfetto.dev open.
+
+Phase totals are exclusive: time spent in a timer opened inside another one, or in a job recorded from inside one, is
+taken out of the outer phase, so the phases of a frame add up to the frame and nothing is counted twice. The events of
+the trace keep their whole durations, trace viewers draw them nested.
+
+While profiling is disabled timer returns a shared object that does nothing, so the timers can stay in the code for
+the cost of an attribute lookup and a method call.
+
+=== Phases =============================================================================================================
+update: World.update, except the phases below that run inside it: upload, pack, collision and, when jobs run on the
+        main thread, generate and mesh
+generate: generating a chunk, in whichever process did it
+mesh: meshing a chunk, in whichever process did it
+upload: copying finished meshes into vertex lists
+pack: packing idle chunks, see chunk.py
+collision: stopping the player against blocks, see collision.py, compare with COLLISION_BUDGET
+draw: drawing the chunks
+
+"""
+
+from config import *
+
+import json
+import os
+import threading
+import time
+import numpy as np
+
+
+PHASES = ("update", "generate", "mesh", "upload", "pack", "collision", "draw")
+
+
+class NullTimer:
+    """
+    Timer handed out while profiling is disabled.
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+NULL_TIMER = NullTimer()
+
+
+class PhaseTimer:
+    """
+    Records the time spent inside a with block as one event of a phase.
+    """
+    def __init__(self, profiler, phase):
+        self.profiler = profiler
+        self.phase = phase
+        self.start = 0.0
+
+    def __enter__(self):
+        self.profiler.open_phases().append(self.profiler.phase_ids[self.phase])
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        duration = time.perf_counter() - self.start
+        self.profiler.open_phases().pop()
+        self.profiler.record(self.phase, self.start, duration)
+        return False
+
+
+class Profiler:
+    """
+    Ring buffers of timed events and of per frame phase totals.
+    """
+    def __init__(self, enabled=PROFILING, events=PROFILE_EVENTS, frames=PROFILE_FRAMES):
+        """
+        @param enabled: (bool) record anything at all
+        @param events: (int) number of most recent events kept for the trace
+        @param frames: (int) number of most recent frames kept for the percentiles
+        """
+        self.enabled = enabled
+        self.phase_ids = {phase: i for i, phase in enumerate(PHASES)}
+        """
+        Maps phase names to their column in the frame buffer.
+        """
+        self.event_phases = np.zeros(events, dtype=np.int8)
+        self.event_starts = np.zeros(events)
+        self.event_durations = np.zeros(events)
+        self.event_threads = np.zeros(events, dtype=np.int64)
+        """
+        Ring buffer of events: phase ID, perf_counter start time and duration in seconds, and the process or thread
+        that ran it.
+        """
+        self.event_count = 0
+        """
+        Number of events ever recorded, the next one goes to index event_count % events.
+        """
+        self.frame_times = np.zeros((frames, len(PHASES)))
+        """
+        Ring buffer of the seconds spent in each phase per frame.
+        """
+        self.frame_count = 0
+        """
+        Number of frames ever ended, the next one goes to row frame_count % frames.
+        """
+        self.current = np.zeros(len(PHASES))
+        """
+        Seconds spent in each phase so far in the current frame, exclusive of the phases nested in it, see above.
+        """
+        self.local = threading.local()
+        """
+        Per thread state, the phases open on the thread, see open_phases.
+        """
+        self.main_thread = threading.get_ident()
+
+    def timer(self, phase):
+        """
+        @param phase: (str) name of the phase, see PHASES
+        @return: context manager timing its with block as an event of the phase
+        """
+        if not self.enabled:
+            return NULL_TIMER
+        return PhaseTimer(self, phase)
+
+    def open_phases(self):
+        """
+        @return: (list) IDs of the phases whose timers are open on the calling thread, innermost last
+        """
+        phases = getattr(self.local, "phases", None)
+        if phases is None:
+            phases = self.local.phases = []
+        return phases
+
+    def record(self, phase, start, duration, thread=None):
+        """
+        Record an event timed elsewhere, e.g. in a worker process.
+        @param phase: (str) name of the phase
+        @param start: (float) time.perf_counter() when the event started
+        @param duration: (float) seconds the event took
+        @param thread: (int) ID of the process or thread that ran the event, None for the calling thread
+        """
+        if not self.enabled:
+            return
+        phase_id = self.phase_ids[phase]
+        i = self.event_count % len(self.event_starts)
+        self.event_phases[i] = phase_id
+        self.event_starts[i] = start
+        self.event_durations[i] = duration
+        self.event_threads[i] = threading.get_ident() if thread is None else thread
+        self.event_count += 1
+        self.current[phase_id] += duration
+        if thread is None and self.open_phases():
+            self.current[self.open_phases()[-1]] -= duration # exclusive time, see above
+
+    def end_frame(self):
+        """
+        Store the phase totals of the frame that just finished and start a new one.
+        """
+        if not self.enabled:
+            return
+        self.frame_times[self.frame_count % len(self.frame_times)] = self.current
+        self.frame_count += 1
+        self.current[:] = 0
+
+    def percentiles(self, percents=(50, 99)):
+        """
+        @param percents: (tuple) percentiles to compute
+        @return: (dict) maps phase names to their per frame time in seconds at each percentile, empty before the first
+                 frame ends
+        """
+        count = min(self.frame_count, len(self.frame_times))
+        if not count:
+            return {}
+        values = np.percentile(self.frame_times[:count], percents, axis=0)
+        return {phase: tuple(float(value) for value in values[:, i]) for i, phase in enumerate(PHASES)}
+
+    def set_enabled(self, enabled):
+        """
+        Turn recording on or off. Turning it on starts over with empty buffers.
+        """
+        if enabled and not self.enabled:
+            self.event_count = 0
+            self.frame_count = 0
+            self.current[:] = 0
+        self.enabled = enabled
+
+    def events(self):
+        """
+        @return: (list) recorded events as (phase, start, duration, thread) tuples, oldest first
+        """
+        size = len(self.event_starts)
+        count = min(self.event_count, size)
+        first = self.event_count - count
+        order = [(first + i) % size for i in range(count)]
+        return [(PHASES[self.event_phases[i]], float(self.event_starts[i]), float(self.event_durations[i]),
+                 int(self.event_threads[i])) for i in order]
+
+    def export_trace(self, path):
+        """
+        Save the event buffer in the Chrome trace event format.
+        @param path: (str) file to write
+        """
+        events = []
+        for phase, start, duration, thread in self.events():
+            events.append({
+                "name": phase,
+                "cat": "frame",
+                "ph": "X", # complete event, has a start and a duration
+                "ts": start * 1e6,
+                "dur": duration * 1e6,
+                "pid": os.getpid(),
+                "tid": "main" if thread == self.main_thread else thread,
+            })
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+class StartupTimer:
+    """
+    Times the milestones of starting the game, e.g. the first frame, from the moment the program was launched.
+    """
+    def __init__(self, start=None, budgets=None):
+        """
+        @param start: (float) time.perf_counter() at launch, None for now
+        @param budgets: (dict) maps milestone names to the seconds from launch they should be reached within
+        """
+        self.start = time.perf_counter() if start is None else start
+        self.budgets = budgets or {}
+        self.marks = {}
+        """
+        Maps milestone names to the seconds from launch they were reached at, in the order they were reached.
+        """
+
+    def mark(self, name):
+        """
+        Record that a milestone was reached, only the first time counts.
+        @param name: (str) name of the milestone
+        @return: (float) seconds from launch to the milestone
+        """
+        if name not in self.marks:
+            self.marks[name] = time.perf_counter() - self.start
+        return self.marks[name]
+
+    def over_budget(self):
+        """
+        @return: (list) names of the milestones reached later than their budget
+        """
+        return [name for name, seconds in self.marks.items() if seconds > self.budgets.get(name, float("inf"))]
+
+    def report(self):
+        """
+        @return: (str) one line giving the time of every milestone reached so far, and the budget of late ones
+        """
+        over = self.over_budget()
+        return "startup: " + ", ".join("%s %.2fs" % (name, seconds) +
+                                       (" (over budget of %.2fs)" % self.budgets[name] if name in over else "")
+                                       for name, seconds in self.marks.items())
+
+
+def timed_call(fn, *args):
+    """
+    Call a function and time it, for jobs that run in other processes.
+    @return: (tuple) (result, start, duration, pid), see Profiler.record
+    """
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, start, time.perf_counter() - start, os.getpid()
+
+
+PROFILER = Profiler()
+"""
+The profiler of the game.
+"""
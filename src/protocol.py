@@ -0,0 +1,181 @@
+"""
+Messages sent between the chunk server and its clients, see server.py and client.py.
+
+Every message is a header giving its type and the length of its payload, followed by the payload. All numbers are
+little endian.
+
+=== Messages ===========================================================================================================
+SUBSCRIBE, client to server: chunk keys as int32 x, y, z triples. The server sends each chunk once it is generated and
+    from then on the changes to it.
+UNSUBSCRIBE, client to server: chunk keys as for SUBSCRIBE, the server stops sending them.
+EDITS, client to server: block edits as int32 x, y, z world coordinates and a uint8 block ID each.
+CHUNK, server to client: chunk key (3 int32), chunk version (uint32), then the zlib compressed block IDs of the chunk
+    indexed like Chunk.blocks, nothing for a chunk that is all air.
+DELTA, server to client: chunk key (3 int32), chunk version (uint32), then the blocks that changed since the previous
+    version as a uint16 index into the flattened block array and a uint8 block ID each.
+
+A chunk's version counts the changes the server pushed for it. Each DELTA is one version past the previous one, so a
+client drops chunks and changes older than what it has and asks for the chunk again if a version is skipped, see
+Map.apply_streamed.
+
+A payload that cannot be decoded raises ProtocolError, the connection it came from cannot be trusted anymore.
+
+"""
+
+from config import *
+from chunk import BLOCK_DTYPE
+
+import asyncio
+import struct
+import zlib
+import numpy as np
+
+
+SUBSCRIBE = 1
+UNSUBSCRIBE = 2
+EDITS = 3
+CHUNK = 4
+DELTA = 5
+
+HEADER = struct.Struct("<BI") # message type, payload length
+CHUNK_HEADER = struct.Struct("<iiiI") # chunk key, version
+KEY_DTYPE = np.dtype("<i4")
+EDIT_DTYPE = np.dtype([("position", "<i4", 3), ("block", BLOCK_DTYPE)])
+CHANGE_DTYPE = np.dtype([("index", "<u2"), ("block", BLOCK_DTYPE)])
+COMPRESSION_LEVEL = 1 # chunks are compressed while clients wait, so speed matters more than size
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def check_size(payload, start, dtype, what):
+    """
+    Make sure the payload past its header is a whole number of items, raises ProtocolError if not.
+    @param payload: (bytes) payload of a message
+    @param start: (int) size of the payload's header
+    @param dtype: (dtype) type of the items after the header
+    @param what: (str) name of the message for the error
+    """
+    if len(payload) < start or (len(payload) - start) % dtype.itemsize:
+        raise ProtocolError("%s payload of %d bytes is not a whole number of items" % (what, len(payload)))
+
+
+def encode(kind, payload):
+    """
+    @param kind: (int) message type
+    @param payload: (bytes) payload of the message
+    @return: (bytes) the whole message
+    """
+    return HEADER.pack(kind, len(payload)) + payload
+
+async def read_message(reader):
+    """
+    @param reader: (StreamReader) connection to read from
+    @return: (tuple) (type, payload) of the next message, None once the connection was closed
+    """
+    try:
+        header = await reader.readexactly(HEADER.size)
+        kind, length = HEADER.unpack(header)
+        return kind, await reader.readexactly(length)
+    except (asyncio.IncompleteReadError, ConnectionError):
+        return None
+
+def encode_keys(keys):
+    """
+    @param keys: (list) chunk keys
+    @return: (bytes) payload of a SUBSCRIBE or UNSUBSCRIBE message
+    """
+    return np.asarray(list(keys), dtype=KEY_DTYPE).reshape(-1, 3).tobytes()
+
+def decode_keys(payload):
+    """
+    @return: (list) chunk keys of a SUBSCRIBE or UNSUBSCRIBE message
+    """
+    check_size(payload, 0, np.dtype((KEY_DTYPE, 3)), "key")
+    return [tuple(key) for key in np.frombuffer(payload, dtype=KEY_DTYPE).reshape(-1, 3).tolist()]
+
+def encode_edits(positions, blocks):
+    """
+    @param positions: (list) x, y, z world coordinates of the edited blocks
+    @param blocks: (list) new block IDs
+    @return: (bytes) payload of an EDITS message
+    """
+    edits = np.empty(len(blocks), dtype=EDIT_DTYPE)
+    edits["position"] = np.asarray(positions).reshape(-1, 3)
+    edits["block"] = blocks
+    return edits.tobytes()
+
+def decode_edits(payload):
+    """
+    @return: (tuple) (positions, blocks) arrays of an EDITS message
+    """
+    check_size(payload, 0, EDIT_DTYPE, "EDITS")
+    edits = np.frombuffer(payload, dtype=EDIT_DTYPE)
+    return edits["position"], edits["block"]
+
+def compress_blocks(blocks):
+    """
+    @param blocks: (ndarray) block IDs of a chunk, or None if it is all air
+    @return: (bytes) the chunk data of a CHUNK message
+    """
+    if blocks is None or not blocks.any():
+        return b""
+    return zlib.compress(np.ascontiguousarray(blocks, dtype=BLOCK_DTYPE).tobytes(), COMPRESSION_LEVEL)
+
+def decompress_blocks(data):
+    """
+    @param data: (bytes) chunk data returned by compress_blocks
+    @return: (ndarray) block IDs of the chunk indexed by local x, y, z, None if it is all air
+    """
+    if not data:
+        return None
+    try:
+        blocks = np.frombuffer(zlib.decompress(data), dtype=BLOCK_DTYPE)
+    except zlib.error as e:
+        raise ProtocolError("chunk data does not decompress: %s" % e)
+    if blocks.size != CHUNK_SIZE ** 3:
+        raise ProtocolError("chunk of %d blocks, expected %d" % (blocks.size, CHUNK_SIZE ** 3))
+    return blocks.reshape((CHUNK_SIZE,) * 3).copy()
+
+def encode_chunk(key, version, data):
+    """
+    @param key: (tuple) chunk key
+    @param version: (int) number of times the chunk changed on the server
+    @param data: (bytes) compressed blocks of the chunk, see compress_blocks
+    @return: (bytes) payload of a CHUNK message
+    """
+    return CHUNK_HEADER.pack(*key, version) + data
+
+def decode_chunk(payload):
+    """
+    @return: (tuple) (key, version, blocks) of a CHUNK message, see decompress_blocks
+    """
+    if len(payload) < CHUNK_HEADER.size:
+        raise ProtocolError("CHUNK payload of %d bytes is shorter than its header" % len(payload))
+    cx, cy, cz, version = CHUNK_HEADER.unpack_from(payload)
+    return (cx, cy, cz), version, decompress_blocks(payload[CHUNK_HEADER.size:])
+
+def encode_delta(key, version, indices, blocks):
+    """
+    @param key: (tuple) chunk key
+    @param version: (int) version of the chunk after the changes
+    @param indices: (ndarray) indices of the changed blocks into the flattened block array
+    @param blocks: (ndarray) new IDs of the changed blocks
+    @return: (bytes) payload of a DELTA message
+    """
+    changes = np.empty(len(indices), dtype=CHANGE_DTYPE)
+    changes["index"] = indices
+    changes["block"] = blocks
+    return CHUNK_HEADER.pack(*key, version) + changes.tobytes()
+
+def decode_delta(payload):
+    """
+    @return: (tuple) (key, version, indices, blocks) of a DELTA message
+    """
+    check_size(payload, CHUNK_HEADER.size, CHANGE_DTYPE, "DELTA")
+    cx, cy, cz, version = CHUNK_HEADER.unpack_from(payload)
+    changes = np.frombuffer(payload, dtype=CHANGE_DTYPE, offset=CHUNK_HEADER.size)
+    if len(changes) and changes["index"].max() >= CHUNK_SIZE ** 3:
+        raise ProtocolError("DELTA changes block %d of a chunk of %d" % (changes["index"].max(), CHUNK_SIZE ** 3))
+    return (cx, cy, cz), version, changes["index"].astype(np.intp), changes["block"]
@@ -0,0 +1,132 @@
+"""
+Finding the blocks a ray passes through.
+
+Rays are walked through the block grid with Amanatides and Woo's voxel traversal: starting from the block containing
+the origin, every step moves into the neighbor across whichever block boundary the ray reaches first. Only the blocks
+the ray actually passes through are looked at, so a query costs a few dict lookups per block of distance no matter how
+many blocks the world holds.
+
+Blocks are centered on their integer coordinates, so the block at (x, y, z) spans x - 0.5 to x + 0.5 and so on.
+
+=== Hits ===============================================================================================================
+position: (x, y, z) coordinates of the first solid block along the ray
+block: ID of that block
+face: number of the face the ray entered the block through (see geometry.py), so the block next to it across that face
+      is where a new block would be placed
+distance: distance from the origin to the point where the ray entered the block
+
+"""
+
+from config import *
+from utils import *
+from blocks import BLOCK_AIR
+from chunk import chunk_key, chunk_local
+
+import math
+import numpy as np
+
+
+ENTRY_FACES = ((3, 2), (0, 1), (4, 5))
+"""
+Face a ray enters a block through, indexed by the axis it crossed and whether it was moving in the positive direction.
+E.g. a ray moving toward +x enters through the left face.
+"""
+
+
+def raycast(store, origin, direction, max_distance=PICK_DISTANCE):
+    """
+    Find the first solid block along a ray.
+    @param store: (ChunkStore) blocks of the world
+    @param origin: (tuple) x, y, z start of the ray, e.g. the player position
+    @param direction: (tuple) x, y, z direction of the ray, need not be normalized
+    @param max_distance: (float) max distance along the ray to look
+    @return: (tuple) (position, block, face, distance), see above, or None if nothing was hit. The face is None if the
+             origin is inside a solid block.
+    """
+    direction = vec_normalize(direction)
+    if not any(direction):
+        return None
+    cell = [int(math.floor(c + 0.5)) for c in origin]
+    step = [0, 0, 0]
+    t_max = [math.inf] * 3 # distance along the ray to the next boundary on each axis
+    t_delta = [math.inf] * 3 # distance along the ray between boundaries on each axis
+    for axis in range(3):
+        d = direction[axis]
+        if d > 0:
+            step[axis] = 1
+            t_max[axis] = (cell[axis] + 0.5 - origin[axis]) / d
+            t_delta[axis] = 1 / d
+        elif d < 0:
+            step[axis] = -1
+            t_max[axis] = (cell[axis] - 0.5 - origin[axis]) / d
+            t_delta[axis] = -1 / d
+
+    position = tuple(cell)
+    key = chunk_key(position)
+    chunk = store.get_chunk(key)
+    block = chunk.get(chunk_local(position)) if chunk else BLOCK_AIR
+    if block != BLOCK_AIR:
+        return position, block, None, 0.0
+    while True:
+        axis = t_max.index(min(t_max))
+        distance = t_max[axis]
+        if distance > max_distance:
+            return None
+        cell[axis] += step[axis]
+        t_max[axis] += t_delta[axis]
+        position = tuple(cell)
+        if chunk_key(position) != key: # only look the chunk up again when the ray crosses into another one
+            key = chunk_key(position)
+            chunk = store.get_chunk(key)
+        if chunk is None:
+            continue
+        block = chunk.get(chunk_local(position))
+        if block != BLOCK_AIR:
+            return position, block, ENTRY_FACES[axis][step[axis] > 0], distance
+
+def raycast_many(store, origins, directions, max_distance=PICK_DISTANCE):
+    """
+    Find the first solid block along many rays at once, e.g. for line of sight checks.
+    All rays are stepped together, so the cost of a step is shared by every ray still going.
+    @param store: (ChunkStore) blocks of the world
+    @param origins: (ndarray) shape (n, 3), start of each ray
+    @param directions: (ndarray) shape (n, 3), direction of each ray, need not be normalized
+    @param max_distance: (float) max distance along each ray to look
+    @return: (tuple) arrays (positions, blocks, faces, distances) of shapes (n, 3), (n,), (n,), (n,) describing the hit
+             of each ray, see above. Rays that hit nothing have block BLOCK_AIR, face -1 and distance inf, rays
+             starting inside a solid block have face -1 and distance 0.
+    """
+    origins = np.asarray(origins, dtype=np.float64).reshape(-1, 3)
+    directions = np.asarray(directions, dtype=np.float64).reshape(-1, 3)
+    count = len(origins)
+    lengths = np.linalg.norm(directions, axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        directions = directions / lengths[:, None]
+        cells = np.floor(origins + 0.5).astype(np.int64)
+        steps = np.sign(directions).astype(np.int64)
+        t_delta = np.abs(1 / directions)
+        t_max = np.where(steps != 0, (cells + 0.5 * steps - origins) / directions, np.inf)
+    t_delta[steps == 0] = np.inf
+
+    positions = cells.copy()
+    blocks = store.get_blocks(cells)
+    faces = np.full(count, -1, dtype=np.int64)
+    distances = np.where(blocks != BLOCK_AIR, 0.0, np.inf)
+    active = np.flatnonzero((blocks == BLOCK_AIR) & (lengths > 0))
+    entry_faces = np.array(ENTRY_FACES)
+    while len(active):
+        axes = t_max[active].argmin(axis=1)
+        reached = t_max[active, axes]
+        going = reached <= max_distance
+        active, axes, reached = active[going], axes[going], reached[going]
+        cells[active, axes] += steps[active, axes]
+        t_max[active, axes] += t_delta[active, axes]
+        found = store.get_blocks(cells[active])
+        hit = found != BLOCK_AIR
+        hits = active[hit]
+        positions[hits] = cells[hits]
+        blocks[hits] = found[hit]
+        faces[hits] = entry_faces[axes[hit], (steps[hits, axes[hit]] > 0).astype(np.intp)]
+        distances[hits] = reached[hit]
+        active = active[~hit]
+    return positions, blocks, faces, distances
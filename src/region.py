@@ -0,0 +1,275 @@
+"""
+Saving chunks to disk.
+
+Chunks are grouped into region files of REGION_CHUNKS chunks per side. A region file starts with a fixed size table
+giving the offset and length of each of its chunks, followed by the chunks themselves, each compressed on its own.
+Files are read through mmap, so reading one chunk only touches its table entry and its own bytes, never the rest of
+the file.
+
+Writing a chunk appends its new data to the end of the file and then points its table entry at it, so a save only
+writes the chunks that changed. The space of the old copy is reclaimed when the file gets compacted.
+
+=== File Layout ========================================================================================================
+header: magic b"VXRG", format version (uint32)
+table: REGION_CHUNKS**3 entries of offset (uint64), length (uint32), flags (uint32), indexed by local chunk coordinates
+       as (lx * REGION_CHUNKS + ly) * REGION_CHUNKS + lz. An entry of all zeros means the chunk was never saved.
+data: zlib compressed block IDs of chunks, CHUNK_SIZE**3 bytes each before compression, indexed like Chunk.blocks
+
+"""
+
+from config import *
+from chunk import BLOCK_DTYPE
+
+import json
+import mmap
+import os
+import struct
+import zlib
+import numpy as np
+
+
+MAGIC = b"VXRG"
+VERSION = 1
+HEADER = struct.Struct("<4sI")
+ENTRY = struct.Struct("<QII")
+ENTRY_COUNT = REGION_CHUNKS ** 3
+DATA_START = HEADER.size + ENTRY.size * ENTRY_COUNT
+FLAG_SAVED = 1 # set on every saved chunk so an all air chunk is not mistaken for an unsaved one
+FLAG_AIR = 2 # the chunk is all air and has no data
+COMPRESSION_LEVEL = 6
+
+
+class RegionError(Exception):
+    pass
+
+
+def region_of(key):
+    """
+    @param key: (tuple) chunk key
+    @return: (tuple) (region coordinates, index of the chunk's entry in the region's table)
+    """
+    cx, cy, cz = key
+    n = REGION_CHUNKS
+    region = (cx // n, cy // n, cz // n)
+    index = ((cx % n) * n + cy % n) * n + cz % n
+    return region, index
+
+def chunk_of(region, index):
+    """
+    The inverse of region_of.
+    @return: (tuple) key of the chunk at an index of a region's table
+    """
+    n = REGION_CHUNKS
+    rx, ry, rz = region
+    lx, rest = divmod(index, n * n)
+    ly, lz = divmod(rest, n)
+    return (rx * n + lx, ry * n + ly, rz * n + lz)
+
+
+class RegionFile:
+    """
+    One region file, opened for reading and writing.
+    """
+    def __init__(self, path):
+        self.path = path
+        if not os.path.exists(path):
+            with open(path, "wb") as f:
+                f.write(HEADER.pack(MAGIC, VERSION))
+                f.write(bytes(ENTRY.size * ENTRY_COUNT))
+        self.file = open(path, "r+b")
+        self.map = None
+        """
+        Read only mmap of the file, reopened after every write since writes can grow the file.
+        """
+        magic, version = HEADER.unpack(self.read(0, HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise RegionError("%s is not a version %d region file" % (path, VERSION))
+
+    def read(self, offset, length):
+        """
+        @return: (bytes) bytes of the file from offset
+        """
+        if self.map is None:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.map[offset:offset + length]
+
+    def get_entry(self, index):
+        """
+        @param index: (int) index of a chunk in the table
+        @return: (tuple) offset, length and flags of the chunk
+        """
+        return ENTRY.unpack(self.read(HEADER.size + ENTRY.size * index, ENTRY.size))
+
+    def read_chunk(self, index):
+        """
+        @param index: (int) index of a chunk in the table, see region_of
+        @return: (tuple) (found, blocks), found is False if the chunk was never saved, blocks is None if it is all air
+        """
+        offset, length, flags = self.get_entry(index)
+        if not flags & FLAG_SAVED:
+            return False, None
+        if flags & FLAG_AIR:
+            return True, None
+        data = zlib.decompress(self.read(offset, length))
+        return True, np.frombuffer(data, dtype=BLOCK_DTYPE).reshape((CHUNK_SIZE,) * 3).copy()
+
+    def write_chunks(self, chunks):
+        """
+        Save chunks, leaving every other chunk of the region untouched.
+        @param chunks: (dict) maps table indices to block arrays, None for all air chunks
+        """
+        self.close_map()
+        self.file.seek(0, os.SEEK_END)
+        entries = {}
+        for index, blocks in chunks.items():
+            if blocks is None or not blocks.any():
+                entries[index] = (0, 0, FLAG_SAVED | FLAG_AIR)
+                continue
+            data = zlib.compress(np.ascontiguousarray(blocks, dtype=BLOCK_DTYPE).tobytes(), COMPRESSION_LEVEL)
+            entries[index] = (self.file.tell(), len(data), FLAG_SAVED)
+            self.file.write(data)
+        # data goes to disk before the table points at it, so a crash mid save leaves the old copies readable
+        self.file.flush()
+        for index, entry in entries.items():
+            self.file.seek(HEADER.size + ENTRY.size * index)
+            self.file.write(ENTRY.pack(*entry))
+        self.file.flush()
+        if self.wasted_bytes() > self.live_bytes():
+            self.compact()
+
+    def saved_indices(self):
+        """
+        @return: (list) table indices of all saved chunks
+        """
+        return [index for index in range(ENTRY_COUNT) if self.get_entry(index)[2] & FLAG_SAVED]
+
+    def live_bytes(self):
+        """
+        @return: (int) bytes of chunk data the table points at
+        """
+        return sum(self.get_entry(index)[1] for index in range(ENTRY_COUNT))
+
+    def wasted_bytes(self):
+        """
+        @return: (int) bytes of old copies of chunks that nothing points at anymore
+        """
+        return os.path.getsize(self.path) - DATA_START - self.live_bytes()
+
+    def compact(self):
+        """
+        Rewrite the file without the old copies of chunks.
+        """
+        chunks = {}
+        for index in self.saved_indices():
+            offset, length, flags = self.get_entry(index)
+            chunks[index] = (self.read(offset, length), flags)
+        self.close()
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION))
+            table = bytearray(ENTRY.size * ENTRY_COUNT)
+            f.write(table)
+            for index, (data, flags) in chunks.items():
+                ENTRY.pack_into(table, ENTRY.size * index, f.tell() if data else 0, len(data), flags)
+                f.write(data)
+            f.seek(HEADER.size)
+            f.write(table)
+        os.replace(tmp_path, self.path)
+        self.file = open(self.path, "r+b")
+
+    def close_map(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+
+    def close(self):
+        self.close_map()
+        self.file.close()
+
+
+class WorldSave:
+    """
+    A directory of region files plus the settings needed to keep generating the same world.
+    """
+    def __init__(self, path):
+        """
+        @param path: (str) directory of the save, created if it does not exist
+        """
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.regions = {}
+        """
+        Maps region coordinates to open region files.
+        """
+
+    def region_path(self, region):
+        return os.path.join(self.path, "r.%d.%d.%d.region" % region)
+
+    def get_region(self, region, create=False):
+        """
+        @param region: (tuple) region coordinates
+        @param create: (bool) create the region file if it does not exist
+        @return: (RegionFile) the region, or None if it does not exist and create is false
+        """
+        if region not in self.regions:
+            if not create and not os.path.exists(self.region_path(region)):
+                return None
+            self.regions[region] = RegionFile(self.region_path(region))
+        return self.regions[region]
+
+    def load_chunk(self, key):
+        """
+        @param key: (tuple) chunk key
+        @return: (tuple) (found, blocks), found is False if the chunk was never saved, blocks is None if it is all air
+        """
+        region, index = region_of(key)
+        region_file = self.get_region(region)
+        if region_file is None:
+            return False, None
+        return region_file.read_chunk(index)
+
+    def save_chunks(self, chunks):
+        """
+        @param chunks: (dict) maps chunk keys to block arrays, None for all air chunks
+        """
+        by_region = {}
+        for key, blocks in chunks.items():
+            region, index = region_of(key)
+            by_region.setdefault(region, {})[index] = blocks
+        for region, region_chunks in by_region.items():
+            self.get_region(region, create=True).write_chunks(region_chunks)
+
+    def saved_keys(self):
+        """
+        @return: (list) keys of every saved chunk
+        """
+        keys = []
+        for name in os.listdir(self.path):
+            parts = name.split(".")
+            if len(parts) != 5 or parts[0] != "r" or parts[4] != "region":
+                continue
+            region = tuple(int(part) for part in parts[1:4])
+            keys.extend(chunk_of(region, index) for index in self.get_region(region).saved_indices())
+        return keys
+
+    def load_settings(self):
+        """
+        @return: (dict) settings stored with save_settings, empty if there are none
+        """
+        path = os.path.join(self.path, "world.json")
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            return json.load(f)
+
+    def save_settings(self, settings):
+        """
+        @param settings: (dict) json serializable settings of the world, e.g. its seed
+        """
+        with open(os.path.join(self.path, "world.json"), "w") as f:
+            json.dump(settings, f, indent=4)
+
+    def close(self):
+        for region_file in self.regions.values():
+            region_file.close()
+        self.regions = {}
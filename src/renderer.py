@@ -0,0 +1,162 @@
+"""
+Drawing of chunk meshes with OpenGL.
+
+Everything that needs a GL context lives here, so the world model in world.py can be built and run without a display,
+e.g. by benchmarks and servers. The Map hands finished meshes to its renderer and tells it when chunks go away.
+
+Meshes in the float vertex format go into a pyglet batch. Meshes in the compact vertex format get buffers of their own,
+see CompactMesh, since Batch.add_indexed offsets and copies every index in a python loop.
+"""
+
+from config import *
+from chunk import chunk_origin
+from mesher import face_count
+from shaders import TileGroup, CompactGroup, COMPACT_ATTRIBUTES
+from culling import boxes_in_frustum, chunk_boxes
+
+import ctypes
+import numpy as np
+from pyglet import image
+from pyglet.graphics import Batch
+from pyglet.graphics.vertexbuffer import create_buffer
+from pyglet.gl import GL_QUADS, GL_TRIANGLES, GL_ARRAY_BUFFER, GL_ELEMENT_ARRAY_BUFFER, GL_STATIC_DRAW, \
+    GL_UNSIGNED_BYTE, GL_UNSIGNED_INT, GL_FALSE, glBindBuffer, glDrawElements, glEnableVertexAttribArray, \
+    glDisableVertexAttribArray, glVertexAttribPointer
+
+
+class CompactMesh:
+    """
+    Vertex and index buffer of a chunk mesh in the compact vertex format, drawn with the compact shader, see shaders.py.
+    The indices start at 0 for every chunk, so the index buffer is uploaded as the mesher built it.
+    """
+    def __init__(self, vertices, indices):
+        """
+        @param vertices: (ndarray) uint8 vertex buffer of shape (n, 4), see compact_geometry
+        @param indices: (ndarray) uint32 index buffer, see compact_geometry
+        """
+        vertices = np.ascontiguousarray(vertices, dtype=np.uint8)
+        indices = np.ascontiguousarray(indices, dtype=np.uint32)
+        self.vertices = create_buffer(vertices.nbytes, GL_ARRAY_BUFFER, GL_STATIC_DRAW)
+        self.vertices.set_data(vertices.ctypes.data)
+        self.indices = create_buffer(indices.nbytes, GL_ELEMENT_ARRAY_BUFFER, GL_STATIC_DRAW)
+        self.indices.set_data(indices.ctypes.data)
+        self.count = len(indices)
+
+    def draw(self, mode=GL_TRIANGLES):
+        """
+        Draw the mesh, the generic attribute of the compact shader has to be enabled, see ChunkRenderer.draw.
+        """
+        self.vertices.bind()
+        # ptr is 0 for a buffer object and the address of the data for a client side array
+        glVertexAttribPointer(COMPACT_ATTRIBUTES["packed"], 4, GL_UNSIGNED_BYTE, GL_FALSE, 0, self.vertices.ptr)
+        self.indices.bind()
+        glDrawElements(mode, self.count, GL_UNSIGNED_INT, self.indices.ptr)
+
+    def delete(self):
+        self.vertices.delete()
+        self.indices.delete()
+
+
+class ChunkRenderer:
+    """
+    Holds a vertex list per chunk mesh and draws the ones the camera can see.
+    """
+    def __init__(self, vertex_format=VERTEX_FORMAT):
+        """
+        @param vertex_format: (str) vertex format chunk meshes are built in, see geometry.py
+        """
+        self.batch = Batch()
+        """
+        Pyglet vertex batch for all blocks in the world.
+        """
+        if vertex_format not in ("float", "compact"):
+            raise ValueError("unknown vertex format %r" % vertex_format)
+        self.vertex_format = vertex_format
+        """
+        Vertex format chunk meshes are built in, see geometry.py.
+        """
+        group_class = CompactGroup if vertex_format == "compact" else TileGroup
+        self.group = group_class(image.load(TEXTURE_PATH).get_texture())
+        """
+        Pyglet group that stores our texture atlas.
+        Block textures are cropped from this atlas. It's more efficient than loading textures individually.
+        """
+        self.vertex_lists = {}
+        """
+        Maps chunk keys to the vertex list holding the mesh of that chunk, a CompactMesh in the compact vertex format.
+        """
+        self.drawn_chunks = 0
+        self.culled_chunks = 0
+        """
+        Number of chunks drawn and number of chunks skipped by frustum or occlusion culling in the last frame.
+        """
+
+    def show_mesh(self, key, mesh):
+        """
+        Replace the vertex list of a chunk.
+        @param key: (tuple) key of the chunk
+        @param mesh: (tuple) arrays of the new mesh in the renderer's vertex format, see build_mesh
+        """
+        self.hide_chunk(key)
+        if len(mesh[0]):
+            self.vertex_lists[key] = self.create_vertex_list(*mesh)
+
+    def create_vertex_list(self, *mesh):
+        """
+        Add a chunk mesh to the batch, or give it its own buffers in the compact vertex format.
+        @param mesh: arrays of the mesh in the renderer's vertex format, see geometry.py
+        @return: (VertexList) the new vertex list, a CompactMesh in the compact vertex format
+        """
+        if self.vertex_format == "compact":
+            return CompactMesh(*mesh)
+        vertices, tex_coords = mesh
+        vertex_list = self.batch.add(face_count(vertices) * 4, GL_QUADS, self.group, 'v3f/static', 't4f/static')
+        # copy the buffers in directly, assigning numpy arrays to pyglet's ctypes arrays would go element by element
+        ctypes.memmove(vertex_list.vertices, vertices.ctypes.data, vertices.nbytes)
+        ctypes.memmove(vertex_list.tex_coords, tex_coords.ctypes.data, tex_coords.nbytes)
+        return vertex_list
+
+    def hide_chunk(self, key):
+        """
+        Delete the vertex list of a chunk, if it has one.
+        @param key: (tuple) key of the chunk
+        """
+        vertex_list = self.vertex_lists.pop(key, None)
+        if vertex_list:
+            vertex_list.delete()
+
+    def visible_chunks(self, planes):
+        """
+        @param planes: (ndarray) view frustum planes, see culling.py
+        @return: (list) keys of the chunks with a vertex list that are at least partly inside the view frustum
+        """
+        keys = list(self.vertex_lists)
+        if not keys:
+            return []
+        visible = boxes_in_frustum(planes, *chunk_boxes(keys))
+        return [key for key, inside in zip(keys, visible) if inside]
+
+    def draw(self, planes=None, reachable=None):
+        """
+        Draw the chunks inside the view frustum.
+        @param planes: (ndarray) view frustum planes, see culling.py, None to draw every chunk
+        @param reachable: (set) keys of the chunks occlusion culling did not hide, see occlusion.py, None to skip it
+        """
+        keys = self.visible_chunks(planes) if planes is not None else list(self.vertex_lists)
+        if reachable is not None:
+            keys = [key for key in keys if key in reachable]
+        self.drawn_chunks = len(keys)
+        self.culled_chunks = len(self.vertex_lists) - len(keys)
+        self.group.set_state_recursive()
+        if self.vertex_format == "compact":
+            glEnableVertexAttribArray(COMPACT_ATTRIBUTES["packed"])
+            for key in keys:
+                self.group.set_origin(chunk_origin(key))
+                self.vertex_lists[key].draw(GL_TRIANGLES)
+            glDisableVertexAttribArray(COMPACT_ATTRIBUTES["packed"])
+            glBindBuffer(GL_ARRAY_BUFFER, 0)
+            glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+        else:
+            for key in keys:
+                self.vertex_lists[key].draw(GL_QUADS)
+        self.group.unset_state_recursive()
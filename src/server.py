@@ -0,0 +1,316 @@
+"""
+Headless chunk server, lets clients share one world over TCP, see protocol.py for the messages.
+
+The server owns a generated world like a local Map does, but never meshes or draws it. Clients subscribe to the chunks
+around their player and the server sends each one once it is generated, zlib compressed. The compressed data is cached
+per chunk version, so a chunk is compressed once however many clients ask for it. Clients send block edits, the server
+checks them and applies them to its world. A message with an invalid edit is rejected as a whole and the client is sent
+the chunks it touched again, so whatever the client already changed locally is undone. Only a client whose messages
+cannot be decoded is dropped. Once a tick every chunk edited
+since the last one, by a client or on the server, is diffed against the cached copy its subscribers have, and only the
+blocks that changed are pushed to them, unless the whole chunk compresses smaller.
+
+Run from the repository root:
+    python src/server.py                            serve a world on SERVER_HOST:SERVER_PORT
+    python src/main.py --connect 127.0.0.1:25570    play on it
+
+=== Flow control =======================================================================================================
+Chunks are only written to a client while less than SERVER_SEND_BUFFER bytes are queued for it, so one slow client
+never holds up the others. Waiting chunks are sent in the order they were subscribed to, clients subscribe nearest
+first. Block changes are always written right away, they are small and late changes would be applied to stale chunks.
+
+"""
+
+from config import *
+from blocks import BLOCKS, BLOCK_AIR
+from chunk import BLOCK_DTYPE
+from protocol import SUBSCRIBE, UNSUBSCRIBE, EDITS, CHUNK, DELTA, ProtocolError, encode, read_message, decode_keys, \
+    decode_edits, compress_blocks, decompress_blocks, encode_chunk, encode_delta
+from world import Map
+
+import argparse
+import asyncio
+import time
+import numpy as np
+from collections import deque
+
+
+class EditError(Exception):
+    """
+    Raised for edits a client is not allowed to make, the edits are rejected but the client stays connected.
+    """
+    pass
+
+
+class Connection:
+    """
+    What the server knows about one client.
+    """
+    def __init__(self, writer):
+        self.writer = writer
+        self.subscribed = set()
+        """
+        Keys of the chunks the client wants, including the ones not sent yet.
+        """
+        self.waiting = {}
+        """
+        Keys of subscribed chunks that were not sent yet, in the order they were subscribed to. A dict for its order.
+        """
+
+    def send(self, message):
+        """
+        @param message: (bytes) whole message, see protocol.encode
+        @return: (int) number of bytes sent
+        """
+        if self.writer.is_closing():
+            return 0
+        self.writer.write(message)
+        return len(message)
+
+    def is_backed_up(self):
+        """
+        @return: (bool) true if so much is queued for the client that no more chunks should be sent yet
+        """
+        return self.writer.transport.get_write_buffer_size() >= SERVER_SEND_BUFFER
+
+
+class ChunkServer:
+    """
+    Serves the chunks of a world to clients, see above.
+    """
+    def __init__(self, world_map, host=SERVER_HOST, port=SERVER_PORT):
+        """
+        @param world_map: (Map) world to serve, it must not stream, the server generates all of it
+        @param host: (str) address to listen on
+        @param port: (int) port to listen on, 0 to pick a free one
+        """
+        if world_map.streaming:
+            raise ValueError("the server cannot serve a streaming world")
+        self.map = world_map
+        self.host = host
+        self.port = port
+        """
+        Port the server listens on, the one picked once it started if 0 was asked for.
+        """
+        self.connections = []
+        self.versions = {}
+        """
+        Maps chunk keys to the number of times the chunk's blocks changed since the server started, 0 if they never did.
+        """
+        self.compressed = {}
+        """
+        Maps chunk keys to (version, data) of the last time the chunk was compressed, see protocol.compress_blocks.
+        Every client that has a chunk has the blocks of its cached version.
+        """
+        self.resorted = False
+        """
+        Set when clients subscribed to chunks, so the generation queue is reordered to do theirs first.
+        """
+        self.running = False
+        self.bytes_sent = 0
+        self.chunks_sent = 0
+
+    async def run(self, started=None):
+        """
+        Serve clients until stop is called.
+        @param started: (function) called without arguments once the server listens, e.g. to read the port it picked
+        """
+        server = await asyncio.start_server(self.handle_client, self.host, self.port)
+        self.port = server.sockets[0].getsockname()[1]
+        self.running = True
+        if started:
+            started()
+        last = time.perf_counter()
+        try:
+            while self.running:
+                now = time.perf_counter()
+                self.tick(now - last)
+                last = now
+                await asyncio.sleep(1.0 / TICKS_PER_SEC)
+        finally:
+            server.close()
+            for connection in self.connections:
+                connection.writer.close()
+            await server.wait_closed()
+
+    def stop(self):
+        """
+        Make run return after its current tick.
+        """
+        self.running = False
+
+    async def handle_client(self, reader, writer):
+        """
+        Read the messages of one client until it disconnects.
+        """
+        connection = Connection(writer)
+        self.connections.append(connection)
+        try:
+            while True:
+                message = await read_message(reader)
+                if message is None:
+                    break
+                self.receive(connection, *message)
+        except ProtocolError as e:
+            print("dropping client %s: %s" % (writer.get_extra_info("peername"), e))
+        finally:
+            self.connections.remove(connection)
+            writer.close()
+
+    def receive(self, connection, kind, payload):
+        """
+        Handle one message from a client.
+        @param connection: (Connection) client that sent it
+        @param kind: (int) message type, see protocol.py
+        @param payload: (bytes) payload of the message
+        """
+        if kind == SUBSCRIBE:
+            for key in decode_keys(payload):
+                if key not in connection.subscribed:
+                    connection.subscribed.add(key)
+                    connection.waiting[key] = None
+            self.resorted = True
+        elif kind == UNSUBSCRIBE:
+            for key in decode_keys(payload):
+                connection.subscribed.discard(key)
+                connection.waiting.pop(key, None)
+        elif kind == EDITS:
+            positions, blocks = decode_edits(payload)
+            try:
+                self.check_edits(connection, positions, blocks)
+            except EditError as e:
+                print("rejected edits of client %s: %s" % (connection.writer.get_extra_info("peername"), e))
+                self.resync(connection, set(map(tuple, (positions // CHUNK_SIZE).tolist())))
+                return
+            for position, block in zip(map(tuple, positions.tolist()), blocks.tolist()):
+                if block == BLOCK_AIR:
+                    self.map.remove_block(position)
+                else:
+                    self.map.add_block(position, block)
+        else:
+            raise ProtocolError("unknown message type %d" % kind)
+
+    def check_edits(self, connection, positions, blocks):
+        """
+        Make sure a client's edits are valid before any of them changes the world, raises EditError if not.
+        Clients may only set known block types, in chunks they subscribed to and were sent.
+        @param connection: (Connection) client that sent the edits
+        @param positions: (ndarray) x, y, z world coordinates of the edited blocks
+        @param blocks: (ndarray) new block IDs
+        """
+        unknown = blocks[blocks >= len(BLOCKS)]
+        if len(unknown):
+            raise EditError("edit to unknown block ID %d" % unknown[0])
+        for key in set(map(tuple, (positions // CHUNK_SIZE).tolist())):
+            if key not in connection.subscribed or key in connection.waiting:
+                raise EditError("edit in chunk %s, which the client does not have" % (key,))
+
+    def resync(self, connection, keys):
+        """
+        Send a client the current blocks of chunks again, e.g. to undo edits of them the client made locally.
+        @param connection: (Connection) client to send them to
+        @param keys: (set) keys of the chunks, the ones the client does not have are skipped
+        """
+        for key in keys:
+            if key in connection.subscribed and key not in connection.waiting:
+                version, data = self.compress(key)
+                self.bytes_sent += connection.send(encode(CHUNK, encode_chunk(key, version, data)))
+                self.chunks_sent += 1
+
+    def tick(self, dt):
+        """
+        Generate more of the world, push the changes of edited chunks and send waiting chunks that are ready.
+        @param dt: (float) seconds since the last tick
+        """
+        if self.resorted:
+            self.resorted = False
+            self.prioritize_waiting()
+        self.map.update(dt)
+        self.push_edits()
+        generating = None
+        for connection in self.connections:
+            if not connection.waiting or connection.is_backed_up():
+                continue
+            if generating is None:
+                generating = self.map.requested | {key for key, _, _ in self.map.queue}
+            for key in list(connection.waiting):
+                if key in generating and key not in self.map.loaded:
+                    continue
+                del connection.waiting[key]
+                version, data = self.compress(key)
+                self.bytes_sent += connection.send(encode(CHUNK, encode_chunk(key, version, data)))
+                self.chunks_sent += 1
+                if connection.is_backed_up():
+                    break
+
+    def prioritize_waiting(self):
+        """
+        Move the chunks clients are waiting for to the front of the generation queue.
+        """
+        waiting = set()
+        for connection in self.connections:
+            waiting.update(connection.waiting)
+        self.map.queue = deque(sorted(self.map.queue, key=lambda item: item[0] not in waiting))
+
+    def compress(self, key):
+        """
+        @param key: (tuple) key of a chunk
+        @return: (tuple) (version, data) of the chunk's current blocks, compressed now only if they changed since the
+                 last time
+        """
+        version = self.versions.get(key, 0)
+        cached = self.compressed.get(key)
+        if cached is None or cached[0] != version:
+            chunk = self.map.chunks.get_chunk(key)
+            cached = (version, compress_blocks(chunk.unpacked() if chunk is not None else None))
+            self.compressed[key] = cached
+        return cached
+
+    def push_edits(self):
+        """
+        Send the blocks that changed in every chunk edited since the last call to the clients that have the chunk.
+        """
+        for key in self.map.take_edited():
+            cached = self.compressed.get(key)
+            if cached is None:
+                continue # never sent, whoever asks for it gets the edited blocks compressed then
+            old = decompress_blocks(cached[1])
+            chunk = self.map.chunks.get_chunk(key)
+            new = chunk.unpacked() if chunk is not None else None
+            empty = np.zeros((CHUNK_SIZE,) * 3, dtype=BLOCK_DTYPE)
+            old = (old if old is not None else empty).ravel()
+            new = (new if new is not None else empty).ravel()
+            indices = np.flatnonzero(old != new)
+            if not len(indices):
+                continue # edited back to how it was
+            self.versions[key] = self.versions.get(key, 0) + 1
+            version, data = self.compress(key)
+            delta = encode_delta(key, version, indices, new[indices])
+            full = encode_chunk(key, version, data)
+            message = encode(DELTA, delta) if len(delta) < len(full) else encode(CHUNK, full)
+            for connection in self.connections:
+                if key in connection.subscribed and key not in connection.waiting:
+                    self.bytes_sent += connection.send(message)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a world to clients over TCP without a display.")
+    parser.add_argument("--host", default=SERVER_HOST, help="address to listen on")
+    parser.add_argument("--port", type=int, default=SERVER_PORT, help="port to listen on")
+    parser.add_argument("--seed", type=int, default=WORLD_SEED, help="seed of a new world")
+    parser.add_argument("--size", type=int, default=WORLD_SIZE, help="1/2 width and height of a new world")
+    parser.add_argument("--save", metavar="DIR", help="directory the world is saved in, it is not saved without one")
+    args = parser.parse_args()
+
+    world_map = Map(None, streaming=False, seed=args.seed, save_dir=args.save, world_size=args.size)
+    server = ChunkServer(world_map, args.host, args.port)
+    try:
+        asyncio.run(server.run(lambda: print("serving on %s:%d" % (server.host, server.port))))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        world_map.close()
+
+
+if __name__ == "__main__":
+    main()
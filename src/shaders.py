@@ -0,0 +1,195 @@
+"""
+GLSL shaders used to draw the world.
+
+Chunk meshes carry four texture coordinates per vertex: u and v measured in blocks across the quad, then the bottom
+left corner of the block's tile in the texture atlas. The tile shader wraps u and v so a quad covering several blocks
+repeats the tile once per block, which plain atlas texture coordinates cannot do. Fog is applied in the shader the same
+way the fixed function pipeline does it, so setup_opengl in main.py still controls it.
+
+Meshes in the compact vertex format (see geometry.py) only carry 4 bytes per vertex in the generic attribute "packed".
+The compact shader rebuilds the world position from the chunk origin uniform and the texture coordinates from the
+corner position and face number, then hands them to the same fragment shader.
+"""
+
+from config import *
+
+import ctypes
+from pyglet.gl import *
+from pyglet.graphics import Group
+
+
+TILE_VERTEX_SOURCE = """
+#version 120
+varying vec4 tile_coord;
+
+void main() {
+    gl_Position = ftransform();
+    gl_FrontColor = gl_Color;
+    tile_coord = gl_MultiTexCoord0;
+    gl_FogFragCoord = abs((gl_ModelViewMatrix * gl_Vertex).z);
+}
+"""
+
+COMPACT_VERTEX_SOURCE = """
+#version 120
+attribute vec4 packed;
+uniform vec3 chunk_origin;
+uniform float tile_size;
+varying vec4 tile_coord;
+
+void main() {
+    vec3 corner = packed.xyz;
+    float face = floor(packed.w / 16.0);
+    float tile = packed.w - face * 16.0;
+    vec2 uv;
+    if (face < 0.5) uv = corner.zx; // top
+    else if (face < 1.5) uv = corner.xz; // bottom
+    else if (face < 2.5) uv = corner.zy; // left
+    else if (face < 3.5) uv = vec2(-corner.z, corner.y); // right
+    else if (face < 4.5) uv = corner.xy; // front
+    else uv = vec2(-corner.x, corner.y); // back
+    float tiles = floor(1.0 / tile_size + 0.5);
+    vec2 tile_origin = vec2(mod(tile, tiles), floor(tile / tiles)) * tile_size;
+    vec4 position = vec4(chunk_origin + corner - 0.5, 1.0);
+    gl_Position = gl_ModelViewProjectionMatrix * position;
+    gl_FrontColor = gl_Color;
+    tile_coord = vec4(uv, tile_origin);
+    gl_FogFragCoord = abs((gl_ModelViewMatrix * position).z);
+}
+"""
+
+COMPACT_ATTRIBUTES = {"packed": 0}
+"""
+Locations of the compact shader's attributes, packed is read from the vertex buffer of a CompactMesh, see renderer.py.
+"""
+
+TILE_FRAGMENT_SOURCE = """
+#version 120
+uniform sampler2D atlas;
+uniform float tile_size;
+varying vec4 tile_coord;
+
+void main() {
+    vec2 uv = tile_coord.zw + fract(tile_coord.xy) * tile_size;
+    vec4 color = texture2D(atlas, uv) * gl_Color;
+    float fog = clamp((gl_Fog.end - gl_FogFragCoord) * gl_Fog.scale, 0.0, 1.0);
+    gl_FragColor = mix(gl_Fog.color, color, fog);
+}
+"""
+
+
+class ShaderError(Exception):
+    pass
+
+
+def compile_shader(kind, source):
+    """
+    @param kind: GL_VERTEX_SHADER or GL_FRAGMENT_SHADER
+    @param source: (str) GLSL source code
+    @return: (int) GL name of the compiled shader
+    """
+    shader = glCreateShader(kind)
+    source = ctypes.create_string_buffer(source.encode("utf-8"))
+    source_ptr = ctypes.cast(ctypes.pointer(ctypes.pointer(source)), ctypes.POINTER(ctypes.POINTER(GLchar)))
+    glShaderSource(shader, 1, source_ptr, None)
+    glCompileShader(shader)
+    status = GLint()
+    glGetShaderiv(shader, GL_COMPILE_STATUS, ctypes.byref(status))
+    if not status.value:
+        raise ShaderError("failed to compile shader: %s" % get_info_log(shader, glGetShaderiv, glGetShaderInfoLog))
+    return shader
+
+def get_info_log(name, get_iv, get_log):
+    """
+    @return: (str) info log of a shader or program
+    """
+    length = GLint()
+    get_iv(name, GL_INFO_LOG_LENGTH, ctypes.byref(length))
+    log = ctypes.create_string_buffer(max(1, length.value))
+    get_log(name, length.value, None, log)
+    return log.value.decode("utf-8", "replace")
+
+
+class ShaderProgram:
+    """
+    A linked vertex and fragment shader.
+    """
+    def __init__(self, vertex_source, fragment_source, attributes=None):
+        """
+        @param attributes: (dict) maps attribute names to the generic attribute locations to bind them to
+        """
+        self.id = glCreateProgram()
+        """
+        GL name of the program.
+        """
+        shaders = [compile_shader(GL_VERTEX_SHADER, vertex_source), compile_shader(GL_FRAGMENT_SHADER, fragment_source)]
+        for shader in shaders:
+            glAttachShader(self.id, shader)
+        for name, location in (attributes or {}).items():
+            glBindAttribLocation(self.id, location, ctypes.create_string_buffer(name.encode("utf-8")))
+        glLinkProgram(self.id)
+        for shader in shaders:
+            glDeleteShader(shader) # only flags the shaders, they are freed along with the program
+        status = GLint()
+        glGetProgramiv(self.id, GL_LINK_STATUS, ctypes.byref(status))
+        if not status.value:
+            raise ShaderError("failed to link program: %s" % get_info_log(self.id, glGetProgramiv, glGetProgramInfoLog))
+        self.uniforms = {}
+        """
+        Caches uniform locations by name.
+        """
+
+    def get_uniform(self, name):
+        """
+        @param name: (str) name of a uniform in the program
+        @return: (int) location of the uniform
+        """
+        if name not in self.uniforms:
+            self.uniforms[name] = glGetUniformLocation(self.id, ctypes.create_string_buffer(name.encode("utf-8")))
+        return self.uniforms[name]
+
+    def use(self):
+        glUseProgram(self.id)
+
+    def stop(self):
+        glUseProgram(0)
+
+
+class TileGroup(Group):
+    """
+    Pyglet group that draws chunk meshes with the atlas texture and the tile shader.
+    """
+    def __init__(self, texture, parent=None):
+        super(TileGroup, self).__init__(parent)
+        self.texture = texture
+        self.program = self.create_program()
+
+    def create_program(self):
+        return ShaderProgram(TILE_VERTEX_SOURCE, TILE_FRAGMENT_SOURCE)
+
+    def set_state(self):
+        glEnable(self.texture.target)
+        glActiveTexture(GL_TEXTURE0)
+        glBindTexture(self.texture.target, self.texture.id)
+        self.program.use()
+        glUniform1i(self.program.get_uniform("atlas"), 0)
+        glUniform1f(self.program.get_uniform("tile_size"), 1.0 / ATLAS_TILES)
+
+    def unset_state(self):
+        self.program.stop()
+        glDisable(self.texture.target)
+
+
+class CompactGroup(TileGroup):
+    """
+    Pyglet group that draws chunk meshes in the compact vertex format.
+    Every chunk has to be drawn on its own after calling set_origin, since its vertices are relative to its origin.
+    """
+    def create_program(self):
+        return ShaderProgram(COMPACT_VERTEX_SOURCE, TILE_FRAGMENT_SOURCE, COMPACT_ATTRIBUTES)
+
+    def set_origin(self, origin):
+        """
+        @param origin: (tuple) world coordinates of the chunk about to be drawn, see chunk_origin
+        """
+        glUniform3f(self.program.get_uniform("chunk_origin"), *origin)
@@ -0,0 +1,57 @@
+"""
+Immutable snapshots of the player's state.
+
+World.update publishes a new PlayerState after every tick by swapping a single attribute, and rendering reads that
+attribute once per frame. A snapshot is never changed after it is published, so readers need no lock and always see
+position, rotation and sight vector from the same tick.
+
+In fixed timestep mode the world ticks at exactly TICKS_PER_SEC however fast frames are drawn, and frames are drawn
+part way between the last two snapshots so motion stays smooth when the frame rate differs from the tick rate.
+"""
+
+import math
+from collections import namedtuple
+
+
+PlayerState = namedtuple("PlayerState", ("posn", "rotn", "sight_vec", "vel"))
+"""
+The player at the end of a tick.
+posn: (tuple) x, y, z position
+rotn: (tuple) horizontal and vertical rotation, see Player.rotn
+sight_vec: (tuple) unit vector the player looks along, see Player.get_sight_vec
+vel: (tuple) normalized velocity, see Player.get_vel
+"""
+
+
+def sight_vector(rotn):
+    """
+    @param rotn: (tuple) horizontal and vertical rotation in degrees, see Player.rotn
+    @return: (tuple) x, y, z unit vector pointing where a player with that rotation looks
+    """
+    horiz_rotn, vert_rotn = rotn
+    level = math.cos(math.radians(vert_rotn)) # length of the part along the ground, shrinks as the player looks up
+    x = math.sin(math.radians(horiz_rotn)) * level
+    y = math.sin(math.radians(vert_rotn))
+    z = math.cos(math.radians(horiz_rotn)) * level
+    z *= -1 # since negative z points outward from the camera
+    return (x, y, z)
+
+def lerp(a, b, alpha):
+    return a + (b - a) * alpha
+
+def interpolate(previous, current, alpha):
+    """
+    @param previous: (PlayerState) snapshot of the tick before current
+    @param current: (PlayerState) latest snapshot
+    @param alpha: (float) 0 for previous, 1 for current
+    @return: (PlayerState) the player part way between the two snapshots
+    """
+    if alpha >= 1:
+        return current
+    posn = tuple(lerp(a, b, alpha) for a, b in zip(previous.posn, current.posn))
+    old_horiz, old_vert = previous.rotn
+    new_horiz, new_vert = current.rotn
+    turn = (new_horiz - old_horiz + 180) % 360 - 180 # the short way around, horizontal rotation wraps at 180
+    horiz = (old_horiz + turn * alpha + 180) % 360 - 180
+    rotn = (horiz, lerp(old_vert, new_vert, alpha))
+    return PlayerState(posn, rotn, sight_vector(rotn), current.vel)
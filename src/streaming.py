@@ -0,0 +1,89 @@
+"""
+Streaming of chunks around the player.
+
+In streaming mode the world has no edges. Only the chunks within a radius of the player are kept in the ChunkStore;
+chunks that fall out of range are moved to a ChunkCache, which keeps the most recently unloaded ones up to a memory cap
+so flying back and forth does not regenerate them. Memory use only depends on the radius and the cap, not on how far
+the player has travelled.
+"""
+
+from config import *
+from chunk import chunk_key
+
+from collections import OrderedDict
+
+
+ENTRY_BYTES = 200 # rough size of the key tuple and dict slot of a cache entry
+
+
+class ChunkCache:
+    """
+    Least recently used cache of unloaded chunks with a memory cap.
+    """
+    def __init__(self, max_bytes=CHUNK_CACHE_BYTES):
+        """
+        @param max_bytes: (int) max total size of the cached block arrays
+        """
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        """
+        Maps chunk keys to block arrays, least recently used first. A value of None records a chunk that was all air.
+        """
+        self.nbytes = 0
+        """
+        Total size of the cached block arrays.
+        """
+
+    def put(self, key, blocks):
+        """
+        Cache an unloaded chunk, evicting the least recently used chunks if the cache is full.
+        @param key: (tuple) key of the chunk
+        @param blocks: (ndarray) block IDs of the chunk, or None if the chunk is all air
+        """
+        self.take(key)
+        self.entries[key] = blocks
+        self.nbytes += self.size(blocks)
+        while self.nbytes > self.max_bytes and self.entries:
+            _, evicted = self.entries.popitem(last=False)
+            self.nbytes -= self.size(evicted)
+
+    def take(self, key):
+        """
+        Remove a chunk from the cache.
+        @param key: (tuple) key of the chunk
+        @return: (tuple) (found, blocks), found is False if the chunk was not cached
+        """
+        if key not in self.entries:
+            return False, None
+        blocks = self.entries.pop(key)
+        self.nbytes -= self.size(blocks)
+        return True, blocks
+
+    def size(self, blocks):
+        """
+        @return: (int) approximate memory held by a cache entry, all air chunks still cost their dict entry
+        """
+        return ENTRY_BYTES + (0 if blocks is None else blocks.nbytes)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+def chunks_around(position, radius=LOAD_RADIUS, height=LOAD_HEIGHT):
+    """
+    Find the chunks that should be loaded around a position.
+    @param position: (tuple) x, y, z world coordinates, e.g. the player position
+    @param radius: (int) horizontal radius in chunks
+    @param height: (int) vertical radius in chunks
+    @return: (list) chunk keys within a cylinder around the position, nearest first
+    """
+    cx, cy, cz = chunk_key(tuple(int(c // 1) for c in position))
+    keys = []
+    for dx in range(-radius, radius + 1):
+        for dz in range(-radius, radius + 1):
+            if dx * dx + dz * dz > radius * radius:
+                continue
+            for dy in range(-height, height + 1):
+                keys.append((dx * dx + dz * dz + dy * dy, (cx + dx, cy + dy, cz + dz)))
+    keys.sort()
+    return [key for _, key in keys]
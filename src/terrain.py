@@ -0,0 +1,186 @@
+"""
+Terrain generation.
+
+Generation is split in two steps so chunks can be built independently, e.g. in worker processes. First the world is
+planned on the main thread, which only picks where the hills go. Then each chunk is filled from the plan by
+generate_chunk, a pure function of the chunk key and the plan that only depends on numpy.
+
+The endless worlds used in streaming mode have no plan up front, any chunk can be generated on its own and always comes
+out the same for the same seed. The "hills" terrain picks its hills per square region of the world from a random number
+generator seeded with the world seed and the region coordinates. The "noise" terrain shapes the ground with a fractal
+noise heightmap (see noise.py) and fills a whole chunk with a few array comparisons.
+"""
+
+from config import *
+from blocks import *
+from chunk import BLOCK_DTYPE, chunk_key, chunk_origin
+from noise import fractal
+
+import numpy as np
+from random import Random
+
+
+def plan_hills(rng=None, n=WORLD_SIZE):
+    """
+    Randomly pick the hills of the world.
+    @param rng: (Random) random number generator to draw from, a fresh unseeded one if None
+    @param n: (int) 1/2 width and height of the world
+    @return: (list) of hills as (a, b, c, h, s, t) tuples, see below
+    """
+    if rng is None:
+        rng = Random()
+    hills = []
+    o = n - 10
+    for _ in range(120):
+        a = rng.randint(-o, o)  # x position of the hill
+        b = rng.randint(-o, o)  # z position of the hill
+        c = -1  # base of the hill
+        h = rng.randint(1, 6)  # height of the hill
+        s = rng.randint(4, 8)  # 2 * s is the side length of the hill
+        t = rng.choice([BLOCK_GRASS, BLOCK_SAND, BLOCK_BRICK])
+        hills.append((a, b, c, h, s, t))
+    return hills
+
+def plan_region_hills(seed, region):
+    """
+    Pick the hills of one region of the endless world.
+    @param seed: (int) world seed
+    @param region: (tuple) rx, rz coordinates of the region, it covers x from rx*REGION_SIZE to (rx+1)*REGION_SIZE - 1
+                   and likewise for z
+    @return: (list) of hills, see plan_hills
+    """
+    rx, rz = region
+    rng = Random("%d:%d:%d" % (seed, rx, rz))
+    hills = []
+    # same density of hills as the fixed size world
+    for _ in range(REGION_SIZE * REGION_SIZE * 120 // (2 * WORLD_SIZE - 19) ** 2):
+        a = rng.randrange(rx * REGION_SIZE, (rx + 1) * REGION_SIZE)
+        b = rng.randrange(rz * REGION_SIZE, (rz + 1) * REGION_SIZE)
+        hills.append((a, b, -1, rng.randint(1, 6), rng.randint(4, 8), rng.choice([BLOCK_GRASS, BLOCK_SAND, BLOCK_BRICK])))
+    return hills
+
+def generate_endless_chunk(key, seed=0):
+    """
+    Fill a chunk of the endless world.
+    @param key: (tuple) key of the chunk
+    @param seed: (int) world seed
+    @return: (ndarray) block IDs of the chunk indexed by local x, y, z, or None if the chunk is all air
+    """
+    ox, _, oz = chunk_origin(key)
+    # hills are at most 8 blocks wide each way, so only regions within that distance of the chunk can reach into it
+    low_x, low_z = (ox - 8) // REGION_SIZE, (oz - 8) // REGION_SIZE
+    high_x, high_z = (ox + CHUNK_SIZE + 8) // REGION_SIZE, (oz + CHUNK_SIZE + 8) // REGION_SIZE
+    hills = []
+    for rx in range(low_x, high_x + 1):
+        for rz in range(low_z, high_z + 1):
+            hills.extend(plan_region_hills(seed, (rx, rz)))
+    return generate_chunk(key, hills, None)
+
+def noise_heightmap(x, z, seed):
+    """
+    @param x: (ndarray) x coordinates of columns
+    @param z: (ndarray) z coordinates of columns, broadcastable against x
+    @param seed: (int) world seed
+    @return: (ndarray) y coordinate of the surface block of each column of the noise terrain
+    """
+    height = fractal(x / NOISE_SCALE, z / NOISE_SCALE, seed, NOISE_OCTAVES)
+    return np.floor(-2 + height * TERRAIN_HEIGHT).astype(np.int64)
+
+def generate_noise_chunk(key, seed=0):
+    """
+    Fill a chunk of the noise terrain.
+    @param key: (tuple) key of the chunk
+    @param seed: (int) world seed, must not be negative
+    @return: (ndarray) block IDs of the chunk indexed by local x, y, z, or None if the chunk is all air
+    """
+    ox, oy, oz = chunk_origin(key)
+    x = np.arange(ox, ox + CHUNK_SIZE)[:, None, None]
+    y = np.arange(oy, oy + CHUNK_SIZE)[None, :, None]
+    z = np.arange(oz, oz + CHUNK_SIZE)[None, None, :]
+    surface = noise_heightmap(x, z, seed)
+    if (surface < oy).all():
+        return None
+
+    # material layers from the bottom up: stone, then a few blocks of sand under low lying ground, then the top block
+    beach = surface <= SEA_LEVEL
+    under = np.where(beach & (y >= surface - 3), BLOCK_SAND, BLOCK_STONE)
+    top = np.where(beach, BLOCK_SAND, BLOCK_GRASS)
+    blocks = np.where(y < surface, under, np.where(y == surface, top, BLOCK_AIR)).astype(BLOCK_DTYPE)
+
+    if not blocks.any():
+        return None
+    return blocks
+
+def get_generator(name):
+    """
+    @param name: (str) name of an endless terrain, a key of GENERATORS
+    @return: (function) chunk generator taking a chunk key and a world seed
+    """
+    try:
+        return GENERATORS[name]
+    except KeyError:
+        raise ValueError("unknown terrain '%s', expected one of %s" % (name, ", ".join(GENERATORS)))
+
+def world_chunk_keys(hills, n=WORLD_SIZE):
+    """
+    @param hills: (list) hills returned by plan_hills
+    @param n: (int) 1/2 width and height of the world
+    @return: (list) keys of every chunk generate_chunk can put blocks in
+    """
+    top = max([2] + [c + h - 1 for _, _, c, h, _, _ in hills])
+    low_x, low_y, low_z = chunk_key((-n, -3, -n))
+    high_x, high_y, high_z = chunk_key((n, top, n))
+    return [(cx, cy, cz)
+            for cx in range(low_x, high_x + 1)
+            for cy in range(low_y, high_y + 1)
+            for cz in range(low_z, high_z + 1)]
+
+def generate_chunk(key, hills, n=WORLD_SIZE):
+    """
+    Fill a chunk from the world plan.
+    @param key: (tuple) key of the chunk
+    @param hills: (list) hills returned by plan_hills
+    @param n: (int) 1/2 width and height of the world, None for a world without edges or walls
+    @return: (ndarray) block IDs of the chunk indexed by local x, y, z, or None if the chunk is all air
+    """
+    ox, oy, oz = chunk_origin(key)
+    blocks = np.zeros((CHUNK_SIZE, CHUNK_SIZE, CHUNK_SIZE), dtype=BLOCK_DTYPE)
+    # world coordinates of every block in the chunk, broadcastable against blocks
+    x = np.arange(ox, ox + CHUNK_SIZE)[:, None, None]
+    y = np.arange(oy, oy + CHUNK_SIZE)[None, :, None]
+    z = np.arange(oz, oz + CHUNK_SIZE)[None, None, :]
+
+    inside = (abs(x) <= n) & (abs(z) <= n) if n is not None else np.True_
+    # create a layer stone an grass everywhere.
+    blocks[np.broadcast_to(inside & (y == -2), blocks.shape)] = BLOCK_GRASS
+    blocks[np.broadcast_to(inside & (y == -3), blocks.shape)] = BLOCK_STONE
+    if n is not None:
+        # create outer walls.
+        walls = inside & ((abs(x) == n) | (abs(z) == n)) & (y >= -2) & (y <= 2)
+        blocks[np.broadcast_to(walls, blocks.shape)] = BLOCK_STONE
+
+    # hills are applied in order so later hills overwrite earlier ones
+    spawn = x ** 2 + z ** 2 < 5 ** 2
+    for a, b, c, h, s, t in hills:
+        if a + s < ox or a - s >= ox + CHUNK_SIZE or b + s < oz or b - s >= oz + CHUNK_SIZE:
+            continue
+        if c + h <= oy or c >= oy + CHUNK_SIZE:
+            continue
+        # side length decrements every layer so hills taper off
+        side = s - (y - c)
+        hill = (y >= c) & (y < c + h) & (abs(x - a) <= side) & (abs(z - b) <= side)
+        hill &= ((x - a) ** 2 + (z - b) ** 2 <= (side + 1) ** 2) & ~spawn
+        blocks[hill] = t
+
+    if not blocks.any():
+        return None
+    return blocks
+
+
+GENERATORS = {
+    "hills": generate_endless_chunk,
+    "noise": generate_noise_chunk,
+}
+"""
+Maps names of endless terrains to their chunk generators.
+"""
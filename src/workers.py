@@ -0,0 +1,100 @@
+"""
+Background workers for chunk generation and meshing.
+
+Jobs are plain functions of plain data (numpy arrays, tuples) that run in a process pool, so they use every core and
+never hold up the pyglet loop. Finished jobs are put on a queue that the main thread drains a little at a time.
+"""
+
+from config import *
+from profiler import PROFILER, timed_call
+
+import os
+import queue
+from concurrent.futures import Future, ProcessPoolExecutor
+
+
+class WorkerPool:
+    """
+    Runs jobs in worker processes and collects their results for the main thread.
+    """
+    def __init__(self, workers=WORKER_COUNT):
+        """
+        @param workers: (int) number of worker processes, None for one per core, 0 to run jobs on the calling thread
+        """
+        self.executor = ProcessPoolExecutor(workers) if workers != 0 else None
+        """
+        Process pool jobs run in, None when jobs run on the calling thread.
+        """
+        self.results = queue.Queue()
+        """
+        Finished jobs as (tag, future, phase) tuples, filled from the executor's threads.
+        """
+        self.pending = 0
+        """
+        Number of submitted jobs whose results have not been taken yet.
+        """
+
+    def submit(self, tag, fn, *args, phase=None):
+        """
+        Start a job.
+        @param tag: any value identifying the job, handed back along with its result
+        @param fn: (function) module level function to run, it and its arguments must be picklable
+        @param args: arguments to call fn with
+        @param phase: (str) profiler phase to record the job's run time under, see profiler.py, None to not time it
+        """
+        self.pending += 1
+        if phase is not None and PROFILER.enabled:
+            fn, args = timed_call, (fn,) + args
+        else:
+            phase = None
+        if self.executor is None:
+            future = Future()
+            future.set_result(fn(*args))
+        else:
+            future = self.executor.submit(fn, *args)
+        future.add_done_callback(lambda future: self.results.put((tag, future, phase)))
+
+    def finish(self, tag, future, phase):
+        """
+        @return: (tuple) (tag, result) of a finished job, recording its run time if it was timed
+        """
+        self.pending -= 1
+        result = future.result()
+        if phase is not None:
+            result, start, duration, pid = result
+            PROFILER.record(phase, start, duration, None if pid == os.getpid() else pid)
+        return tag, result
+
+    def take(self, limit=None):
+        """
+        Take results of finished jobs without waiting for unfinished ones.
+        @param limit: (int) max number of results to take, None for all of them
+        @return: (list) of (tag, result) tuples in the order the jobs finished
+
+        If a job raised an exception it is raised again here, on the main thread.
+        """
+        taken = []
+        while limit is None or len(taken) < limit:
+            try:
+                job = self.results.get_nowait()
+            except queue.Empty:
+                break
+            taken.append(self.finish(*job))
+        return taken
+
+    def wait(self):
+        """
+        Block until every submitted job has finished.
+        @return: (list) of (tag, result) tuples of all untaken jobs
+        """
+        taken = []
+        while self.pending:
+            taken.append(self.finish(*self.results.get()))
+        return taken
+
+    def shutdown(self):
+        """
+        Stop the workers, dropping jobs that have not started.
+        """
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
@@ -16,33 +16,132 @@ z: positive goes south, negative goes north
 
 from config import *
 from utils import *
+from blocks import *
+from chunk import ChunkStore, BLOCK_DTYPE, chunk_key, chunk_local, chunk_origin
+from geometry import FACES
+from mesher import padded_blocks, get_mesher, build_chunk
+from terrain import plan_hills, world_chunk_keys, generate_chunk, get_generator
+from streaming import ChunkCache, chunks_around
+from region import WorldSave
+from raycast import raycast, raycast_many
+from edits import chunk_windows, edit_region
+from heightmap import NO_HEIGHT
+from collision import player_box, sweep_box
+from culling import camera_matrix, frustum_planes
+from occlusion import reachable_chunks
+from workers import WorkerPool
+from profiler import PROFILER
+from lod import LOD_FACTORS, lod_level, chunk_distance
+from snapshot import PlayerState, sight_vector, interpolate
+from entities import Entities
+from protocol import CHUNK
 
 import math
-from random import randint, choice
+import time
+import numpy as np
+from collections import deque
+from random import Random
 from threading import Lock
-from pyglet import image
-from pyglet.graphics import TextureGroup, Batch
-from pyglet.gl import GL_QUADS
 
 
 class World:
     """
     Provides a single interface to all submodel classes.
     """
-    def __init__(self):
-        self.map = Map()
-        self.player = Player()
+    def __init__(self, renderer=None, source=None, save_dir=None):
+        """
+        @param renderer: (ChunkRenderer) draws the world, see renderer.py, None for a headless world that cannot be drawn
+        @param source: (ChunkClient) connection to the server the world's chunks come from, see client.py, None to
+                       generate the world locally
+        @param save_dir: (str) directory a local world is saved in, e.g. SAVE_DIR, None to not save it
+        """
+        self.map = Map(renderer, source=source, save_dir=save_dir)
+        self.player = Player(self.map.chunks if COLLISION else None)
+        self.fixed_timestep = FIXED_TIMESTEP
+        """
+        If true the world ticks at exactly TICKS_PER_SEC and get_player_state interpolates between ticks.
+        """
+        self.accumulator = 0.0
+        """
+        Seconds of time passed that fixed timestep ticks have not covered yet.
+        """
+        self.tick_time = time.perf_counter()
+        """
+        time.perf_counter() at the end of the last update.
+        """
+        self.spawned = False
+        """
+        Set once the player was put on the ground of the spawn area, see spawn_player.
+        """
+        self.entities = Entities()
+        """
+        Mobs, projectiles, particles and anything else that moves, see entities.py.
+        """
 
-    def draw(self):
-        self.map.draw()
+    def draw(self, aspect, state=None):
+        """
+        Draw the parts of the world the player can see.
+        @param aspect: (float) width / height of the window
+        @param state: (PlayerState) player to draw the world for, see get_player_state, None for the latest one
+        """
+        state = state or self.get_player_state()
+        with PROFILER.timer("draw"):
+            planes = frustum_planes(camera_matrix(state.rotn, state.posn, state.sight_vec, aspect))
+            self.map.draw(planes, state.posn)
 
     def update(self, dt):
         """
         Called every frame.
         @param dt: float of the time passed since the last update
         """
+        with PROFILER.timer("update"):
+            if self.fixed_timestep:
+                step = 1.0 / TICKS_PER_SEC
+                self.accumulator += dt
+                ticks = min(int(self.accumulator / step), MAX_TICKS_PER_UPDATE)
+                self.accumulator = min(self.accumulator - ticks * step, step)
+                for _ in range(ticks):
+                    self.tick(step)
+            else:
+                self.tick(dt)
+            # jobs and meshes once per frame however many ticks ran, so catching up never does several remesh passes
+            self.map.update_frame()
+            self.tick_time = time.perf_counter()
+
+    def tick(self, dt):
+        """
+        Advance the world and publish a new player state.
+        @param dt: (float) seconds to advance by
+        """
+        self.map.set_focus(self.player.state.posn)
+        self.map.tick(dt)
+        if not self.spawned and self.is_spawn_ready():
+            self.spawn_player()
+        self.entities.tick(dt, self.map.chunks)
         self.player.update(dt)
 
+    def spawn_player(self):
+        """
+        Stand the player on the ground of its column, once the spawn area is generated.
+        """
+        self.spawned = True
+        x, _, z = self.player.state.posn
+        height = self.map.get_height(int(math.floor(x + 0.5)), int(math.floor(z + 0.5)))
+        if height != NO_HEIGHT:
+            self.player.teleport((x, height + 0.5 + EYE_HEIGHT, z))
+
+    def get_player_state(self):
+        """
+        Read the player without locking, e.g. once per frame for rendering.
+        @return: (PlayerState) the latest published player state, or in fixed timestep mode the player part way
+                 between the last two ticks, according to how much of the next tick has passed
+        """
+        previous, current = self.player.states
+        if not self.fixed_timestep:
+            return current
+        alpha = (self.accumulator + time.perf_counter() - self.tick_time) * TICKS_PER_SEC
+        return interpolate(previous, current, min(1.0, alpha))
+
     def add_forward_strafe(self):
         self.player.add_forward_strafe()
     
@@ -64,95 +163,722 @@ class World:
     def add_player_rotn(self, horiz, vert):
         self.player.add_rotn(horiz, vert)
 
+    def close(self):
+        self.map.close()
+
+    def get_target(self):
+        """
+        @return: (tuple) hit of the block the player is looking at, see raycast.py, None if it is out of reach
+        """
+        state = self.player.state
+        return self.map.raycast(state.posn, state.sight_vec)
+
+    def break_block(self):
+        """
+        Remove the block the player is looking at.
+        """
+        target = self.get_target()
+        if target:
+            self.map.remove_block(target[0])
+
+    def place_block(self, block=BLOCK_BRICK):
+        """
+        Place a block against the face of the block the player is looking at.
+        @param block: (int) ID of the block to place
+        """
+        target = self.get_target()
+        if not target or target[2] is None:
+            return
+        position = vec_add(target[0], FACES[target[2]])
+        if position != tuple(int(math.floor(c + 0.5)) for c in self.player.state.posn): # not inside the player
+            self.map.add_block(position, block)
+
+    def toggle_occlusion(self):
+        """
+        Turn occlusion culling on or off.
+        """
+        self.map.occlusion = not self.map.occlusion
+
+    def toggle_mesher(self):
+        """
+        Switch the map between the culled and greedy meshers.
+        """
+        self.map.set_mesher("culled" if self.map.mesher == "greedy" else "greedy")
+
+    def get_chunk_counts(self):
+        """
+        @return: (tuple) number of chunks drawn and number of chunks culled in the last frame
+        """
+        renderer = self.map.renderer
+        return renderer.drawn_chunks, renderer.culled_chunks
+
+    def is_spawn_ready(self):
+        """
+        @return: (bool) true once every chunk within SPAWN_RADIUS of the player is generated
+        """
+        return not self.map.pending_near(SPAWN_RADIUS)
+
+    def is_complete(self):
+        """
+        @return: (bool) true once the whole world is generated, meshed and uploaded, see Map.is_complete
+        """
+        return self.map.is_complete()
+
     def get_player_rotn(self):
-        return self.player.rotn
+        return self.player.state.rotn
 
     def get_player_posn(self):
-        return self.player.posn
+        return self.player.state.posn
 
     def get_player_vel(self):
-        return self.player.get_vel()
+        return self.player.state.vel
 
     def get_player_sight_vec(self):
-        return self.player.get_sight_vec()
+        return self.player.state.sight_vec
 
 
 class Map:
-    def __init__(self):
-        self.batch = Batch()
+    def __init__(self, renderer=None, mesher=MESHER, workers=WORKER_COUNT, uploads_per_frame=UPLOADS_PER_FRAME,
+                 streaming=STREAMING, seed=WORLD_SEED, terrain=TERRAIN, save_dir=None, world_size=WORLD_SIZE,
+                 source=None):
+        self.renderer = renderer
+        """
+        Draws the meshes of the chunks, see renderer.py. None for a headless map, which never meshes its chunks and
+        needs no display.
+        """
+        self.mesher = mesher
+        """
+        Name of the mesher chunks are built with, see mesher.py.
+        """
+        self.chunks = ChunkStore()
+        """
+        Stores the ID of the block at every coordinate.
+        """
+        self.dirty = set()
+        """
+        Keys of chunks whose blocks changed since they were last meshed.
+        """
+        self.workers = WorkerPool(workers)
         """
-        Pyglet vertex batch for all blocks in the world.
+        Worker processes that generate and mesh chunks off the main thread.
         """
-        self.group = TextureGroup(image.load(TEXTURE_PATH).get_texture())
+        self.mesh_versions = {}
         """
-        Pyglet texture group that stores our texture atlas.
-        Block textures are cropped from this atlas. It's more efficient than loading textures individually.
+        Maps chunk keys to the number of mesh jobs submitted for the chunk, so meshes that were outdated by a later edit
+        before they finished can be dropped.
         """
-        self.blocks = {}
+        self.meshed = deque()
         """
-        Maps coordinates to the block that exists at that coordinate.
+        Finished meshes waiting to be uploaded, as (key, version, (mesh, connectivity)) tuples, see build_chunk.
+        """
+        self.uploads_per_frame = uploads_per_frame
+        """
+        Max number of meshes uploaded per frame, keeps frame time flat while lots of chunks are finishing.
+        """
+        self.source = source
+        """
+        Connection to the server chunks come from instead of being generated, see client.py, None for a local world.
+        Edits are sent to the server and the server's changes are applied as they arrive. Only chunks the server sent
+        can be edited, the server rejects edits of any other and would undo them.
+        """
+        self.versions = {}
+        """
+        Maps keys of the chunks the server sent to the version of them the map has, see protocol.py.
+        """
+        self.streaming = streaming or source is not None
+        """
+        If true the world is endless and only chunks around the focus are kept loaded, see streaming.py.
+        """
+        self.save = WorldSave(save_dir) if save_dir else None
+        """
+        Region files the world is saved in, None if it is not saved. Saving is opt in, a map only writes to save_dir
+        when one is given.
+        """
+        settings = self.save.load_settings() if self.save else {}
+        if seed is None:
+            seed = Random().randrange(2 ** 31)
+        self.seed = settings.get("seed", seed)
+        """
+        Seed the world is generated from, the same seed always generates the same world.
+        A saved world keeps the seed it was created with so chunks that were never saved still match the saved ones.
+        """
+        self.terrain = settings.get("terrain", terrain)
+        """
+        Name of the terrain generator of the endless world in streaming mode, see terrain.py.
+        """
+        self.world_size = world_size
+        """
+        1/2 width and height of the generated world when not streaming.
+        """
+        self.unsaved = set()
+        """
+        Keys of chunks that were edited since they were last saved. Chunks that were only generated are never saved,
+        the seed generates them again.
+        """
+        self.edited = set()
+        """
+        Keys of chunks whose blocks were edited since take_edited was last called, see server.py.
+        """
+        self.written = {}
+        """
+        Maps keys of chunks edited before they were loaded to bool masks of the blocks that were edited, indexed by
+        local x, y, z. Those blocks keep their edited IDs, air included, once the chunk is loaded, see load_chunk.
+        """
+        self.autosave_time = 0
+        """
+        Seconds since the last autosave.
+        """
+        self.pack_time = 0
+        """
+        Seconds since idle chunks were last packed.
+        """
+        self.loaded = set()
+        """
+        Keys of chunks that have been generated or loaded, including all air chunks which are not in the store.
+        """
+        self.requested = set()
+        """
+        Keys of chunks that are being generated.
+        """
+        self.wanted = set()
+        """
+        Keys of chunks that should be loaded in streaming mode.
+        """
+        self.cache = ChunkCache()
+        """
+        Recently unloaded chunks in streaming mode.
+        """
+        self.focus = (0, 0, 0)
+        """
+        Position chunks are streamed in around, usually the player position.
+        """
+        self.focus_key = None
+        """
+        Key of the chunk containing the focus in the last update, chunks are only reprioritized when it changes.
+        """
+        self.queue = deque()
+        """
+        Chunks waiting to be requested, nearest to the focus first, as (key, generator, args) tuples, see
+        request_chunk. Only JOBS_IN_FLIGHT chunks are generated at once, so the chunks around the player are done
+        first and the rest of the world fills in behind them.
+        """
+        self.lods = {}
+        """
+        Maps chunk keys to the level of detail their mesh was last built at, see lod.py.
+        """
+        self.connectivity = {}
+        """
+        Maps chunk keys to which faces of the chunk its air connects, see occlusion.py. Comes with every mesh, so an
+        edit only updates the chunks it remeshes.
+        """
+        self.occlusion = OCCLUSION_CULLING
+        """
+        If true chunks hidden behind solid chunks are not drawn.
         """
         self.generate()
 
+    def update(self, dt):
+        """
+        Called every frame by maps that are not part of a World, e.g. headless ones, see tick and update_frame.
+        @param dt: float of the time passed since the last update
+        """
+        self.tick(dt)
+        self.update_frame()
+
+    def tick(self, dt):
+        """
+        Advance the timers of the map and follow the focus, called every simulation tick.
+        @param dt: (float) seconds to advance by
+        """
+        key = chunk_key(tuple(int(c // 1) for c in self.focus))
+        if key != self.focus_key:
+            self.focus_key = key
+            if self.streaming:
+                self.stream()
+            else:
+                self.prioritize()
+            self.update_lods()
+        self.autosave_time += dt
+        if self.save and self.autosave_time >= AUTOSAVE_INTERVAL:
+            self.save_world()
+        self.pack_time += dt
+        if self.pack_time >= PACK_INTERVAL:
+            self.pack_time = 0
+            self.chunks.start_sweep()
+
+    def update_frame(self):
+        """
+        Take finished jobs, start new ones, pack idle chunks and upload meshes, called once per frame. Each of these is
+        capped per call, so it has to run once per frame however many ticks the frame ran.
+        """
+        with PROFILER.timer("pack"):
+            self.chunks.pack_idle(SWEPT_PER_FRAME)
+        for (job, key, version), result in self.workers.take():
+            if job == "generate":
+                self.requested.discard(key)
+                if not self.streaming or key in self.wanted:
+                    self.load_chunk(key, result)
+            else:
+                self.meshed.append((key, version, result))
+        if self.written and not self.streaming and not (self.queue or self.requested):
+            self.written.clear() # the whole world is loaded, the rest are edits of chunks outside of it
+        if self.source:
+            self.apply_streamed()
+        self.request_queued()
+        self.remesh_dirty()
+        with PROFILER.timer("upload"):
+            for _ in range(min(self.uploads_per_frame, len(self.meshed))):
+                key, version, (mesh, connectivity) = self.meshed.popleft()
+                if version == self.mesh_versions.get(key):
+                    self.connectivity[key] = connectivity
+                    self.renderer.show_mesh(key, mesh)
+
     def generate(self):
-        # 3d plus shape at origin
-        #self.add_block((0, 0, 0), GRASS) # origin
-        #self.add_block((0, 1, 0), GRASS) # on top of origin
-        #self.add_block((0, -1, 0), GRASS) # on bottom of origin
-        #self.add_block((1, 0, 0), GRASS) # west of origin
-        #self.add_block((-1, 0, 0), GRASS) # east of origin
-        #self.add_block((0, 0, 1), GRASS) # south of origin
-        #self.add_block((0, 0, -1), GRASS) # north of origin
-        n = 80  # 1/2 width and height of world
-        s = 1  # step size
-        y = 0  # initial y height
-        for x in range(-n, n + 1, s):
-            for z in range(-n, n + 1, s):
-                # create a layer stone an grass everywhere.
-                self.add_block((x, y - 2, z), GRASS)
-                self.add_block((x, y - 3, z), STONE)
-                if x in (-n, n) or z in (-n, n):
-                    # create outer walls.
-                    for dy in range(-2, 3):
-                        self.add_block((x, y + dy, z), STONE)
-
-        # generate the hills randomly
-        o = n - 10
-        for _ in range(120):
-            a = randint(-o, o)  # x position of the hill
-            b = randint(-o, o)  # z position of the hill
-            c = -1  # base of the hill
-            h = randint(1, 6)  # height of the hill
-            s = randint(4, 8)  # 2 * s is the side length of the hill
-            d = 1  # how quickly to taper off the hills
-            t = choice([GRASS, SAND, BRICK])
-            for y in range(c, c + h):
-                for x in range(a - s, a + s + 1):
-                    for z in range(b - s, b + s + 1):
-                        if (x - a) ** 2 + (z - b) ** 2 > (s + 1) ** 2:
-                            continue
-                        if (x - 0) ** 2 + (z - 0) ** 2 < 5 ** 2:
-                            continue
-                        self.add_block((x, y, z), t)
-                s -= d  # decrement side length so hills taper off
-
-    def add_block(self, position, texture):
-        self.blocks[position] = texture
-        x, y, z = position
-        vertex_data = cube_vertices(x, y, z, 0.5)
-        texture_data = list(texture)
-        # create vertex list
-        # TODO use add_indexed
-        self.batch.add(24, GL_QUADS, self.group,
-            ('v3f/static', vertex_data),
-            ('t2f/static', texture_data))
-
-    def draw(self):
-        self.batch.draw()
+        """
+        Plan the world and queue all of its chunks, nearest to the focus first. Nothing is generated yet, so the first
+        frame can be drawn right away.
+        In streaming mode nothing is queued up front, chunks are queued as the focus moves.
+        """
+        if self.streaming:
+            return
+        hills = plan_hills(Random(self.seed), self.world_size)
+        keys = world_chunk_keys(hills, self.world_size)
+        if self.save:
+            keys = set(keys) | set(self.save.saved_keys()) # chunks edited outside of the generated area
+        keys = sorted(keys, key=lambda key: chunk_distance(key, self.focus))
+        self.queue = deque((key, generate_chunk, (key, hills, self.world_size)) for key in keys)
+
+    def prioritize(self):
+        """
+        Reorder the queue so the chunks nearest to the focus are requested first.
+        """
+        self.queue = deque(sorted(self.queue, key=lambda item: chunk_distance(item[0], self.focus)))
+
+    def request_queued(self):
+        """
+        Request chunks from the front of the queue until JOBS_IN_FLIGHT chunks are being generated.
+        Chunks coming from a server are all requested at once, the server sends them in the order of the queue.
+        """
+        if self.source:
+            if self.queue:
+                keys = [key for key, _, _ in self.queue]
+                self.queue.clear()
+                self.requested.update(keys)
+                self.source.subscribe(keys)
+            return
+        while self.queue and len(self.requested) < JOBS_IN_FLIGHT:
+            key, generator, args = self.queue.popleft()
+            self.request_chunk(key, generator, *args)
+
+    def pending_near(self, radius):
+        """
+        @param radius: (float) distance from the focus in chunks
+        @return: (int) number of chunks within the radius that are still queued or being generated
+        """
+        keys = [key for key, _, _ in self.queue] + list(self.requested)
+        return sum(1 for key in keys if chunk_distance(key, self.focus) <= radius)
+
+    def is_complete(self):
+        """
+        @return: (bool) true once every queued chunk is loaded and, if there is a renderer, meshed and uploaded
+        """
+        if self.focus_key is None:
+            return False # not updated yet, in streaming mode nothing is queued before the first update
+        return not (self.queue or self.requested or self.dirty or self.meshed or self.workers.pending)
+
+    def request_chunk(self, key, generator, *args):
+        """
+        Load a chunk from the save if it is in there, otherwise start generating it.
+        @param key: (tuple) key of the chunk
+        @param generator: (function) chunk generator, see terrain.py
+        @param args: arguments to call the generator with
+        """
+        if self.save:
+            found, blocks = self.save.load_chunk(key)
+            if found:
+                self.load_chunk(key, blocks)
+                return
+        self.requested.add(key)
+        self.workers.submit(("generate", key, None), generator, *args, phase="generate")
+
+    def save_world(self):
+        """
+        Write all chunks that changed since the last save.
+        """
+        self.autosave_time = 0
+        if not self.save:
+            return
+        self.save.save_settings({"seed": self.seed, "terrain": self.terrain})
+        chunks = {}
+        for key in self.unsaved:
+            chunk = self.chunks.get_chunk(key)
+            chunks[key] = chunk.unpacked() if chunk is not None else None
+        self.save.save_chunks(chunks)
+        self.unsaved = set()
+
+    def set_focus(self, position):
+        """
+        @param position: (tuple) x, y, z position to stream chunks in around
+        """
+        self.focus = position
+
+    def stream(self):
+        """
+        Unload chunks that are out of range of the focus and queue the ones that came into range, nearest first.
+        """
+        wanted = chunks_around(self.focus)
+        self.wanted = set(wanted)
+        unloading = (self.loaded | self.requested) - self.wanted
+        if self.save and unloading & self.unsaved:
+            # the cache may drop them, save first so edits are never lost
+            self.save_world()
+        for key in unloading:
+            self.unload_chunk(key)
+        for key in [key for key in self.written if key not in self.wanted]:
+            del self.written[key] # never requested, the edits stay in the chunk as they are
+        if self.source and unloading:
+            self.source.unsubscribe(unloading)
+        queue = []
+        for key in wanted:
+            if key in self.loaded or key in self.requested:
+                continue
+            # the server may have changed a chunk while it was unloaded, so only a local world uses the cache
+            found, blocks = self.cache.take(key) if not self.source else (False, None)
+            if found:
+                self.load_chunk(key, blocks)
+            else:
+                queue.append((key, get_generator(self.terrain), (key, self.seed)))
+        queue.sort(key=lambda item: chunk_distance(item[0], self.focus))
+        self.queue = deque(queue)
+
+    def unload_chunk(self, key):
+        """
+        Take a chunk out of the world and keep it in the cache.
+        @param key: (tuple) key of the chunk
+        """
+        if key in self.loaded and not self.source:
+            chunk = self.chunks.get_chunk(key)
+            self.cache.put(key, chunk.unpacked() if chunk is not None else None)
+        self.chunks.set_chunk(key, None)
+        if self.renderer:
+            self.renderer.hide_chunk(key)
+        self.mesh_versions.pop(key, None) # drops meshes of the chunk that are still being built
+        self.lods.pop(key, None)
+        self.connectivity.pop(key, None)
+        self.loaded.discard(key)
+        self.requested.discard(key)
+        self.dirty.discard(key)
+        self.unsaved.discard(key)
+        self.written.pop(key, None)
+        self.versions.pop(key, None)
+
+    def load_chunk(self, key, blocks):
+        """
+        Put a generated chunk into the world.
+        @param key: (tuple) key of the chunk
+        @param blocks: (ndarray) block IDs of the chunk, or None if it is all air
+        """
+        self.loaded.add(key)
+        written = self.written.pop(key, None)
+        if blocks is None:
+            return
+        chunk = self.chunks.get_chunk(key)
+        if chunk is not None or written is not None:
+            # blocks were edited before the chunk finished generating, keep them
+            edited = chunk.unpacked() if chunk is not None else np.zeros_like(blocks)
+            keep = edited != BLOCK_AIR
+            if written is not None:
+                keep |= written
+            blocks = np.where(keep, edited, blocks)
+            self.unsaved.add(key) # a save made before it finished only holds the edits
+        self.chunks.set_chunk(key, blocks)
+        # faces of the neighbors that were facing into this chunk may be hidden now
+        cx, cy, cz = key
+        self.dirty.add(key)
+        self.dirty.update(neighbor for neighbor in ((cx + dx, cy + dy, cz + dz) for dx, dy, dz in FACES)
+                          if self.chunks.get_chunk(neighbor) is not None)
+
+    def apply_streamed(self):
+        """
+        Apply the chunks and block changes that arrived from the server, see client.py. They were received and
+        decompressed on the client's thread, so applying them is only a few array operations each.
+        A chunk older than the version the map has is dropped, and so are changes the map already has. Changes that
+        skip a version mean some were lost, the chunk is asked for again and arrives whole.
+        """
+        for message in self.source.take(STREAMED_PER_FRAME):
+            kind, key, version = message[:3]
+            if key not in self.wanted:
+                continue # unloaded after it was sent
+            if kind == CHUNK:
+                blocks = message[3]
+                if version < self.versions.get(key, version):
+                    continue # sent before changes the map already applied
+                self.versions[key] = version
+                self.requested.discard(key)
+                if key not in self.loaded:
+                    self.chunks.set_chunk(key, None) # the server's blocks replace anything filled in before they came
+                    self.load_chunk(key, blocks)
+                    continue
+                self.chunks.set_chunk(key, blocks)
+                self.mark_changed(key, (0, 0, 0), (CHUNK_SIZE - 1,) * 3)
+            elif key in self.loaded:
+                indices, blocks = message[3:]
+                held = self.versions.get(key)
+                if held is None or version <= held:
+                    continue # asked for again, or changes the map already has
+                if version > held + 1:
+                    del self.versions[key] # until the whole chunk arrives again
+                    self.source.unsubscribe([key])
+                    self.source.subscribe([key])
+                    continue
+                self.versions[key] = version
+                chunk = self.chunks.get_chunk(key)
+                changed = chunk.blocks if chunk is not None else np.zeros((CHUNK_SIZE,) * 3, dtype=BLOCK_DTYPE)
+                changed.reshape(-1)[indices] = blocks
+                self.chunks.set_chunk(key, changed)
+                local = np.unravel_index(indices, changed.shape)
+                self.mark_changed(key, tuple(int(c.min()) for c in local), tuple(int(c.max()) for c in local))
+
+    def mark_changed(self, key, low, high):
+        """
+        Remesh and save a chunk whose blocks changed, along with the neighbors the changes border.
+        @param key: (tuple) key of the chunk
+        @param low: (tuple) minimum local x, y, z of the changed blocks
+        @param high: (tuple) maximum local x, y, z of the changed blocks
+        """
+        self.dirty.add(key)
+        self.unsaved.add(key)
+        # changes on the border of the chunk can hide or show faces of its neighbors
+        for axis in range(3):
+            if low[axis] == 0:
+                self.dirty.add(tuple(c - (i == axis) for i, c in enumerate(key)))
+            if high[axis] == CHUNK_SIZE - 1:
+                self.dirty.add(tuple(c + (i == axis) for i, c in enumerate(key)))
+
+    def mark_written(self, key, index, mask=True):
+        """
+        Remember which blocks of a chunk that is not loaded yet were edited, see written.
+        @param key: (tuple) key of the chunk
+        @param index: local x, y, z of a block, or a tuple of slices of the chunk's blocks
+        @param mask: (ndarray) bool mask of the edited blocks within the slices, True for all of them
+        """
+        if key in self.loaded or self.source:
+            return # the server's copy of the chunk wins, see apply_streamed
+        written = self.written.get(key)
+        if written is None:
+            written = self.written[key] = np.zeros((CHUNK_SIZE,) * 3, dtype=bool)
+        written[index] |= mask
+
+    def take_edited(self):
+        """
+        @return: (set) keys of the chunks whose blocks were edited since the last call
+        """
+        edited, self.edited = self.edited, set()
+        return edited
+
+    def add_block(self, position, block):
+        """
+        Add a block to the world, replacing any block already there.
+        @param position: (tuple) x, y, z coordinates of the block
+        @param block: (int) ID of the block, see blocks.py
+        """
+        if self.source and chunk_key(position) not in self.loaded:
+            return # not sent by the server yet, see source
+        self.mark_written(chunk_key(position), chunk_local(position))
+        if self.chunks.set_block(position, block) != block:
+            self.dirty.update(self.touched_chunks(position))
+            self.unsaved.add(chunk_key(position))
+            self.edited.add(chunk_key(position))
+            if self.source:
+                self.source.send_edits([position], [block])
+
+    def get_block(self, position):
+        """
+        @param position: (tuple) x, y, z coordinates
+        @return: (int) ID of the block at position, BLOCK_AIR if there is none
+        """
+        return self.chunks.get_block(position)
+
+    def get_height(self, x, z):
+        """
+        @param x: (int) x coordinate of a column
+        @param z: (int) z coordinate of a column
+        @return: (int) y of the highest solid block of the column, NO_HEIGHT if it has none, see heightmap.py
+        """
+        return self.chunks.get_height(x, z)
+
+    def get_heights(self, x, z):
+        """
+        Find the highest solid block of many columns at once.
+        @param x: (ndarray) integer x coordinates of columns
+        @param z: (ndarray) integer z coordinates of columns
+        @return: (ndarray) heights of the columns, see get_height
+        """
+        return self.chunks.get_heights(x, z)
+
+    def fill(self, shape, block, replace=None):
+        """
+        Set every block of a region at once, see edits.py. Each chunk that changed is remeshed once, however many of
+        its blocks changed.
+        @param shape: (Shape) region to fill
+        @param block: (int) ID of the new blocks, BLOCK_AIR to clear the region
+        @param replace: (int) only change blocks with this ID, None to change every block
+        @return: (int) number of chunks that changed
+        """
+        if replace is None:
+            # what a replace does to a chunk that is not loaded depends on blocks that are not there yet, so only
+            # plain fills are remembered, non-air blocks a replace puts there are kept either way
+            for key, window, (x, y, z) in chunk_windows(shape):
+                if key not in self.loaded:
+                    self.mark_written(key, window, shape.mask(x, y, z))
+        changed = edit_region(self.chunks, shape, block, replace)
+        for key, (low, high) in changed.items():
+            self.mark_changed(key, low, high)
+            if self.source and key in self.loaded:
+                self.send_region(key, low, high) # the others are replaced once the server sends them
+        self.edited.update(changed)
+        return len(changed)
+
+    def send_region(self, key, low, high):
+        """
+        Send the blocks of part of a chunk to the server as edits.
+        @param key: (tuple) key of the chunk
+        @param low: (tuple) minimum local x, y, z of the part
+        @param high: (tuple) maximum local x, y, z of the part
+        """
+        shape = tuple(h - l + 1 for l, h in zip(low, high))
+        chunk = self.chunks.get_chunk(key)
+        if chunk is not None:
+            blocks = chunk.unpacked()[tuple(slice(l, h + 1) for l, h in zip(low, high))]
+        else:
+            blocks = np.zeros(shape, dtype=BLOCK_DTYPE)
+        positions = np.indices(shape).reshape(3, -1).T + np.add(low, chunk_origin(key))
+        self.source.send_edits(positions, blocks.ravel())
+
+    def replace(self, shape, old, new):
+        """
+        Swap one type of block for another within a region.
+        @param shape: (Shape) region to search
+        @param old: (int) ID of the blocks to replace
+        @param new: (int) ID of the blocks to put in their place
+        @return: (int) number of chunks that changed
+        """
+        return self.fill(shape, new, old)
+
+    def remove_block(self, position):
+        """
+        Remove a block from the world, if there is one.
+        @param position: (tuple) x, y, z coordinates of the block
+        """
+        if self.source and chunk_key(position) not in self.loaded:
+            return # not sent by the server yet, see source
+        self.mark_written(chunk_key(position), chunk_local(position))
+        if self.chunks.remove_block(position) != BLOCK_AIR:
+            self.dirty.update(self.touched_chunks(position))
+            self.unsaved.add(chunk_key(position))
+            self.edited.add(chunk_key(position))
+            if self.source:
+                self.source.send_edits([position], [BLOCK_AIR])
+
+    def raycast(self, origin, direction, max_distance=PICK_DISTANCE):
+        """
+        Find the first block along a ray, see raycast.py.
+        @return: (tuple) (position, block, face, distance) of the hit, None if nothing was hit
+        """
+        return raycast(self.chunks, origin, direction, max_distance)
+
+    def raycast_many(self, origins, directions, max_distance=PICK_DISTANCE):
+        """
+        Find the first block along many rays at once, see raycast.py.
+        @return: (tuple) arrays (positions, blocks, faces, distances) of the hits
+        """
+        return raycast_many(self.chunks, origins, directions, max_distance)
+
+    def touched_chunks(self, position):
+        """
+        Find the chunks whose meshes can change when the block at a position changes.
+        @param position: (tuple) x, y, z coordinates of a block
+        @return: (list) keys of the chunk containing position and of the neighbor chunks it borders
+        """
+        key = chunk_key(position)
+        keys = [key]
+        for axis, local in enumerate(chunk_local(position)):
+            if local == 0 or local == CHUNK_SIZE - 1:
+                neighbor = list(key)
+                neighbor[axis] += -1 if local == 0 else 1
+                keys.append(tuple(neighbor))
+        return keys
+
+    def update_lods(self):
+        """
+        Mark chunks dirty whose level of detail changed since they were meshed.
+        """
+        for key, level in self.lods.items():
+            if lod_level(chunk_distance(key, self.focus), level) != level:
+                self.dirty.add(key)
+
+    def remesh_dirty(self):
+        """
+        Start mesh jobs for all dirty chunks.
+        Edits only mark chunks dirty, so a chunk edited many times in one frame is still only meshed once.
+        """
+        dirty, self.dirty = self.dirty, set()
+        if not self.renderer:
+            return
+        for key in dirty:
+            if self.streaming and key not in self.loaded:
+                continue
+            version = self.mesh_versions.get(key, 0) + 1
+            self.mesh_versions[key] = version
+            level = lod_level(chunk_distance(key, self.focus), self.lods.get(key))
+            self.lods[key] = level
+            self.workers.submit(("mesh", key, version), build_chunk, padded_blocks(self.chunks, key), chunk_origin(key),
+                                self.mesher, self.renderer.vertex_format, LOD_FACTORS[level], phase="mesh")
+
+    def set_mesher(self, mesher):
+        """
+        Switch to another mesher and rebuild every chunk with it.
+        @param mesher: (str) name of the mesher, see mesher.py
+        """
+        get_mesher(mesher) # fail before touching any chunk if the name is wrong
+        self.mesher = mesher
+        self.dirty.update(self.chunks.chunks)
+
+    def draw(self, planes=None, position=None):
+        """
+        Draw the chunks inside the view frustum that are not hidden behind solid chunks.
+        @param planes: (ndarray) view frustum planes, see culling.py, None to draw every chunk
+        @param position: (tuple) x, y, z of the camera, None to skip occlusion culling
+        """
+        reachable = None
+        if self.occlusion and planes is not None and position is not None and self.connectivity:
+            start = chunk_key(tuple(int(math.floor(c + 0.5)) for c in position))
+            keys = np.array(list(self.connectivity) + [start])
+            # no chunk outside the meshed ones has anything to draw, and the walk never turns back to come into them
+            reachable = reachable_chunks(self.connectivity, start, planes, keys.min(axis=0), keys.max(axis=0))
+        self.renderer.draw(planes, reachable)
+
+    def close(self):
+        """
+        Save the world and stop the background workers.
+        """
+        self.workers.shutdown()
+        if self.source:
+            self.source.close()
+        if self.save:
+            self.save_world()
+            self.save.close()
 
 
 class Player:
-    def __init__(self):
+    def __init__(self, store=None):
+        """
+        @param store: (ChunkStore) blocks the player collides with, None to fly through everything
+        """
+        self.store = store
+        """
+        Blocks the player collides with, see collision.py, None if collision is off.
+        """
         self.posn = (0, 0, 0)
         """
         Player position as x, y, z
@@ -177,9 +903,23 @@ class Player:
         """
         self.mutex = Lock()
         """
-        Hold this mutex before modifying or using any fields of this class.
+        Hold this mutex before modifying or using rotn_buf or strafe, which input handlers write.
+        Every other field is only used by update, other threads read the published states instead.
+        """
+        state = PlayerState(self.posn, self.rotn, self.get_sight_vec(), (0, 0, 0))
+        self.states = (state, state)
+        """
+        The two most recently published states as (previous, current), replaced as a whole after every update so
+        readers always get a matching pair without locking.
         """
 
+    @property
+    def state(self):
+        """
+        @return: (PlayerState) the most recently published state
+        """
+        return self.states[1]
+
     def get_vel(self):
         """
         Get the current player velocity.
@@ -188,11 +928,10 @@ class Player:
         with self.mutex:
             strafe_fwd, strafe_side, strafe_up = self.strafe
 
-        sight_vec = self.get_sight_vec()
-        fwd_vel = vec_mul(sight_vec, strafe_fwd)
-        fwd_vel = (fwd_vel[0], 0, fwd_vel[2]) # make vertical velocity 0 so we dont float up when looking upward
+        heading = sight_vector((self.rotn[0], 0)) # level, so we dont float up or slow down when looking upward
+        fwd_vel = vec_mul(heading, strafe_fwd)
 
-        right_vec = vec_ortho(sight_vec) # points to the right of sight vector on the horizontal plane
+        right_vec = vec_ortho(heading) # points to the right of sight vector on the horizontal plane
         side_vel = vec_mul(right_vec, strafe_side)
 
         up_vec = (0, 1, 0) # points straight up
@@ -207,14 +946,7 @@ class Player:
         Return a 3d unit vector that points where the player is looking.
         @return: (tuple) of x, y, z of player sight vector.
         """
-        with self.mutex:
-            horiz_rotn, vert_rotn = self.rotn
-        x = math.sin(math.radians(horiz_rotn))
-        y = math.sin(math.radians(vert_rotn))
-        z = math.cos(math.radians(horiz_rotn))
-        z *= -1 # since negative z points outward from the camera
-        sight_vec = vec_normalize((x, y, z))
-        return sight_vec
+        return sight_vector(self.rotn)
 
     def add_rotn(self, horiz, vert):
         """
@@ -237,6 +969,17 @@ class Player:
         """
         self.update_posn(dt)
         self.update_rotn()
+        state = PlayerState(self.posn, self.rotn, self.get_sight_vec(), self.get_vel())
+        self.states = (self.states[1], state) # publish
+
+    def teleport(self, posn):
+        """
+        Move the player without interpolating from where it was.
+        @param posn: (tuple) x, y, z of the new position
+        """
+        self.posn = posn
+        state = self.states[1]._replace(posn=posn)
+        self.states = (state, state)
 
     def update_posn(self, dt):
         """
@@ -245,8 +988,10 @@ class Player:
         """
         d = dt * FLYING_SPEED # distance covered since the last update
         vel = vec_mul(self.get_vel(), d) # scale velocity for distance
-        with self.mutex:
-            self.posn = vec_add(self.posn, vel) # adjust position with velocity
+        if self.store is not None:
+            with PROFILER.timer("collision"):
+                vel, _ = sweep_box(self.store, *player_box(self.posn), vel) # stop at and slide along blocks
+        self.posn = vec_add(self.posn, vel) # adjust position with velocity
 
 
     def update_rotn(self):
@@ -254,26 +999,26 @@ class Player:
         Add buffered rotation changes into the player rotation.
         """
         with self.mutex:
-            old_horiz, old_vert = self.rotn
             horiz_add, vert_add = self.rotn_buf
             self.rotn_buf = (0, 0)
-            new_horiz = old_horiz + horiz_add
-            new_vert = old_vert + vert_add
-
-            # clamp vertical rotn
-            if new_vert > 90:
-                new_vert = 90
-            elif new_vert < -90:
-                new_vert = -90
-            # wrap horiz rotn around
-            if new_horiz >= 180:
-                extra_rotn = new_horiz - 180
-                new_horiz = -180 + extra_rotn
-            elif new_horiz < -180:
-                extra_rotn = -180 - new_horiz 
-                new_horiz = 180 - extra_rotn
-
-            self.rotn = (new_horiz, new_vert)
+        old_horiz, old_vert = self.rotn
+        new_horiz = old_horiz + horiz_add
+        new_vert = old_vert + vert_add
+
+        # clamp vertical rotn
+        if new_vert > 90:
+            new_vert = 90
+        elif new_vert < -90:
+            new_vert = -90
+        # wrap horiz rotn around
+        if new_horiz >= 180:
+            extra_rotn = new_horiz - 180
+            new_horiz = -180 + extra_rotn
+        elif new_horiz < -180:
+            extra_rotn = -180 - new_horiz 
+            new_horiz = 180 - extra_rotn
+
+        self.rotn = (new_horiz, new_vert)
 
     def add_forward_strafe(self):
         with self.mutex:
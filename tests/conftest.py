@@ -0,0 +1,9 @@
+"""
+Shared setup of the tests, run them from the repository root with `python -m pytest`.
+"""
+
+import os
+import sys
+
+# the modules in src import each other by their bare names, like they do when the game runs
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
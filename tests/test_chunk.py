@@ -0,0 +1,66 @@
+"""
+Tests of the block storage in chunk.py.
+"""
+
+from config import *
+from blocks import BLOCK_AIR
+from chunk import BLOCK_DTYPE, Chunk, ChunkStore, chunk_key, chunk_local, packed_bits
+
+import numpy as np
+import pytest
+
+
+def random_blocks(palette_size, seed=0):
+    """
+    @return: (ndarray) blocks of a chunk holding exactly palette_size block types, scattered at random
+    """
+    rng = np.random.default_rng(seed)
+    blocks = rng.integers(0, palette_size, (CHUNK_SIZE,) * 3).astype(BLOCK_DTYPE)
+    blocks.ravel()[:palette_size] = np.arange(palette_size) # every type at least once
+    return (blocks * 3 + 1).astype(BLOCK_DTYPE) # IDs that are not their palette indices
+
+
+@pytest.mark.parametrize("palette_size", range(1, 18))
+def test_pack_round_trip(palette_size):
+    blocks = random_blocks(palette_size)
+    chunk = Chunk((0, 0, 0), blocks.copy())
+    packed = chunk.pack()
+    assert packed == (packed_bits(palette_size) is not None)
+    assert packed == (palette_size <= 16)
+    assert np.array_equal(chunk.unpacked(), blocks)
+    lx, ly, lz = np.indices((CHUNK_SIZE,) * 3).reshape(3, -1)
+    assert np.array_equal(chunk.get_many(lx, ly, lz), blocks.ravel())
+    assert [chunk.get(local) for local in [(0, 0, 0), (1, 2, 3), (CHUNK_SIZE - 1,) * 3]] == \
+           [blocks[local] for local in [(0, 0, 0), (1, 2, 3), (CHUNK_SIZE - 1,) * 3]]
+    assert np.array_equal(chunk.blocks, blocks) # unpacks it
+    assert not chunk.is_packed()
+
+def test_pack_idle_limits_visits_not_packs():
+    store = ChunkStore()
+    for x in range(10):
+        store.add_chunk(Chunk((x, 0, 0), random_blocks(2)))
+    store.start_sweep()
+    # a fresh chunk counts as used, so the first sweep packs nothing but must still stop at the limit
+    assert store.pack_idle(4) == 0
+    assert len(store.sweep) == 6
+    assert store.pack_idle() == 0
+    store.start_sweep()
+    assert store.pack_idle(4) == 4
+    assert len(store.sweep) == 6
+
+def test_store_get_and_set_across_negative_coordinates():
+    store = ChunkStore()
+    positions = [(-1, -1, -1), (-CHUNK_SIZE, 0, -1), (-CHUNK_SIZE - 1, 5, CHUNK_SIZE), (0, -1, 0), (-1, 0, 0),
+                 (-3 * CHUNK_SIZE + 7, -2 * CHUNK_SIZE, 15)]
+    for i, position in enumerate(positions):
+        assert store.set_block(position, i + 1) == BLOCK_AIR
+    assert [store.get_block(position) for position in positions] == list(range(1, len(positions) + 1))
+    assert store.get_blocks(positions).tolist() == list(range(1, len(positions) + 1))
+    assert chunk_key((-1, -1, -1)) == (-1, -1, -1) and chunk_local((-1, -1, -1)) == (CHUNK_SIZE - 1,) * 3
+    assert chunk_key((-CHUNK_SIZE, 0, 0)) == (-1, 0, 0) and chunk_local((-CHUNK_SIZE, 0, 0)) == (0, 0, 0)
+    assert store.get_chunk((-1, -1, -1)).get((CHUNK_SIZE - 1,) * 3) == 1
+    # the neighbors on the positive side of each block were not touched
+    assert all(store.get_block((x + 1, y, z)) == BLOCK_AIR for x, y, z in positions if (x + 1, y, z) not in positions)
+    assert store.remove_block((-1, -1, -1)) == 1
+    assert store.get_chunk((-1, -1, -1)) is None # emptied chunks are dropped
+    assert store.get_block((-1, -1, -1)) == BLOCK_AIR
@@ -0,0 +1,24 @@
+"""
+Tests of the chunk server connection in client.py.
+"""
+
+from config import *
+from client import parse_address
+
+import pytest
+
+
+@pytest.mark.parametrize("address, expected", [
+    ("example.com:1234", ("example.com", 1234)),
+    ("localhost", ("localhost", SERVER_PORT)),
+    ("localhost:", ("localhost", SERVER_PORT)),
+    (":1234", (SERVER_HOST, 1234)),
+    ("", (SERVER_HOST, SERVER_PORT)),
+])
+def test_parse_address(address, expected):
+    assert parse_address(address) == expected
+
+@pytest.mark.parametrize("address", ["localhost:abc", "localhost:-1", "localhost:0", "localhost:65536", "a:1.5"])
+def test_parse_address_rejects_bad_ports(address):
+    with pytest.raises(ValueError):
+        parse_address(address)
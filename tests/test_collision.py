@@ -0,0 +1,54 @@
+"""
+Tests of the swept box collision in collision.py.
+"""
+
+from blocks import BLOCK_STONE
+from chunk import ChunkStore
+from collision import player_box, sweep_box
+
+import pytest
+
+
+BOX = ((-0.3, 0.0, -0.3), (0.3, 1.8, 0.3)) # a player sized box standing at the origin
+
+
+@pytest.fixture
+def wall():
+    """
+    @return: (ChunkStore) a wall one block thick at x = 10, across chunk borders
+    """
+    store = ChunkStore()
+    for y in range(-20, 20):
+        for z in range(-20, 20):
+            store.set_block((10, y, z), BLOCK_STONE)
+    return store
+
+
+@pytest.mark.parametrize("speed", [1, 9.7, 50, 1e4])
+def test_fast_box_stops_flush_against_a_thin_wall(wall, speed):
+    motion, blocked = sweep_box(wall, *BOX, (speed, 0, 0))
+    assert blocked == (speed > 9.2, False, False)
+    assert motion[0] == pytest.approx(min(speed, 9.5 - 0.3)) # the wall's face is at x = 9.5
+
+def test_fast_fall_lands_on_a_thin_floor():
+    store = ChunkStore()
+    for x in range(-3, 4):
+        for z in range(-3, 4):
+            store.set_block((x, -40, z), BLOCK_STONE)
+    mins, maxs = player_box((0.2, 10, -0.4))
+    motion, blocked = sweep_box(store, mins, maxs, (0, -500, 0))
+    assert blocked[1]
+    assert mins[1] + motion[1] == pytest.approx(-39.5) # standing on top of the floor
+
+def test_fast_diagonal_slides_along_the_wall(wall):
+    motion, blocked = sweep_box(wall, *BOX, (100, 0, 30))
+    assert blocked == (True, False, False)
+    assert motion[0] == pytest.approx(9.2)
+    assert motion[2] == pytest.approx(30) # the wall only stops x
+
+def test_box_moving_away_from_a_wall_is_free(wall):
+    mins, maxs = (10.5, 0, 0), (11.1, 1.8, 0.6) # touching the +x face of the wall
+    motion, blocked = sweep_box(wall, mins, maxs, (100, 0, 0))
+    assert motion == pytest.approx((100, 0, 0)) and not any(blocked)
+    motion, blocked = sweep_box(wall, mins, maxs, (-100, 0, 0))
+    assert motion[0] == pytest.approx(0) and blocked[0]
@@ -0,0 +1,40 @@
+"""
+Tests of the frustum culling in culling.py.
+"""
+
+from config import *
+from culling import camera_matrix, frustum_planes, boxes_in_frustum, chunk_boxes
+
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def planes():
+    """
+    @return: (ndarray) frustum of a camera at the origin looking down -z, its sides are the planes x = +-z and y = +-z
+    """
+    return frustum_planes(camera_matrix((0, 0), (0, 0, 0), (0, 0, -1), aspect=1.0, fovy=90.0))
+
+def visible(planes, center, size=1.0):
+    return bool(boxes_in_frustum(planes, np.subtract(center, size / 2), np.add(center, size / 2))[0])
+
+
+def test_box_in_front_is_visible(planes):
+    assert visible(planes, (0, 0, -10))
+
+def test_box_behind_is_culled(planes):
+    assert not visible(planes, (0, 0, 10))
+
+def test_box_beyond_far_plane_is_culled(planes):
+    assert visible(planes, (0, 0, -(FAR_PLANE - 1)))
+    assert not visible(planes, (0, 0, -(FAR_PLANE + 1)))
+
+def test_box_straddling_a_plane_is_visible(planes):
+    assert visible(planes, (-10, 0, -10), 2.0)
+    assert visible(planes, (0, 0, -FAR_PLANE), 2.0)
+    assert not visible(planes, (-13, 0, -10), 2.0)
+
+def test_chunk_boxes_are_tested_at_once(planes):
+    keys = np.array([(0, 0, -2), (0, 0, 1), (0, 0, -(int(FAR_PLANE) // CHUNK_SIZE + 2))])
+    assert boxes_in_frustum(planes, *chunk_boxes(keys)).tolist() == [True, False, False]
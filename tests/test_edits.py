@@ -0,0 +1,62 @@
+"""
+Tests of the bulk edits in edits.py and of edits made to a Map.
+"""
+
+from blocks import BLOCK_AIR, BLOCK_BRICK, BLOCK_STONE
+from chunk import ChunkStore
+from edits import Box, Sphere, Cylinder, edit_region
+from world import Map
+
+from collections import Counter
+import pytest
+
+
+def new_map():
+    return Map(None, workers=0, streaming=False, seed=7, world_size=16)
+
+def finish(world_map):
+    while not world_map.is_complete():
+        world_map.update(0)
+    return world_map
+
+
+@pytest.mark.parametrize("shape", [
+    Box((-20, -20, -20), (20, 20, 20)),
+    Sphere((0.5, -3, 7), 19),
+    Cylinder((-1, -17, 2), 12, 35),
+])
+def test_fill_writes_each_chunk_once(shape):
+    store = ChunkStore()
+    writes = Counter()
+    set_chunk = store.set_chunk
+    store.set_chunk = lambda key, blocks: (writes.update([key]), set_chunk(key, blocks))
+    changed = edit_region(store, shape, BLOCK_STONE)
+    assert len(changed) > 8 # spans chunks on both sides of 0 along every axis
+    assert set(writes) == set(changed)
+    assert max(writes.values()) == 1
+
+def test_fill_remeshes_each_chunk_once(monkeypatch):
+    world_map = finish(new_map())
+    marked = Counter()
+    monkeypatch.setattr(world_map, "mark_changed", lambda key, low, high: marked.update([key]))
+    count = world_map.fill(Box((-20, -5, -20), (20, 5, 20)), BLOCK_BRICK)
+    assert count == len(marked) > 8
+    assert max(marked.values()) == 1
+    world_map.close()
+
+def test_edits_before_generation_are_kept():
+    surface = (0, finish(new_map()).get_height(0, 0), 0)
+    hole = Box((3, surface[1] - 2, 3), (5, surface[1], 5))
+    tower = (-3, surface[1] + 5, -3)
+    world_map = new_map() # nothing generated yet
+    world_map.remove_block(surface)
+    world_map.fill(hole, BLOCK_AIR)
+    world_map.add_block(tower, BLOCK_BRICK)
+    finish(world_map)
+    assert world_map.get_block(surface) == BLOCK_AIR
+    assert all(world_map.get_block((x, y, z)) == BLOCK_AIR
+               for x in range(3, 6) for y in range(surface[1] - 2, surface[1] + 1) for z in range(3, 6))
+    assert world_map.get_block(tower) == BLOCK_BRICK
+    assert world_map.get_block((surface[0], surface[1] - 1, surface[2])) != BLOCK_AIR # generated around the edits
+    assert not world_map.written
+    world_map.close()
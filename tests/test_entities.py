@@ -0,0 +1,33 @@
+"""
+Tests of the entity arrays in entities.py.
+"""
+
+from entities import Entities
+
+import numpy as np
+
+
+def test_ids_survive_despawns_and_growth():
+    entities = Entities(capacity=2) # grows several times
+    ids = [entities.spawn((i, 0, 0), gravity=0) for i in range(10)]
+    assert ids == list(range(10))
+    for entity in (0, 4, 9, 4): # first, middle, last and one already gone
+        entities.despawn(entity)
+    assert len(entities) == 7
+    for entity in ids:
+        state = entities.get(entity)
+        if entity in (0, 4, 9):
+            assert state is None
+        else:
+            assert state[0] == (entity, 0, 0) # each ID still points at its own entity after the rows moved
+    assert sorted(entities.ids[:len(entities)].tolist()) == [1, 2, 3, 5, 6, 7, 8]
+    assert all(entities.ids[row] == entity for entity, row in entities.rows.items())
+    assert entities.spawn((42, 0, 0)) == 10 # IDs are never reused
+    assert entities.get(10)[0] == (42, 0, 0)
+
+def test_expired_entities_are_despawned_in_one_tick():
+    entities = Entities()
+    ids = [entities.spawn((i, 0, 0), gravity=0, lifetime=1.0 if i % 2 else np.inf) for i in range(8)]
+    entities.tick(1.5)
+    assert [entity for entity in ids if entities.get(entity) is not None] == [0, 2, 4, 6]
+    assert [entities.get(entity)[0][0] for entity in (0, 2, 4, 6)] == [0, 2, 4, 6]
@@ -0,0 +1,45 @@
+"""
+Tests of the column heights kept by heightmap.py.
+"""
+
+from config import *
+from blocks import BLOCK_AIR, BLOCK_STONE
+from chunk import ChunkStore
+from heightmap import NO_HEIGHT
+
+import numpy as np
+
+
+def test_removing_the_top_block_finds_the_next_one_down():
+    store = ChunkStore()
+    x, z = -3, 17
+    for y in (-20, 2, 5, CHUNK_SIZE + 4): # the top block alone in the chunk above the others
+        store.set_block((x, y, z), BLOCK_STONE)
+    assert store.get_height(x, z) == CHUNK_SIZE + 4
+    store.remove_block((x, CHUNK_SIZE + 4, z))
+    assert store.get_height(x, z) == 5
+    store.remove_block((x, 2, z)) # not the top, nothing changes
+    assert store.get_height(x, z) == 5
+    store.remove_block((x, 5, z))
+    assert store.get_height(x, z) == -20 # two chunks further down
+    store.remove_block((x, -20, z))
+    assert store.get_height(x, z) == NO_HEIGHT
+
+def test_neighbor_columns_keep_their_heights():
+    store = ChunkStore()
+    for x in range(-1, 2):
+        for y in range(4):
+            store.set_block((x, y, 0), BLOCK_STONE)
+    store.remove_block((0, 3, 0))
+    assert store.get_heights(np.array([-1, 0, 1]), np.array([0, 0, 0])).tolist() == [3, 2, 3]
+
+def test_replacing_a_chunk_updates_its_columns():
+    store = ChunkStore()
+    store.set_block((1, 3, 1), BLOCK_STONE)
+    store.set_block((1, -CHUNK_SIZE, 1), BLOCK_STONE)
+    blocks = store.get_chunk((0, 0, 0)).blocks.copy()
+    blocks[1, 3, 1] = BLOCK_AIR
+    blocks[2, 9, 2] = BLOCK_STONE
+    store.set_chunk((0, 0, 0), blocks)
+    assert store.get_height(1, 1) == -CHUNK_SIZE
+    assert store.get_height(2, 2) == 9
@@ -0,0 +1,79 @@
+"""
+Tests of the chunk meshers in mesher.py.
+"""
+
+from config import *
+from blocks import BLOCK_AIR, BLOCK_STONE, BLOCK_SAND
+from chunk import ChunkStore
+from mesher import mesh_chunk, face_count, padded_blocks, culled_quads, greedy_quads
+
+import numpy as np
+import pytest
+
+
+def faces(store, mesher, key=(0, 0, 0)):
+    """
+    @return: (int) number of quads in the mesh of a chunk
+    """
+    return face_count(mesh_chunk(store, key, mesher)[0])
+
+
+@pytest.mark.parametrize("mesher", ["culled", "greedy"])
+def test_single_block_has_six_faces(mesher):
+    store = ChunkStore()
+    store.set_block((3, 4, 5), BLOCK_STONE)
+    assert faces(store, mesher) == 6
+
+def test_adjacent_blocks_hide_the_faces_between_them():
+    store = ChunkStore()
+    store.set_block((3, 4, 5), BLOCK_STONE)
+    store.set_block((4, 4, 5), BLOCK_STONE)
+    assert faces(store, "culled") == 10
+
+def test_blocks_in_neighbor_chunks_hide_faces():
+    store = ChunkStore()
+    store.set_block((CHUNK_SIZE - 1, 0, 0), BLOCK_STONE)
+    store.set_block((CHUNK_SIZE, 0, 0), BLOCK_STONE) # local (0, 0, 0) of the chunk to the right
+    assert faces(store, "culled") == 5
+
+def test_greedy_merges_a_slab_into_six_quads():
+    store = ChunkStore()
+    for x in range(CHUNK_SIZE):
+        for z in range(CHUNK_SIZE):
+            store.set_block((x, 0, z), BLOCK_STONE)
+    assert faces(store, "culled") == 2 * CHUNK_SIZE ** 2 + 4 * CHUNK_SIZE
+    assert faces(store, "greedy") == 6
+
+def test_greedy_keeps_block_types_apart():
+    store = ChunkStore()
+    for x in range(CHUNK_SIZE):
+        store.set_block((x, 0, 0), BLOCK_STONE if x < CHUNK_SIZE // 2 else BLOCK_SAND)
+    assert faces(store, "greedy") == 10 # two boxes of 6 faces less the two faces where they touch
+
+def unit_faces(quads):
+    """
+    @param quads: (tuple) (positions, blocks, faces, extents) returned by a mesher
+    @return: (set) (x, y, z, face, block) of every block face the quads cover, merged quads split back into one per block
+    """
+    covered = set()
+    for position, block, face, extent in zip(*(array.tolist() for array in quads)):
+        for dx in range(extent[0]):
+            for dy in range(extent[1]):
+                for dz in range(extent[2]):
+                    covered.add((position[0] + dx, position[1] + dy, position[2] + dz, face, block))
+    return covered
+
+@pytest.mark.parametrize("seed", range(4))
+def test_greedy_covers_the_same_faces_as_culled(seed):
+    rng = np.random.default_rng(seed)
+    store = ChunkStore()
+    # sparse enough for holes, dense enough for runs to merge, with blocks in the neighbors hiding border faces
+    blocks = rng.choice([BLOCK_AIR, BLOCK_STONE, BLOCK_SAND], size=(CHUNK_SIZE + 2,) * 3, p=[0.5, 0.4, 0.1])
+    for x, y, z in np.argwhere(blocks != BLOCK_AIR).tolist():
+        store.set_block((x - 1, y - 1, z - 1), int(blocks[x, y, z]))
+    padded = padded_blocks(store, (0, 0, 0))
+    culled = unit_faces(culled_quads(padded))
+    greedy = greedy_quads(padded)
+    assert unit_faces(greedy) == culled
+    assert sum(int(np.prod(extent)) for extent in greedy[3].tolist()) == len(culled) # no face covered twice
+    assert len(greedy[0]) < len(culled)
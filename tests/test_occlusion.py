@@ -0,0 +1,34 @@
+"""
+Tests of the cave culling in occlusion.py.
+"""
+
+from config import *
+from blocks import BLOCK_STONE
+from occlusion import OPEN, CLOSED, face_connectivity, connects, reachable_chunks
+
+import numpy as np
+
+
+EVERYWHERE = np.tile([0.0, 0.0, 0.0, 1.0], (6, 1)) # frustum planes every box is inside of
+
+
+def test_solid_chunk_connects_nothing():
+    assert face_connectivity(np.full((CHUNK_SIZE,) * 3, BLOCK_STONE)) == CLOSED
+
+def test_empty_chunk_connects_every_face():
+    connectivity = face_connectivity(np.zeros((CHUNK_SIZE,) * 3, dtype=np.uint8))
+    assert connectivity == OPEN
+    assert all(connects(connectivity, a, b) for a in range(6) for b in range(6))
+
+def test_tunnel_connects_only_its_ends():
+    blocks = np.full((CHUNK_SIZE,) * 3, BLOCK_STONE)
+    blocks[:, 8, 8] = 0 # a tunnel along x, from the left face to the right face
+    connectivity = face_connectivity(blocks)
+    assert connects(connectivity, 2, 3) and connects(connectivity, 3, 2)
+    assert not any(connects(connectivity, a, b) for a in (0, 1, 4, 5) for b in range(6))
+
+def test_solid_chunk_hides_the_chunks_behind_it():
+    start, high = (0, 0, 0), (3, 0, 0)
+    assert reachable_chunks({}, start, EVERYWHERE, start, high) == {(x, 0, 0) for x in range(4)}
+    # the solid chunk itself can be seen, nothing behind it
+    assert reachable_chunks({(1, 0, 0): CLOSED}, start, EVERYWHERE, start, high) == {(0, 0, 0), (1, 0, 0)}
@@ -0,0 +1,39 @@
+"""
+Tests of the timers in profiler.py.
+"""
+
+from profiler import Profiler, StartupTimer
+
+import time
+import pytest
+
+
+def test_startup_report_flags_milestones_over_budget():
+    timer = StartupTimer(0.0, {"first frame": 1.0, "spawn area": 5.0})
+    timer.marks = {"first frame": 1.5, "spawn area": 2.0, "world complete": 9.0}
+    assert timer.over_budget() == ["first frame"]
+    assert timer.report() == \
+           "startup: first frame 1.50s (over budget of 1.00s), spawn area 2.00s, world complete 9.00s"
+
+def test_startup_report_within_budget():
+    timer = StartupTimer(budgets={"first frame": 60.0})
+    timer.mark("first frame")
+    assert timer.over_budget() == []
+    assert "over budget" not in timer.report()
+
+def test_nested_phases_are_not_counted_twice():
+    profiler = Profiler(enabled=True, events=16, frames=4)
+    with profiler.timer("update"):
+        time.sleep(0.02)
+        with profiler.timer("upload"):
+            time.sleep(0.03)
+        start = time.perf_counter()
+        time.sleep(0.01)
+        profiler.record("generate", start, time.perf_counter() - start) # a job run on this thread
+    profiler.end_frame()
+    update, upload, generate = (profiler.percentiles((50,))[phase][0] for phase in ("update", "upload", "generate"))
+    trace = {phase: duration for phase, _, duration, _ in profiler.events()}
+    assert trace["update"] >= 0.06 # the trace keeps the whole span
+    assert upload >= 0.03 and generate >= 0.01
+    assert update + upload + generate == pytest.approx(trace["update"])
+    assert 0.02 <= update < trace["update"] - 0.04
@@ -0,0 +1,37 @@
+"""
+Tests of the messages in protocol.py.
+"""
+
+from config import *
+from chunk import BLOCK_DTYPE
+from protocol import ProtocolError, encode_keys, decode_keys, encode_edits, decode_edits, compress_blocks, \
+    encode_chunk, decode_chunk, encode_delta, decode_delta
+
+import numpy as np
+import pytest
+
+
+def test_messages_round_trip():
+    keys = [(0, -1, 2), (-5, 3, 7)]
+    assert decode_keys(encode_keys(keys)) == keys
+    positions, blocks = decode_edits(encode_edits([(1, -2, 3), (-40, 5, 6)], [0, 7]))
+    assert positions.tolist() == [[1, -2, 3], [-40, 5, 6]] and blocks.tolist() == [0, 7]
+    chunk = np.arange(CHUNK_SIZE ** 3, dtype=BLOCK_DTYPE).reshape((CHUNK_SIZE,) * 3) % 9
+    key, version, decoded = decode_chunk(encode_chunk((1, 2, -3), 4, compress_blocks(chunk)))
+    assert (key, version) == ((1, 2, -3), 4) and np.array_equal(decoded, chunk)
+    assert decode_chunk(encode_chunk((0, 0, 0), 0, compress_blocks(None)))[2] is None
+    key, version, indices, blocks = decode_delta(encode_delta((1, 2, 3), 5, np.array([0, 4095]), np.array([3, 0])))
+    assert (key, version, indices.tolist(), blocks.tolist()) == ((1, 2, 3), 5, [0, 4095], [3, 0])
+
+@pytest.mark.parametrize("decode, payload", [
+    (decode_keys, b"\0" * 13),
+    (decode_edits, b"\0" * 14),
+    (decode_chunk, b"\0" * 5),
+    (decode_chunk, encode_chunk((0, 0, 0), 0, b"not zlib")),
+    (decode_chunk, encode_chunk((0, 0, 0), 0, compress_blocks(np.ones(10, dtype=BLOCK_DTYPE)))),
+    (decode_delta, encode_delta((0, 0, 0), 1, np.array([1]), np.array([1]))[:-1]),
+    (decode_delta, encode_delta((0, 0, 0), 1, np.array([CHUNK_SIZE ** 3]), np.array([1]))),
+])
+def test_bad_payloads_raise_protocol_error(decode, payload):
+    with pytest.raises(ProtocolError):
+        decode(payload)
@@ -0,0 +1,52 @@
+"""
+Tests of the voxel traversal in raycast.py.
+"""
+
+from blocks import BLOCK_AIR, BLOCK_STONE, BLOCK_SAND
+from chunk import ChunkStore
+from raycast import raycast, raycast_many
+
+import numpy as np
+import pytest
+
+
+def scattered_store(rng, count=400, size=24):
+    """
+    @return: (ChunkStore) blocks scattered around the origin, across chunk borders and negative coordinates
+    """
+    store = ChunkStore()
+    for position in rng.integers(-size, size, (count, 3)).tolist():
+        store.set_block(tuple(position), int(rng.choice([BLOCK_STONE, BLOCK_SAND])))
+    return store
+
+
+def test_ray_hits_the_face_it_enters():
+    store = ChunkStore()
+    store.set_block((5, 0, 0), BLOCK_STONE)
+    position, block, face, distance = raycast(store, (0, 0, 0), (1, 0, 0), 10)
+    assert (tuple(position), block, face) == ((5, 0, 0), BLOCK_STONE, 2) # the -x face
+    assert distance == pytest.approx(4.5)
+    assert raycast(store, (0, 0, 0), (-1, 0, 0), 10) is None
+    assert raycast(store, (0, 0, 0), (1, 0, 0), 4) is None # out of reach
+
+@pytest.mark.parametrize("seed", range(3))
+def test_batched_rays_match_single_rays(seed):
+    rng = np.random.default_rng(seed)
+    store = scattered_store(rng)
+    origins = rng.uniform(-20, 20, (300, 3))
+    directions = rng.normal(size=(300, 3))
+    directions[:20] = np.eye(3)[rng.integers(0, 3, 20)] * rng.choice([-1, 1], (20, 1)) # along the axes
+    positions, blocks, faces, distances = raycast_many(store, origins, directions, 30)
+    hits = 0
+    for i in range(len(origins)):
+        hit = raycast(store, tuple(origins[i]), tuple(directions[i]), 30)
+        if hit is None:
+            assert blocks[i] == BLOCK_AIR and faces[i] == -1 and distances[i] == np.inf
+            continue
+        hits += 1
+        position, block, face, distance = hit
+        assert tuple(positions[i].tolist()) == tuple(position)
+        assert blocks[i] == block
+        assert faces[i] == (-1 if face is None else face)
+        assert distances[i] == pytest.approx(distance)
+    assert 0 < hits < len(origins)
@@ -0,0 +1,57 @@
+"""
+Tests of saving chunks in region.py, and of what a Map saves.
+"""
+
+from config import *
+from blocks import BLOCK_AIR
+from chunk import BLOCK_DTYPE, chunk_key
+from region import WorldSave
+from world import Map
+
+import numpy as np
+
+
+def test_chunks_round_trip(tmp_path):
+    rng = np.random.default_rng(0)
+    chunks = {
+        (0, 0, 0): rng.integers(0, 8, (CHUNK_SIZE,) * 3).astype(BLOCK_DTYPE),
+        (-1, -2, -3): rng.integers(0, 8, (CHUNK_SIZE,) * 3).astype(BLOCK_DTYPE), # another region
+        (REGION_CHUNKS - 1, 0, 1): None, # saved as all air
+    }
+    save = WorldSave(str(tmp_path))
+    save.save_chunks(chunks)
+    save.save_chunks({(0, 0, 0): chunks[(0, 0, 0)][::-1].copy()}) # overwritten, the first copy is garbage now
+    save.close()
+
+    save = WorldSave(str(tmp_path))
+    assert sorted(save.saved_keys()) == sorted(chunks)
+    assert np.array_equal(save.load_chunk((0, 0, 0))[1], chunks[(0, 0, 0)][::-1])
+    assert np.array_equal(save.load_chunk((-1, -2, -3))[1], chunks[(-1, -2, -3)])
+    assert save.load_chunk((REGION_CHUNKS - 1, 0, 1)) == (True, None)
+    assert save.load_chunk((1, 0, 0)) == (False, None)
+    save.close()
+
+def test_map_saves_only_edited_chunks(tmp_path):
+    world_map = Map(None, workers=0, streaming=False, seed=7, world_size=16, save_dir=str(tmp_path))
+    while not world_map.is_complete():
+        world_map.update(0)
+    surface = (0, world_map.get_height(0, 0), 0)
+    world_map.remove_block(surface)
+    world_map.close()
+    assert WorldSave(str(tmp_path)).saved_keys() == [chunk_key(surface)]
+
+    world_map = Map(None, workers=0, streaming=False, seed=0, world_size=16, save_dir=str(tmp_path))
+    assert world_map.seed == 7 # kept by the save
+    while not world_map.is_complete():
+        world_map.update(0)
+    assert world_map.get_block(surface) == BLOCK_AIR
+    assert world_map.get_block((surface[0], surface[1] - 1, surface[2])) != BLOCK_AIR # generated, not saved
+    world_map.close()
+
+def test_map_does_not_save_by_default(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    world_map = Map(None, workers=0, streaming=False, world_size=16)
+    assert world_map.save is None
+    world_map.update(0)
+    world_map.close()
+    assert not list(tmp_path.iterdir())
@@ -0,0 +1,170 @@
+"""
+Tests of the chunk server in server.py, with clients connected over loopback.
+"""
+
+from config import *
+from blocks import BLOCKS, BLOCK_AIR, BLOCK_STONE
+from chunk import chunk_key, chunk_local
+from protocol import EDITS, CHUNK, DELTA, EDIT_DTYPE
+from server import ChunkServer
+from client import ChunkClient
+from world import Map
+
+import asyncio
+import threading
+import time
+import numpy as np
+import pytest
+
+
+TIMEOUT = 10 # seconds to wait for the server before failing
+
+
+def wait_for(condition):
+    """
+    Sleep until a condition holds, fails the test after TIMEOUT seconds.
+    @param condition: (function) returns true once the wait is over
+    """
+    deadline = time.perf_counter() + TIMEOUT
+    while not condition():
+        assert time.perf_counter() < deadline, "timed out waiting for the server"
+        time.sleep(0.005)
+
+class Receiver:
+    """
+    Collects everything a client receives.
+    """
+    def __init__(self, client):
+        self.client = client
+        self.messages = []
+
+    def poll(self):
+        self.messages.extend(self.client.take())
+        return self.messages
+
+    def chunks(self):
+        return {message[1] for message in self.poll() if message[0] == CHUNK}
+
+    def resent(self, key):
+        """
+        @return: (list) blocks of the CHUNK messages for a key after the first one
+        """
+        return [message[3] for message in self.poll() if message[0] == CHUNK and message[1] == key][1:]
+
+    def deltas(self):
+        return [message for message in self.poll() if message[0] == DELTA]
+
+
+@pytest.fixture
+def server():
+    world_map = Map(None, workers=0, streaming=False, seed=7, world_size=16)
+    while not world_map.is_complete():
+        world_map.update(0)
+    server = ChunkServer(world_map, port=0)
+    started = threading.Event()
+    thread = threading.Thread(target=asyncio.run, args=(server.run(started.set),), daemon=True)
+    thread.start()
+    started.wait()
+    yield server
+    server.stop()
+    thread.join()
+    world_map.close()
+
+@pytest.fixture
+def surface(server):
+    """
+    @return: (tuple) position of the highest block of the column at x = z = 0
+    """
+    return (0, server.map.get_height(0, 0), 0)
+
+def connect(server, keys):
+    """
+    @return: (Receiver) a new client of the server that was sent the given chunks
+    """
+    receiver = Receiver(ChunkClient(SERVER_HOST, server.port))
+    receiver.client.subscribe(keys)
+    wait_for(lambda: receiver.chunks() >= set(keys))
+    return receiver
+
+
+def test_edits_reach_other_clients(server, surface):
+    key = chunk_key(surface)
+    editor = connect(server, [key])
+    watcher = connect(server, [key])
+    editor.client.send_edits([surface], [BLOCK_AIR])
+    wait_for(watcher.deltas)
+    [(_, delta_key, _, indices, blocks)] = watcher.deltas()
+    assert delta_key == key
+    assert indices.tolist() == [np.ravel_multi_index(chunk_local(surface), (CHUNK_SIZE,) * 3)]
+    assert blocks.tolist() == [BLOCK_AIR]
+    assert server.map.get_block(surface) == BLOCK_AIR
+    editor.client.close()
+    watcher.client.close()
+
+@pytest.mark.parametrize("block", [len(BLOCKS), 255])
+def test_unknown_block_is_rejected(server, surface, block):
+    key = chunk_key(surface)
+    attacker = connect(server, [key])
+    watcher = connect(server, [key])
+    before = server.map.get_block(surface)
+    attacker.client.send_edits([surface], [block])
+    wait_for(lambda: attacker.resent(key)) # the chunk is sent again to undo the edit
+    assert attacker.resent(key)[0][chunk_local(surface)] == before
+    assert attacker.client.connected
+    # a valid edit after the bad one, once it arrives the bad one would have too
+    above = (surface[0], surface[1] + 1, surface[2])
+    if chunk_key(above) != key:
+        above = (surface[0] + 1, surface[1], surface[2])
+    watcher.client.send_edits([above], [BLOCK_STONE])
+    wait_for(watcher.deltas)
+    time.sleep(5.0 / TICKS_PER_SEC) # a few more ticks for anything else to arrive
+    changes = [(index, block) for _, _, _, indices, blocks in watcher.deltas()
+               for index, block in zip(indices.tolist(), blocks.tolist())]
+    assert changes == [(np.ravel_multi_index(chunk_local(above), (CHUNK_SIZE,) * 3), BLOCK_STONE)]
+    assert server.map.get_block(surface) == before
+    assert all(message[3] is None or message[3].max() < len(BLOCKS)
+               for message in watcher.messages if message[0] == CHUNK)
+    attacker.client.close()
+    watcher.client.close()
+
+def test_edit_outside_subscribed_chunks_is_rejected(server, surface):
+    key = chunk_key(surface)
+    attacker = connect(server, [key])
+    far = (surface[0] + 4 * CHUNK_SIZE, surface[1], surface[2])
+    before = server.map.get_block(far)
+    attacker.client.send_edits([surface, far], [BLOCK_AIR, BLOCK_STONE])
+    wait_for(lambda: attacker.resent(key))
+    assert server.map.get_block(far) == before
+    assert server.map.get_block(surface) != BLOCK_AIR # nothing of the message was applied
+    assert chunk_key(far) not in attacker.chunks() # only the chunks the client has are sent again
+    # still connected, its next valid edit goes through
+    attacker.client.send_edits([surface], [BLOCK_AIR])
+    wait_for(lambda: server.map.get_block(surface) == BLOCK_AIR)
+    assert attacker.client.connected
+    attacker.client.close()
+
+def test_client_that_sends_garbage_is_dropped(server, surface):
+    attacker = connect(server, [chunk_key(surface)])
+    attacker.client.send(EDITS, b"\x00" * (EDIT_DTYPE.itemsize + 1))
+    wait_for(lambda: not attacker.client.connected)
+    assert attacker.client.error == "the server closed the connection"
+    attacker.client.close()
+
+def test_deltas_reach_a_client_map(server, surface):
+    key = chunk_key(surface)
+    client = ChunkClient(SERVER_HOST, server.port)
+    kinds = []
+    take = client.take
+    client.take = lambda limit=None: [kinds.append(message[0]) or message for message in take(limit)]
+    world_map = Map(None, workers=0, source=client)
+    world_map.set_focus(surface)
+    wait_for(lambda: world_map.update(0) or key in world_map.loaded)
+    assert world_map.get_block(surface) == server.map.get_block(surface) != BLOCK_AIR
+    editor = connect(server, [key])
+    editor.client.send_edits([surface], [BLOCK_AIR])
+    wait_for(lambda: world_map.update(0) or world_map.get_block(surface) == BLOCK_AIR)
+    assert DELTA in kinds
+    assert world_map.versions[key] == server.versions[key] == 1
+    assert (world_map.chunks.get_chunk(key).unpacked() == server.map.chunks.get_chunk(key).unpacked()).all()
+    editor.client.close()
+    world_map.close()
@@ -0,0 +1,31 @@
+"""
+Tests of the player snapshots in snapshot.py.
+"""
+
+from config import *
+from snapshot import sight_vector
+from culling import camera_matrix, perspective
+
+import math
+import numpy as np
+import pytest
+
+
+def view_direction(rotn):
+    """
+    @return: (ndarray) unit vector the camera looks along in world coordinates, from the modelview transform that
+             Window.set_3d sets up, see culling.camera_matrix
+    """
+    projection = perspective(FOV, 1.0, NEAR_PLANE, FAR_PLANE)
+    modelview = np.linalg.inv(projection) @ camera_matrix(rotn, (0, 0, 0), sight_vector(rotn), 1.0)
+    return modelview[:3, :3].T @ np.array([0.0, 0.0, -1.0]) # the camera looks down -z
+
+
+@pytest.mark.parametrize("horiz", [-150, -45, 0, 30, 120])
+@pytest.mark.parametrize("vert", [-89, -60, -30, 0, 10, 45, 80, 90])
+def test_sight_vector_matches_view(horiz, vert):
+    sight = np.array(sight_vector((horiz, vert)))
+    view = view_direction((horiz, vert))
+    assert np.linalg.norm(sight) == pytest.approx(1.0)
+    angle = math.degrees(math.acos(np.clip(np.dot(sight, view) / np.linalg.norm(view), -1, 1)))
+    assert angle < 1e-4
@@ -0,0 +1,81 @@
+"""
+Tests of the world model in world.py.
+"""
+
+from config import *
+from blocks import BLOCK_AIR, BLOCK_STONE
+from chunk import BLOCK_DTYPE
+from protocol import CHUNK, DELTA
+from world import Map, World
+
+import numpy as np
+
+
+def test_fixed_timestep_remeshes_once_per_frame(monkeypatch):
+    game = World()
+    game.fixed_timestep = True
+    ticks = []
+    remeshes = []
+    tick = game.tick
+    monkeypatch.setattr(game, "tick", lambda dt: (ticks.append(dt), tick(dt)))
+    monkeypatch.setattr(game.map, "remesh_dirty", lambda: remeshes.append(True))
+    # a slow frame, the world catches up with several ticks
+    game.update((MAX_TICKS_PER_UPDATE + 0.5) / TICKS_PER_SEC)
+    assert len(ticks) == MAX_TICKS_PER_UPDATE
+    assert len(remeshes) == 1
+    game.update(0) # no tick is due, the frame still takes jobs and remeshes
+    assert len(ticks) == MAX_TICKS_PER_UPDATE
+    assert len(remeshes) == 2
+    game.close()
+
+class FakeSource:
+    """
+    Stands in for a ChunkClient, hands the map the messages a test puts in it.
+    """
+    def __init__(self):
+        self.messages = []
+        self.subscribed = []
+
+    def take(self, limit=None):
+        taken, self.messages = self.messages, []
+        return taken
+
+    def subscribe(self, keys):
+        self.subscribed.extend(keys)
+
+    def unsubscribe(self, keys):
+        pass
+
+    def send_edits(self, positions, blocks):
+        pass
+
+    def close(self):
+        pass
+
+def test_streamed_chunks_follow_their_versions():
+    source = FakeSource()
+    world_map = Map(None, workers=0, source=source)
+    world_map.update(0)
+    key = (0, 0, 0)
+    assert key in source.subscribed
+    stone = np.full((CHUNK_SIZE,) * 3, BLOCK_STONE, dtype=BLOCK_DTYPE)
+    air = np.array([BLOCK_AIR], dtype=BLOCK_DTYPE)
+    source.messages = [
+        (CHUNK, key, 2, stone),
+        (DELTA, key, 2, np.array([0]), air), # already in the chunk
+        (CHUNK, key, 1, None), # sent before version 2
+        (DELTA, key, 3, np.array([1]), air),
+    ]
+    world_map.update(0)
+    assert world_map.versions[key] == 3
+    assert [world_map.get_block((0, 0, z)) for z in range(3)] == [BLOCK_STONE, BLOCK_AIR, BLOCK_STONE]
+    source.subscribed = []
+    source.messages = [(DELTA, key, 5, np.array([2]), air)] # version 4 was lost
+    world_map.update(0)
+    assert world_map.get_block((0, 0, 2)) == BLOCK_STONE
+    assert source.subscribed == [key] # asked for the whole chunk again
+    source.messages = [(DELTA, key, 6, np.array([3]), air), (CHUNK, key, 6, None)]
+    world_map.update(0)
+    assert world_map.versions[key] == 6
+    assert world_map.get_block((0, 0, 0)) == BLOCK_AIR
+    world_map.close()